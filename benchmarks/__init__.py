@@ -0,0 +1,5 @@
+"""
+Бенчмарки хранения и обработки данных бота
+
+Запуск из корня репозитория: python -m benchmarks.<имя>
+"""
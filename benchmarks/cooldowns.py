@@ -0,0 +1,88 @@
+"""
+Память и время проверки задержки опыта: CooldownMapping против CooldownStore
+
+Каждый из --members участников пишет по сообщению, после чего замеряются
+выделенная память и стоимость ещё --checks проверок. CooldownMapping при
+каждом get_bucket просматривает весь кэш корзин в поисках устаревших.
+
+Запуск: python -m benchmarks.cooldowns [--members 100000] [--checks 1000]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from disnake.ext import commands
+
+from cogs.lvl.cooldowns import CooldownStore
+
+GUILD_ID = 10 ** 18
+COOLDOWN = 20
+
+
+def measure(build):
+    """Возвращает (результат, выделенная память в байтах, время в мс)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated, elapsed_ms
+
+
+def fill_mapping(messages):
+    mapping = commands.CooldownMapping.from_cooldown(1, COOLDOWN, commands.BucketType.member)
+    for message in messages:
+        # То же, что get_bucket, но без просмотра всего кэша: иначе заполнение квадратично
+        bucket = mapping._cache[mapping._bucket_key(message)] = mapping.create_bucket(message)
+        bucket.update_rate_limit()
+    return mapping
+
+
+def fill_store(messages):
+    store = CooldownStore()
+    for message in messages:
+        store.try_acquire(message.guild.id, message.author.id, COOLDOWN)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк хранилища задержек опыта")
+    parser.add_argument('--members', type=int, default=100_000)
+    parser.add_argument('--checks', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(4)
+    guild = SimpleNamespace(id=GUILD_ID)
+    messages = [
+        SimpleNamespace(guild=guild, author=SimpleNamespace(id=rng.randrange(10 ** 17, 10 ** 19)))
+        for _ in range(args.members)
+    ]
+    probes = rng.sample(messages, min(args.checks, len(messages)))
+
+    mapping, mapping_bytes, mapping_fill_ms = measure(lambda: fill_mapping(messages))
+    started = time.perf_counter()
+    for message in probes:
+        mapping.get_bucket(message).update_rate_limit()
+    mapping_check_us = (time.perf_counter() - started) / len(probes) * 1e6
+    del mapping
+
+    store, store_bytes, store_fill_ms = measure(lambda: fill_store(messages))
+    started = time.perf_counter()
+    for message in probes:
+        store.try_acquire(message.guild.id, message.author.id, COOLDOWN)
+    store_check_us = (time.perf_counter() - started) / len(probes) * 1e6
+
+    print(f"{args.members} активных участников, задержка {COOLDOWN} с")
+    print(f"{'':>16}{'Б/участника':>14}{'заполнение, мс':>17}{'проверка, мкс':>16}")
+    print(f"{'CooldownMapping':>16}{mapping_bytes / args.members:>14.0f}{mapping_fill_ms:>17.0f}{mapping_check_us:>16.1f}")
+    print(f"{'CooldownStore':>16}{store_bytes / args.members:>14.0f}{store_fill_ms:>17.0f}{store_check_us:>16.2f}")
+    print(f"Память: {mapping_bytes / store_bytes:.1f}x меньше, проверка: {mapping_check_us / store_check_us:.0f}x быстрее")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Отрисовка карточек уровня: в цикле событий, в пуле потоков и из кэша
+
+Кроме скорости замеряется задержка цикла событий: фоновая задача спит
+по 1 мс, и превышение показывает, насколько отрисовка блокирует цикл
+(обработку остальных событий бота).
+
+Запуск: python -m benchmarks.rank_cards [--cards 200] [--workers 1 2 4]
+"""
+import argparse
+import asyncio
+import io
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from PIL import Image
+
+from cogs.lvl import cards
+from cogs.lvl.render import CardRenderer
+
+
+def make_avatar(seed: int) -> bytes:
+    """Шумное изображение 256×256, как аватар из CDN"""
+    rng = random.Random(seed)
+    image = Image.frombytes('RGB', (256, 256), bytes(rng.getrandbits(8) for _ in range(256 * 256 * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def make_cards(count: int):
+    rng = random.Random(5)
+    return [
+        {'name': f"Участник {i}", 'level': rng.randrange(1, 80), 'progress': rng.randrange(0, 100), 'rank': i + 1}
+        for i in range(count)
+    ]
+
+
+async def ticker(stop: asyncio.Event, delays: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        delays.append(time.perf_counter() - started - 0.001)
+
+
+async def render_all(specs, avatars, workers: int):
+    """Отрисовывает карточки по одной, как запросы /level; workers=0 — прямо в цикле событий.
+
+    Возвращает (карточек/с, задержка цикла p99 в мс, максимальная задержка в мс)."""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(workers) if workers else None
+    if executor:
+        # Прогрев: загрузка шрифтов в потоках
+        await asyncio.gather(*(loop.run_in_executor(executor, cards.render_rank_card, specs[0], avatars[0])
+                               for _ in range(workers)))
+    stop = asyncio.Event()
+    delays = []
+    task = asyncio.create_task(ticker(stop, delays))
+    await asyncio.sleep(0)
+
+    async def render(spec, avatar):
+        if executor:
+            await loop.run_in_executor(executor, cards.render_rank_card, spec, avatar)
+        else:
+            cards.render_rank_card(spec, avatar)
+            await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    # Одновременно обрабатывается не больше запросов, чем потоков
+    for i in range(0, len(specs), max(workers, 1)):
+        await asyncio.gather(*(render(s, a) for s, a in zip(specs[i:i + max(workers, 1)], avatars[i:i + max(workers, 1)])))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await task
+    if executor:
+        executor.shutdown()
+    delays.sort()
+    return len(specs) / elapsed, delays[int(len(delays) * 0.99)] * 1000, delays[-1] * 1000
+
+
+class FakeAsset:
+    def __init__(self, key: str, data: bytes):
+        self.key = key
+        self._data = data
+
+    def with_static_format(self, _):
+        return self
+
+    def with_size(self, _):
+        return self
+
+    async def read(self) -> bytes:
+        return self._data
+
+
+async def cached(specs, avatars, requests: int, workers: int):
+    """Запросы /level от небольшой группы активных участников через CardRenderer"""
+    with tempfile.TemporaryDirectory() as directory:
+        renderer = CardRenderer(workers=workers, cache_dir=os.path.join(directory, 'avatars'))
+        members = [
+            SimpleNamespace(id=i, display_name=spec['name'], display_avatar=FakeAsset(f"a{i}", avatar))
+            for i, (spec, avatar) in enumerate(zip(specs, avatars))
+        ]
+        rng = random.Random(6)
+        await renderer.rank_card(members[0], 1, 0, 1)  # прогрев пула
+        started = time.perf_counter()
+        for _ in range(requests):
+            i = rng.randrange(len(members))
+            spec = specs[i]
+            await renderer.rank_card(members[i], spec['level'], spec['progress'], spec['rank'])
+        elapsed = time.perf_counter() - started
+        metrics = renderer.metrics()
+        renderer.close()
+    return requests / elapsed, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк отрисовки карточек уровня")
+    parser.add_argument('--cards', type=int, default=200)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    specs = make_cards(args.cards)
+    avatars = [make_avatar(i) for i in range(16)] * (args.cards // 16 + 1)
+    avatars = avatars[:args.cards]
+
+    print(f"{args.cards} карточек {cards.CARD_SIZE[0]}×{cards.CARD_SIZE[1]}, процессоров: {os.cpu_count()}")
+    print(f"{'режим':>28}{'карточек/с':>14}{'задержка p99, мс':>19}{'макс., мс':>12}")
+    for workers in [0] + args.workers:
+        name = f"пул, потоков: {workers}" if workers else "в цикле событий"
+        per_second, p99, worst = asyncio.run(render_all(specs, avatars, workers))
+        print(f"{name:>28}{per_second:>14.1f}{p99:>19.1f}{worst:>12.1f}")
+
+    # 50 активных участников запрашивают карточку по 10 раз без изменений опыта
+    per_second, metrics = asyncio.run(cached(specs[:50], avatars[:50], 500, max(args.workers)))
+    print(f"{'с кэшем (500 запросов)':>28}{per_second:>14.1f}")
+    print(f"Отрисовано: {metrics['render_count']}, из кэша: {metrics['render_hits']}, "
+          f"аватаров загружено: {metrics['avatar_fetches']}, из памяти: {metrics['avatar_memory_hits']}")
+
+
+if __name__ == '__main__':
+    main()
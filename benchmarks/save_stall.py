@@ -0,0 +1,80 @@
+"""
+Блокировка цикла событий при сохранении: полная копия документа против OffloopWriter
+
+Пока идёт сохранение, фоновая задача каждую миллисекунду замеряет
+задержку цикла событий; OffloopWriter дополнительно сообщает самый
+долгий непрерывный отрезок копирования (stall). Запись идёт во
+временный каталог.
+
+Запуск: python -m benchmarks.save_stall [--users 100000] [--trades 50000]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from cogs.lvl.partition import GuildLevels
+from storage import JsonFileBackend, OffloopWriter
+from storage.aio import snapshot
+from .synthetic import make_lvl_data, make_trading_data
+
+
+async def ticker(stop: asyncio.Event, delays: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        delays.append((time.perf_counter() - started - 0.001) * 1000)
+
+
+async def measure(save, repeat: int):
+    """Максимальная задержка цикла событий и время сохранения, лучшее из repeat"""
+    best_delay = best_total = float('inf')
+    for _ in range(repeat):
+        stop = asyncio.Event()
+        delays = [0.0]
+        task = asyncio.create_task(ticker(stop, delays))
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await save()
+        total_ms = (time.perf_counter() - started) * 1000
+        stop.set()
+        await task
+        best_delay = min(best_delay, max(delays))
+        best_total = min(best_total, total_ms)
+    return best_delay, best_total
+
+
+async def run(name: str, data: dict, directory: str, repeat: int):
+    backend = JsonFileBackend(os.path.join(directory, 'data.json'))
+    writer = OffloopWriter(backend, track=False)
+    loop = asyncio.get_running_loop()
+
+    async def full_copy():
+        copy = snapshot(data)
+        await loop.run_in_executor(None, writer._write, copy)
+
+    print(f"\n{name}")
+    print(f"{'способ':<18}{'задержка цикла, мс':>20}{'stall, мс':>12}{'сохранение, мс':>17}")
+    delay, total = await measure(full_copy, repeat)
+    print(f"{'полная копия':<18}{delay:>20.1f}{'':>12}{total:>17.0f}")
+    delay, total = await measure(lambda: writer.save(data), repeat)
+    print(f"{'OffloopWriter':<18}{delay:>20.1f}{writer.max_stall_ms:>12.2f}{total:>17.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк блокировки цикла событий при сохранении")
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--trades', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        await run(f"trading.json, {args.trades} сделок", make_trading_data(args.trades), directory, args.repeat)
+        await run(f"словарь, {args.users} записей участников", make_lvl_data(args.users), directory, args.repeat)
+        levels = GuildLevels.prepare(make_lvl_data(args.users))
+        await run(f"уровни сервера, {args.users} пользователей", levels, directory, args.repeat)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Скорость и размер записи данных разными сериализаторами
+
+Запуск: python -m benchmarks.serializers [--users 100000] [--trades 50000]
+"""
+import argparse
+import json
+import time
+
+from storage.serializers import available_serializers
+from .synthetic import make_lvl_data, make_trading_data
+
+
+class LegacyJson:
+    """Прежний формат: json с indent=4"""
+    name = 'json (indent=4)'
+
+    def encode(self, data):
+        return json.dumps(data, ensure_ascii=False, indent=4).encode('utf-8')
+
+    def decode(self, raw):
+        return json.loads(raw.decode('utf-8'))
+
+
+def best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run(name: str, data: dict, repeat: int):
+    print(f"\n{name}")
+    print(f"{'кодек':<18}{'размер, КБ':>12}{'кодирование, мс':>18}{'разбор, мс':>13}")
+    codecs = [LegacyJson()] + list(available_serializers().values())
+    for codec in codecs:
+        raw = codec.encode(data)
+        assert codec.decode(raw) == data
+        encode_ms = best_of(lambda: codec.encode(data), repeat)
+        decode_ms = best_of(lambda: codec.decode(raw), repeat)
+        print(f"{codec.name:<18}{len(raw) / 1024:>12.0f}{encode_ms:>18.1f}{decode_ms:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализаторов")
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--trades', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    run(f"lvl_data.json, {args.users} пользователей", make_lvl_data(args.users), args.repeat)
+    run(f"trading.json, {args.trades} сделок", make_trading_data(args.trades), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
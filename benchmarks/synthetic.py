@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+
+CATEGORIES = ["👔 Костюмы", "💣 Оружие", "✨ Артефакты", "📏 Обвесы", "💊 Медицина", "⚒️ Крафт", "📦 Прочее"]
+
+
+def make_user_id(rng: random.Random) -> str:
+    """Случайный снежинка-ID Discord"""
+    return str(rng.randrange(10 ** 17, 10 ** 19))
+
+
+def make_lvl_data(users: int, seed: int = 1) -> dict:
+    """lvl_data.json с заданным числом пользователей"""
+    rng = random.Random(seed)
+    data = {
+        'settings': {
+            'enabled': True,
+            'xp_per_message': 5,
+            'xp_per_voice_minute': 2,
+            'xp_cooldown': 20,
+            'voice_cooldown': 100,
+            'level_roles': {},
+            'rewards': {},
+            'announcements': {'channel_id': None, 'enabled': True},
+            'leaderboard': {'message_id': None, 'channel_id': None, 'update_interval': 300}
+        },
+        'users': {},
+        'last_update': datetime(2025, 6, 1).isoformat()
+    }
+    for _ in range(users):
+        messages = rng.randrange(0, 5000)
+        voice = round(rng.random() * 3000, 2)
+        data['users'][make_user_id(rng)] = {
+            'xp': messages * 5 + int(voice * 2),
+            'level': rng.randrange(0, 60),
+            'total_messages': messages,
+            'voice_time': voice,
+            'last_voice_update': None
+        }
+    return data
+
+
+def make_trading_data(trades: int, seed: int = 2) -> dict:
+    """trading.json с заданным числом сделок"""
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 1)
+    data = {
+        'marketplace': {'category_id': 1, 'category_channels': {c: i for i, c in enumerate(CATEGORIES)}, 'general_channel_id': 2},
+        'trades': {}
+    }
+    sellers = [make_user_id(rng) for _ in range(max(trades // 20, 1))]
+    for i in range(trades):
+        seller = rng.choice(sellers)
+        created = start + timedelta(minutes=i)
+        trade_id = f"{seller}_{created.timestamp()}"
+        category = rng.choice(CATEGORIES)
+        data['trades'][trade_id] = {
+            'id': trade_id,
+            'seller': seller,
+            'item_name': f"Предмет {i}",
+            'item_description': "Описание предмета " * 3,
+            'price': rng.randrange(100, 100000),
+            'category': category,
+            'image_urls': [f"https://cdn.example.com/{i}.png"],
+            'created_at': created.isoformat(),
+            'expires_at': (created + timedelta(hours=24)).isoformat(),
+            'status': rng.choice(['active', 'active', 'completed', 'cancelled']),
+            'message_id': 10 ** 18 + i,
+            'channel_id': data['marketplace']['category_channels'][category],
+            'interested_users': [make_user_id(rng) for _ in range(rng.randrange(0, 3))]
+        }
+        trade = data['trades'][trade_id]
+        if trade['status'] == 'completed':
+            # Покупатели — из тех же пользователей, что и продавцы
+            trade['buyer'] = rng.choice(sellers)
+            trade['completed_at'] = (created + timedelta(hours=1)).isoformat()
+    return data
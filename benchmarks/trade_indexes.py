@@ -0,0 +1,103 @@
+"""
+Поиск сделок: полный перебор trading_data['trades'] против индексов TradeRepository
+
+Замеряются запросы торговой площадки: кнопка «Купить» (поиск по ID
+сообщения), счётчик активных объявлений продавца, /tradelist с
+категорией и без неё, /tradehistory пользователя.
+
+Запуск: python -m benchmarks.trade_indexes [--trades 100000] [--queries 200]
+"""
+import argparse
+import random
+import time
+
+from state.trades import TradeRepository
+
+from .synthetic import CATEGORIES, make_trading_data
+
+
+def per_query_us(func, args) -> float:
+    started = time.perf_counter()
+    for arg in args:
+        func(arg)
+    return (time.perf_counter() - started) / len(args) * 1e6
+
+
+def result_size(result) -> int:
+    """Размер результата для сверки перебора с индексом"""
+    if isinstance(result, int):
+        return result
+    if isinstance(result, dict):
+        return 1
+    return len(result or [])
+
+
+def scan_by_message(trades, message_id):
+    for trade in trades.values():
+        if trade.get('message_id') == message_id:
+            return trade
+    return None
+
+
+def scan_seller_active(trades, seller_id):
+    return len([t for t in trades.values() if t['seller'] == seller_id and t['status'] == 'active'])
+
+
+def scan_active(trades, category):
+    return [t for t in trades.values() if t['status'] == 'active' and (category is None or t['category'] == category)]
+
+
+def scan_history(trades, user_id):
+    return [t for t in trades.values() if t['status'] == 'completed' and user_id in [t['seller'], t.get('buyer')]]
+
+
+def indexed_history(repository, user_id):
+    """Запрос /tradehistory: завершённые сделки пользователя как продавца и как покупателя"""
+    return repository.by_seller(user_id, 'completed') + [
+        trade for trade in repository.by_buyer(user_id, 'completed')
+        if trade['seller'] != user_id
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк индексов торговых предложений")
+    parser.add_argument('--trades', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    trades = make_trading_data(args.trades)['trades']
+    started = time.perf_counter()
+    repository = TradeRepository(trades)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(7)
+    sample = rng.sample(list(trades.values()), min(args.queries, len(trades)))
+    message_ids = [trade['message_id'] for trade in sample]
+    sellers = [trade['seller'] for trade in sample]
+    categories = [rng.choice(CATEGORIES) for _ in sample]
+
+    cases = [
+        ("по сообщению", lambda m: scan_by_message(trades, m), repository.by_message, message_ids),
+        ("активных у продавца", lambda s: scan_seller_active(trades, s),
+         lambda s: repository.count_by_seller(s, 'active'), sellers),
+        ("активные в категории", lambda c: scan_active(trades, c),
+         lambda c: repository.by_status('active', c), categories),
+        ("история пользователя", lambda s: scan_history(trades, s),
+         lambda s: indexed_history(repository, s), sellers),
+    ]
+    # Все активные сделки: результат сам по себе O(n), выигрыш только на фильтрации
+    cases.append(("все активные", lambda _: scan_active(trades, None),
+                  lambda _: repository.by_status('active'), [None] * max(args.queries // 20, 1)))
+
+    print(f"{args.trades} сделок, построение индексов: {build_ms:.0f} мс")
+    print(f"{'запрос':>22}{'перебор, мкс':>15}{'индекс, мкс':>14}{'ускорение':>12}")
+    for name, scan, indexed, queries in cases:
+        for query in queries[:3]:
+            assert result_size(scan(query)) == result_size(indexed(query)), name
+        scan_us = per_query_us(scan, queries)
+        indexed_us = per_query_us(indexed, queries)
+        print(f"{name:>22}{scan_us:>15.1f}{indexed_us:>14.2f}{scan_us / indexed_us:>11.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Память на одного пользователя уровней: словари против UserTable
+
+Запуск: python -m benchmarks.user_table [--sizes 10000 100000 1000000]
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from cogs.lvl.users import UserTable
+from .synthetic import make_lvl_data
+
+
+def measure(build):
+    """Возвращает (результат, выделенная память в байтах, время в мс)"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, allocated, elapsed_ms
+
+
+def run(size: int):
+    raw = json.dumps(make_lvl_data(size)['users'])
+
+    # Прежнее представление: словари, как их создаёт разбор JSON
+    users, dict_bytes, _ = measure(lambda: json.loads(raw))
+    table, table_bytes, build_ms = measure(lambda: UserTable.from_dict(users))
+    assert table.to_dict() == {
+        user_id: {**record, 'voice_time': float(record['voice_time'])} for user_id, record in users.items()
+    }
+    del users
+
+    started = time.perf_counter()
+    table.to_dict()
+    to_dict_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    table.snapshot()
+    snapshot_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{size:>10}{dict_bytes / size:>18.0f}{table_bytes / size:>18.0f}"
+          f"{dict_bytes / table_bytes:>10.1f}x{build_ms:>15.0f}{to_dict_ms:>13.0f}{snapshot_ms:>13.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк памяти таблицы пользователей")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'польз.':>10}{'dict, Б/польз.':>18}{'table, Б/польз.':>18}{'выигрыш':>11}"
+          f"{'загрузка, мс':>15}{'to_dict, мс':>13}{'снимок, мс':>13}")
+    for size in args.sizes:
+        run(size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Пропускная способность начисления опыта за сообщения: поштучно против пакетов
+
+Поток из --rate сообщений в секунду в течение --seconds секунд от --active
+участников сервера с --users пользователями. «До» — прежний обработчик:
+обновление таблицы, запись в журнал и проверка уровня на каждое сообщение.
+«После» — XPAccumulator и применение пакета раз в FLUSH_INTERVAL секунд.
+
+Запуск: python -m benchmarks.xp_pipeline [--users 100000] [--active 2000]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from cogs.lvl.accumulator import FLUSH_INTERVAL, XPAccumulator
+from cogs.lvl.curves import DEFAULT_CURVE
+from cogs.lvl.journal import XPJournal
+from cogs.lvl.leveling import Leveling
+from cogs.lvl.partition import GuildLevels
+from storage import JsonFileBackend
+from .synthetic import make_lvl_data
+
+XP_PER_MESSAGE = 5
+
+
+def make_partition(data, directory: str, name: str) -> GuildLevels:
+    # Тот же перевод снимка, что и при загрузке сервера когом
+    data = GuildLevels.prepare({**data})
+    backend = JsonFileBackend(os.path.join(directory, f'{name}.json'))
+    return GuildLevels(1, backend, data, XPJournal(os.path.join(directory, f'{name}.journal')))
+
+
+def inline(partition: GuildLevels, traffic):
+    """Прежний on_message: каждое сообщение применяется и журналируется сразу"""
+    users = partition.data['users']
+    for user_id in traffic:
+        key = str(user_id)
+        if key not in users:
+            users[key] = Leveling.new_user()
+        user_data = users[key]
+        old_level = user_data['level']
+        user_data['xp'] += XP_PER_MESSAGE
+        user_data['total_messages'] += 1
+        partition.journal.append(key, xp=XP_PER_MESSAGE, messages=1)
+        new_level = DEFAULT_CURVE.level_for_xp(user_data['xp'])
+        if new_level > old_level:
+            user_data['level'] = new_level
+
+
+def batched(partition: GuildLevels, traffic, batch_size: int):
+    """Новый on_message: приращение в накопитель, применение пакетом"""
+    accumulator = XPAccumulator()
+    for i, user_id in enumerate(traffic, 1):
+        accumulator.add(1, user_id, XP_PER_MESSAGE)
+        if i % batch_size == 0:
+            for deltas in accumulator.drain().values():
+                partition.apply(deltas, DEFAULT_CURVE, Leveling.new_user)
+    for deltas in accumulator.drain().values():
+        partition.apply(deltas, DEFAULT_CURVE, Leveling.new_user)
+
+
+def timed(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк начисления опыта за сообщения")
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--active', type=int, default=2000)
+    parser.add_argument('--rate', type=int, default=1000, help="сообщений в секунду")
+    parser.add_argument('--seconds', type=int, default=60)
+    args = parser.parse_args()
+
+    data = make_lvl_data(args.users)
+    rng = random.Random(3)
+    # Активные участники пишут неравномерно: первые пишут чаще
+    active = [int(user_id) for user_id in rng.sample(list(data['users']), args.active)]
+    weights = [1 / (rank + 1) for rank in range(len(active))]
+    traffic = rng.choices(active, weights=weights, k=args.rate * args.seconds)
+    batch_size = args.rate * FLUSH_INTERVAL
+
+    with tempfile.TemporaryDirectory() as directory:
+        before = make_partition(data, directory, 'inline')
+        after = make_partition(data, directory, 'batched')
+        inline_s = timed(inline, before, traffic)
+        batched_s = timed(batched, after, traffic, batch_size)
+        assert before.data['users'].to_dict() == after.data['users'].to_dict()
+        journal_lines = before.journal.pending, after.journal.pending
+        before.close()
+        after.close()
+
+    print(f"{len(traffic)} сообщений ({args.rate}/с × {args.seconds} с), "
+          f"{args.active} активных из {args.users} пользователей, пакет раз в {FLUSH_INTERVAL} с")
+    print(f"{'':>10}{'сообщ./с':>14}{'мкс/сообщ.':>14}{'CPU при нагрузке':>20}{'записей журнала':>18}")
+    for name, elapsed, lines in (("до", inline_s, journal_lines[0]), ("после", batched_s, journal_lines[1])):
+        throughput = len(traffic) / elapsed
+        print(f"{name:>10}{throughput:>14,.0f}{elapsed / len(traffic) * 1e6:>14.1f}"
+              f"{args.rate / throughput * 100:>19.1f}%{lines:>18}")
+    print(f"Ускорение: {inline_s / batched_s:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,11 @@
 import disnake
 from disnake.ext import commands
-from main import clan_data, save_clan_data
+from storage import aio
 
 class Admin(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
 
     @commands.slash_command(
         name="announce",
@@ -17,6 +18,7 @@ class Admin(commands.Cog):
         title: str = commands.Param(description="Заголовок объявления"),
         content: str = commands.Param(description="Содержание объявления")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if not clan_data['settings']['announcement_channel']:
             await inter.response.send_message('Канал для объявлений не настроен! Используйте команду `/setchannel`', ephemeral=True)
             return
@@ -50,6 +52,7 @@ class Admin(commands.Cog):
         ),
         channel: disnake.TextChannel = commands.Param(description="Канал")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if channel_type == "welcome":
             clan_data['settings']['welcome_channel'] = channel.id
         elif channel_type == "announcement":
@@ -57,7 +60,7 @@ class Admin(commands.Cog):
         elif channel_type == "log":
             clan_data['settings']['log_channel'] = channel.id
 
-        save_clan_data()
+        self.state.save(inter.guild.id)
         await inter.response.send_message(f'Канал {channel.mention} установлен как {channel_type}!', ephemeral=True)
 
     @commands.slash_command(
@@ -74,8 +77,9 @@ class Admin(commands.Cog):
         ),
         role: disnake.Role = commands.Param(description="Роль")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         clan_data['roles'][role_type] = role.id
-        save_clan_data()
+        self.state.save(inter.guild.id)
         await inter.response.send_message(f'Роль {role.mention} установлена как {role_type}!', ephemeral=True)
 
     @commands.slash_command(
@@ -84,6 +88,7 @@ class Admin(commands.Cog):
     )
     @commands.has_permissions(administrator=True)
     async def settings_slash(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         embed = disnake.Embed(
             title="Настройки клана",
             color=disnake.Color.blue()
@@ -135,5 +140,94 @@ class Admin(commands.Cog):
         deleted = await inter.channel.purge(limit=amount)
         await inter.followup.send(f'Удалено {len(deleted)} сообщений!', ephemeral=True)
 
+    @commands.slash_command(
+        name="metrics",
+        description="Просмотр внутренних метрик бота"
+    )
+    @commands.has_permissions(administrator=True)
+    async def metrics_slash(self, inter: disnake.ApplicationCommandInteraction):
+        embed = disnake.Embed(
+            title="Метрики бота",
+            color=disnake.Color.blue()
+        )
+
+        # Данные, разделённые по серверам
+        stores = [("Данные клана", self.state.store)]
+        leveling = self.bot.get_cog('Leveling')
+        if leveling:
+            stores.append(("Данные уровней", leveling.guilds))
+        for title, store in stores:
+            stats = store.metrics()
+            embed.add_field(
+                name=title,
+                value=f"Серверов в памяти: **{stats['loaded']}** (ожидают записи: {stats['pending']})\n"
+                      f"Загрузок: **{stats['load_count']}**, выгрузок: **{stats['eviction_count']}**\n"
+                      f"Записей на диск: **{stats['write_count']}**, ошибок: **{stats['failed_writes']}**\n"
+                      f"Время записи: последнее {stats['last_flush_ms']} мс, макс. {stats['max_flush_ms']} мс\n"
+                      f"Stall сред./макс.: {stats['avg_stall_ms']}/{stats['max_stall_ms']} мс, "
+                      f"запись в потоке макс. {stats['max_write_ms']} мс",
+                inline=False
+            )
+
+        # Блокировка цикла событий при сохранении (снимок данных)
+        lines = []
+        for writer in aio.writers:
+            writer_stats = writer.metrics()
+            lines.append(
+                f"`{writer_stats['name']}`: сохранений {writer_stats['save_count']}, "
+                f"stall посл./сред./макс. {writer_stats['last_stall_ms']}/{writer_stats['avg_stall_ms']}/{writer_stats['max_stall_ms']} мс, "
+                f"копирование посл. {writer_stats['last_copy_ms']} мс, "
+                f"запись макс. {writer_stats['max_write_ms']} мс"
+            )
+        embed.add_field(
+            name="Фоновая запись",
+            value="\n".join(lines) if lines else "Нет данных",
+            inline=False
+        )
+
+        # Изображения карточек уровня и таблиц лидеров
+        if leveling and leveling.renderer.available:
+            render = leveling.renderer.metrics()
+            embed.add_field(
+                name="Отрисовка изображений",
+                value=f"Отрисовано: **{render['render_count']}** (в среднем {render['avg_render_ms']} мс), "
+                      f"из кэша: **{render['render_hits']}**\n"
+                      f"Аватары: из памяти **{render['avatar_memory_hits']}**, с диска **{render['avatar_disk_hits']}**, "
+                      f"загружено **{render['avatar_fetches']}**",
+                inline=False
+            )
+
+        # Кэш пользователей для списков и таблиц лидеров
+        resolver = self.bot.user_resolver.metrics()
+        embed.add_field(
+            name="Поиск пользователей",
+            value=f"Из кэша сервера: **{resolver['member_hits']}**, из кэша бота: **{resolver['user_cache_hits']}**, "
+                  f"из LRU: **{resolver['lru_hits']}** ({resolver['cached']} записей)\n"
+                  f"Запросов к API: **{resolver['rest_calls']}**, ошибок: **{resolver['rest_failures']}**, "
+                  f"попаданий: **{resolver['hit_rate']}%**",
+            inline=False
+        )
+
+        dm = self.bot.dm.metrics()
+        embed.add_field(
+            name="Личные сообщения",
+            value=f"В очереди: **{dm['queued']}**, доставлено: **{dm['sent']}**, не доставлено: **{dm['failed']}** "
+                  f"({dm['failure_rate']}%)\n"
+                  f"Повторов: **{dm['retries']}**, лимитов 429: **{dm['rate_limited']}**, "
+                  f"пропущено закрытых ЛС: **{dm['closed_skips']}** ({dm['closed_cached']} в кэше)\n"
+                  f"Ожидание в очереди: **{dm['avg_wait_ms']} мс**, отправка: **{dm['avg_send_ms']} мс**",
+            inline=False
+        )
+
+        reminders = self.bot.reminders.metrics()
+        embed.add_field(
+            name="Напоминания о событиях",
+            value=f"В очереди: **{reminders['scheduled']}**, отправлено: **{reminders['fired']}**, "
+                  f"пропущено устаревших: **{reminders['skipped']}**",
+            inline=False
+        )
+
+        await inter.response.send_message(embed=embed, ephemeral=True)
+
 def setup(bot):
     bot.add_cog(Admin(bot)) 
\ No newline at end of file
@@ -1,18 +1,19 @@
 import disnake
 from disnake.ext import commands
 from datetime import datetime
-from main import clan_data, save_clan_data
 import asyncio
 
 class Applications(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
         self.verification_messages = {}
 
     @commands.Cog.listener()
     async def on_ready(self):
         # Восстанавливаем все сообщения с кнопками верификации
         for guild in self.bot.guilds:
+            clan_data = self.state.guild(guild.id)
             if 'verification_messages' in clan_data and str(guild.id) in clan_data['verification_messages']:
                 for channel_id, message_id in clan_data['verification_messages'][str(guild.id)].items():
                     try:
@@ -34,6 +35,10 @@ class Applications(commands.Cog):
 
     @commands.Cog.listener()
     async def on_modal_submit(self, inter: disnake.ModalInteraction):
+        # Данные клана загружаются только для своих окон и только на сервере
+        if inter.custom_id != "apply_modal" or inter.guild is None:
+            return
+        clan_data = self.state.guild(inter.guild.id)
         if inter.custom_id == "apply_modal":
             await inter.response.defer(ephemeral=True)
             age = inter.text_values["age"]
@@ -61,7 +66,7 @@ class Applications(commands.Cog):
                 'motivation': motivation,
                 'screenshots': valid_links
             }
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Отправка уведомления лидеру клана
             await inter.edit_original_response(content='Ваша заявка успешно отправлена!')
@@ -76,13 +81,14 @@ class Applications(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         channel: disnake.TextChannel = commands.Param(description="Канал для подачи заявок")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         await inter.response.defer(ephemeral=True)
         if 'apply_channels' not in clan_data['settings']:
             clan_data['settings']['apply_channels'] = []
         
         if channel.id not in clan_data['settings']['apply_channels']:
             clan_data['settings']['apply_channels'].append(channel.id)
-            save_clan_data()
+            self.state.save(inter.guild.id)
             await inter.edit_original_response(content=f'Канал {channel.mention} добавлен для подачи заявок!')
         else:
             await inter.edit_original_response(content=f'Канал {channel.mention} уже добавлен для подачи заявок!')
@@ -97,10 +103,11 @@ class Applications(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         channel: disnake.TextChannel = commands.Param(description="Канал для удаления из списка заявок")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         await inter.response.defer(ephemeral=True)
         if 'apply_channels' in clan_data['settings'] and channel.id in clan_data['settings']['apply_channels']:
             clan_data['settings']['apply_channels'].remove(channel.id)
-            save_clan_data()
+            self.state.save(inter.guild.id)
             await inter.edit_original_response(content=f'Канал {channel.mention} удален из списка каналов для подачи заявок!')
         else:
             await inter.edit_original_response(content=f'Канал {channel.mention} не был добавлен для подачи заявок!')
@@ -111,6 +118,7 @@ class Applications(commands.Cog):
     )
     @commands.has_permissions(administrator=True)
     async def verification(self, ctx):
+        clan_data = self.state.guild(ctx.guild.id)
         embed = disnake.Embed(
             title="Верификация",
             description="Чтобы попасть в клан нажмите на **Подать заявку** и заполните форму после \nэтого ожидаете до **24 часов** \n\nВы можете вступить если захотите в какое-то **подразделение**",
@@ -133,10 +141,14 @@ class Applications(commands.Cog):
             clan_data['verification_messages'][str(ctx.guild.id)] = {}
         
         clan_data['verification_messages'][str(ctx.guild.id)][str(ctx.channel.id)] = str(message.id)
-        save_clan_data()
+        self.state.save(ctx.guild.id)
 
     @commands.Cog.listener()
     async def on_button_click(self, inter: disnake.MessageInteraction):
+        custom_id = inter.component.custom_id
+        if inter.guild is None or not (custom_id == "verify_button" or custom_id.startswith("view_screenshots_")):
+            return
+        clan_data = self.state.guild(inter.guild.id)
         if inter.component.custom_id == "verify_button":
             # Проверка разрешенных каналов
             if 'apply_channels' in clan_data['settings'] and clan_data['settings']['apply_channels']:
@@ -235,6 +247,7 @@ class Applications(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         member: disnake.Member = commands.Param(description="Пользователь, которого нужно принять")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         await inter.response.defer()
         
         # Проверка ролей
@@ -261,13 +274,15 @@ class Applications(commands.Cog):
                 await member.add_roles(member_role)
 
             try:
-                clan_data['members'][str(member.id)] = {
+                self.state.add_member(inter.guild.id, member.id, {
                     'joined_at': datetime.now().isoformat(),
                     'role': 'member',
                     'accepted_by': str(inter.author.id)
-                }
+                })
                 del clan_data['applications'][str(member.id)]
-                save_clan_data()
+                self.state.save(inter.guild.id)
+                # Вступление в клан — первая отметка активности
+                self.bot.last_seen.touch(inter.guild.id, member.id)
 
                 # Отправка уведомления в канал объявлений
                 if clan_data['settings']['announcement_channel']:
@@ -282,15 +297,12 @@ class Applications(commands.Cog):
                         await channel.send(embed=embed)
 
                 # Отправка уведомления в ЛС
-                try:
-                    embed = disnake.Embed(
-                        title="Ваша заявка принята!",
-                        description=f"Поздравляем! Вы были приняты в клан!\n\nДата присоединения: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
-                        color=disnake.Color.green()
-                    )
-                    await member.send(embed=embed)
-                except:
-                    pass
+                embed = disnake.Embed(
+                    title="Ваша заявка принята!",
+                    description=f"Поздравляем! Вы были приняты в клан!\n\nДата присоединения: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+                    color=disnake.Color.green()
+                )
+                self.bot.dm.send(member, embed=embed)
 
                 await inter.edit_original_response(content=f'{member.mention} принят в клан!')
                 # Удаляем сообщение через 5 секунд
@@ -312,6 +324,7 @@ class Applications(commands.Cog):
         member: disnake.Member = commands.Param(description="Пользователь, заявку которого нужно отклонить"),
         reason: str = commands.Param(description="Причина отклонения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         await inter.response.defer()
         
         # Проверка ролей
@@ -335,25 +348,22 @@ class Applications(commands.Cog):
             # Сохраняем данные заявки перед удалением
             application_data = clan_data['applications'][str(member.id)]
             del clan_data['applications'][str(member.id)]
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Отправка уведомления в ЛС
-            try:
-                embed = disnake.Embed(
-                    title="Ваша заявка отклонена",
-                    description=f"К сожалению, ваша заявка на вступление в клан была отклонена.\n\n"
-                               f"**Причина:** {reason}\n\n"
-                               f"**Ваша заявка:**\n"
-                               f"Никнейм: {application_data['nickname']}\n"
-                               f"Возраст: {application_data['age']}\n"
-                               f"Опыт: {application_data['experience']}\n"
-                               f"Мотивация: {application_data['motivation']}\n\n"
-                               f"Дата отклонения: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
-                    color=disnake.Color.red()
-                )
-                await member.send(embed=embed)
-            except:
-                pass
+            embed = disnake.Embed(
+                title="Ваша заявка отклонена",
+                description=f"К сожалению, ваша заявка на вступление в клан была отклонена.\n\n"
+                           f"**Причина:** {reason}\n\n"
+                           f"**Ваша заявка:**\n"
+                           f"Никнейм: {application_data['nickname']}\n"
+                           f"Возраст: {application_data['age']}\n"
+                           f"Опыт: {application_data['experience']}\n"
+                           f"Мотивация: {application_data['motivation']}\n\n"
+                           f"Дата отклонения: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+                color=disnake.Color.red()
+            )
+            self.bot.dm.send(member, embed=embed)
 
             # Отправка уведомления в канал объявлений
             if clan_data['settings']['announcement_channel']:
@@ -376,27 +386,28 @@ class Applications(commands.Cog):
     )
     @commands.has_permissions(administrator=True)
     async def view_applications_slash(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         await inter.response.defer(ephemeral=True)
         if not clan_data['applications']:
             await inter.edit_original_response(content='Нет активных заявок.')
             return
 
         embed = disnake.Embed(title='Список заявок', color=disnake.Color.blue())
-        for user_id, data in clan_data['applications'].items():
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                embed.add_field(
-                    name=f'Заявка от {user.name}',
-                    value=f'Ваш никнейм: {data["nickname"]}\n'
-                          f'Статус: {data["status"]}\n'
-                          f'Возраст: {data["age"]}\n'
-                          f'Опыт: {data["experience"]}\n'
-                          f'Мотивация: {data["motivation"]}\n'
-                          f'Время: {data["timestamp"]}',
-                    inline=False
-                )
-            except:
+        applications = list(clan_data['applications'].items())
+        users = await self.bot.user_resolver.resolve_many((int(user_id) for user_id, _ in applications), inter.guild)
+        for (user_id, data), user in zip(applications, users):
+            if user is None:
                 continue
+            embed.add_field(
+                name=f'Заявка от {user.name}',
+                value=f'Ваш никнейм: {data["nickname"]}\n'
+                      f'Статус: {data["status"]}\n'
+                      f'Возраст: {data["age"]}\n'
+                      f'Опыт: {data["experience"]}\n'
+                      f'Мотивация: {data["motivation"]}\n'
+                      f'Время: {data["timestamp"]}',
+                inline=False
+            )
 
         # Добавляем кнопки для просмотра скриншотов
         view = disnake.ui.View()
@@ -1,9 +1,9 @@
 import disnake
 from disnake.ext import commands
 import re
-import json
 import os
 from pathlib import Path
+from storage import JsonFileBackend, OffloopWriter
 
 class AutoMod(commands.Cog):
     def __init__(self, bot):
@@ -17,22 +17,25 @@ class AutoMod(commands.Cog):
         
         # Путь к файлу настроек
         self.settings_file = self.data_dir / "automod.json"
+        self.backend = JsonFileBackend(str(self.settings_file))
+        self.writer = OffloopWriter(self.backend)
         
         # Загружаем настройки
         self.settings = self.load_settings()
 
     def load_settings(self):
         """Загрузка настроек из файла"""
-        if self.settings_file.exists():
-            try:
-                with open(self.settings_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                return self.get_default_settings()
-        else:
+        try:
+            # Формат файла (JSON или msgpack) определяется при чтении
+            settings = self.backend.load()
+        except Exception as e:
+            print(f"Ошибка при загрузке настроек автомодерации: {e}")
+            return self.get_default_settings()
+        if settings is None:
             settings = self.get_default_settings()
-            self.save_settings(settings)
-            return settings
+            # Цикл событий ещё не запущен, записываем синхронно
+            self.writer.save_sync(settings)
+        return settings
 
     def get_default_settings(self):
         """Получение настроек по умолчанию"""
@@ -44,12 +47,9 @@ class AutoMod(commands.Cog):
             'ignored_roles': []
         }
 
-    def save_settings(self, settings=None):
-        """Сохранение настроек в файл"""
-        if settings is None:
-            settings = self.settings
-        with open(self.settings_file, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=4, ensure_ascii=False)
+    async def save_settings(self):
+        """Сохранение настроек в файл (в рабочем потоке)"""
+        await self.writer.save(self.settings)
 
     @commands.Cog.listener()
     async def on_message(self, message: disnake.Message):
@@ -74,26 +74,22 @@ class AutoMod(commands.Cog):
         if self.settings['block_invites']:
             if self.invite_pattern.search(message.content):
                 await message.delete()
-                try:
-                    await message.author.send(
-                        f"Пожалуйста, не отправляйте приглашения Discord в каналы клана. "
-                        f"Ваше сообщение было удалено."
-                    )
-                except:
-                    pass
+                self.bot.dm.send(
+                    message.author,
+                    f"Пожалуйста, не отправляйте приглашения Discord в каналы клана. "
+                    f"Ваше сообщение было удалено."
+                )
                 return
 
         # Проверка на URL
         if self.settings['block_urls']:
             if self.url_pattern.search(message.content):
                 await message.delete()
-                try:
-                    await message.author.send(
-                        f"Пожалуйста, не отправляйте ссылки в каналы клана. "
-                        f"Ваше сообщение было удалено."
-                    )
-                except:
-                    pass
+                self.bot.dm.send(
+                    message.author,
+                    f"Пожалуйста, не отправляйте ссылки в каналы клана. "
+                    f"Ваше сообщение было удалено."
+                )
                 return
 
     @commands.slash_command(
@@ -156,7 +152,7 @@ class AutoMod(commands.Cog):
                 return
             
             self.settings['enabled'] = (value == "on")
-            self.save_settings()
+            await self.save_settings()
             await inter.edit_original_response(content=f"Автомодерация {'включена' if value == 'on' else 'выключена'}")
             return
 
@@ -171,14 +167,14 @@ class AutoMod(commands.Cog):
                 if action == "add_channel":
                     if channel_id not in self.settings['allowed_channels']:
                         self.settings['allowed_channels'].append(channel_id)
-                        self.save_settings()
+                        await self.save_settings()
                         await inter.edit_original_response(content=f"Канал {channel.mention} добавлен в список разрешенных")
                     else:
                         await inter.edit_original_response(content="Этот канал уже в списке разрешенных")
                 else:
                     if channel_id in self.settings['allowed_channels']:
                         self.settings['allowed_channels'].remove(channel_id)
-                        self.save_settings()
+                        await self.save_settings()
                         await inter.edit_original_response(content=f"Канал {channel.mention} удален из списка разрешенных")
                     else:
                         await inter.edit_original_response(content="Этот канал не был в списке разрешенных")
@@ -197,14 +193,14 @@ class AutoMod(commands.Cog):
                 if action == "add_role":
                     if role_id not in self.settings['ignored_roles']:
                         self.settings['ignored_roles'].append(role_id)
-                        self.save_settings()
+                        await self.save_settings()
                         await inter.edit_original_response(content=f"Роль {role.mention} добавлена в список игнорируемых")
                     else:
                         await inter.edit_original_response(content="Эта роль уже в списке игнорируемых")
                 else:
                     if role_id in self.settings['ignored_roles']:
                         self.settings['ignored_roles'].remove(role_id)
-                        self.save_settings()
+                        await self.save_settings()
                         await inter.edit_original_response(content=f"Роль {role.mention} удалена из списка игнорируемых")
                     else:
                         await inter.edit_original_response(content="Эта роль не была в списке игнорируемых")
@@ -233,13 +229,13 @@ class AutoMod(commands.Cog):
         
         if feature == "invites":
             self.settings['block_invites'] = (status == "on")
-            self.save_settings()
+            await self.save_settings()
             await inter.edit_original_response(
                 content=f"Блокировка приглашений {'включена' if status == 'on' else 'выключена'}"
             )
         else:
             self.settings['block_urls'] = (status == "on")
-            self.save_settings()
+            await self.save_settings()
             await inter.edit_original_response(
                 content=f"Блокировка URL {'включена' if status == 'on' else 'выключена'}"
             )
@@ -1,11 +1,12 @@
 import disnake
 from disnake.ext import commands
 from datetime import datetime, timedelta
-from main import clan_data, save_clan_data
+from services.dm import BULK
 
 class Events(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
 
     @commands.slash_command(
         name="event",
@@ -20,6 +21,7 @@ class Events(commands.Cog):
         time: str = commands.Param(description="Время события (ЧЧ:ММ)"),
         description: str = commands.Param(description="Описание события")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             event_date = datetime.strptime(f"{date} {time}", "%d.%m.%Y %H:%M")
             if event_date < datetime.now():
@@ -35,9 +37,11 @@ class Events(commands.Cog):
             'date': event_date.isoformat(),
             'description': description,
             'participants': [],
-            'created_by': inter.author.id
+            'created_by': inter.author.id,
+            'reminders_sent': []  # Отступы уже отправленных напоминаний, в минутах
         }
-        save_clan_data()
+        self.state.save(inter.guild.id)
+        self.bot.reminders.schedule(inter.guild.id, event_id)
 
         # Отправка уведомления в канал объявлений
         if clan_data['settings']['announcement_channel']:
@@ -64,6 +68,7 @@ class Events(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         event_id: str = commands.Param(description="ID события")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if event_id not in clan_data['events']:
             await inter.response.send_message('Событие не найдено!', ephemeral=True)
             return
@@ -73,7 +78,7 @@ class Events(commands.Cog):
             return
 
         clan_data['events'][event_id]['participants'].append(str(inter.author.id))
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         await inter.response.send_message(f'Вы присоединились к событию "{clan_data["events"][event_id]["name"]}"!', ephemeral=True)
 
@@ -82,6 +87,7 @@ class Events(commands.Cog):
         description="Просмотр активных событий"
     )
     async def view_events_slash(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         active_events = {
             event_id: event for event_id, event in clan_data['events'].items()
             if datetime.fromisoformat(event['date']) > datetime.now()
@@ -114,6 +120,7 @@ class Events(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         event_id: str = commands.Param(description="ID события")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if event_id not in clan_data['events']:
             await inter.response.send_message('Событие не найдено!', ephemeral=True)
             return
@@ -123,7 +130,7 @@ class Events(commands.Cog):
             return
 
         clan_data['events'][event_id]['participants'].remove(str(inter.author.id))
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         await inter.response.send_message(f'Вы покинули событие "{clan_data["events"][event_id]["name"]}"!', ephemeral=True)
 
@@ -137,6 +144,7 @@ class Events(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         event_id: str = commands.Param(description="ID события")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if event_id not in clan_data['events']:
             await inter.response.send_message('Событие не найдено!', ephemeral=True)
             return
@@ -144,7 +152,7 @@ class Events(commands.Cog):
         event_name = clan_data['events'][event_id]['name']
         participants = clan_data['events'][event_id]['participants']
         del clan_data['events'][event_id]
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправка уведомления в канал объявлений
         if clan_data['settings']['announcement_channel']:
@@ -158,12 +166,9 @@ class Events(commands.Cog):
                 await channel.send(embed=embed)
 
         # Отправка уведомлений участникам
-        for user_id in participants:
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                await user.send(f'Событие "{event_name}" было отменено.')
-            except:
-                pass
+        for user in await self.bot.user_resolver.resolve_many(participants, inter.guild):
+            if user:
+                self.bot.dm.send(user, f'Событие "{event_name}" было отменено.', priority=BULK)
 
         await inter.response.send_message(f'Событие "{event_name}" отменено!', ephemeral=True)
 
@@ -177,13 +182,14 @@ class Events(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         event_id: str = commands.Param(description="ID события")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if event_id not in clan_data.get('events', {}):
             await inter.response.send_message('Событие не найдено!', ephemeral=True)
             return
 
         event_name = clan_data['events'][event_id]['name']
         del clan_data['events'][event_id]
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправка уведомления в канал объявлений
         if clan_data['settings']['announcement_channel']:
@@ -1,11 +1,11 @@
 import disnake
 from disnake.ext import commands
 import json
-from main import clan_data, save_clan_data
 
 class Factions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
 
     @commands.slash_command(name="faction", description="Управление группировками")
     @commands.has_permissions(administrator=True)
@@ -18,6 +18,7 @@ class Factions(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         channel: disnake.TextChannel = commands.Param(description="Канал для выбора группировок")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not clan_data['factions']['factions']:
                 await inter.response.send_message("Сначала добавьте хотя бы одну группировку через команду `/faction add`!", ephemeral=True)
@@ -64,7 +65,7 @@ class Factions(commands.Cog):
             clan_data['factions']['channel_id'] = channel.id
 
             # Сохраняем данные
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             await inter.response.send_message("Система группировок успешно настроена!", ephemeral=True)
         except Exception as e:
@@ -80,6 +81,7 @@ class Factions(commands.Cog):
         role: disnake.Role = commands.Param(description="Роль группировки"),
         color: str = commands.Param(description="Цвет группировки (hex код, например #FF0000)", default="#000000")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             # Создаем уникальный ID для группировки
             faction_id = name.lower().replace(" ", "_")
@@ -103,7 +105,7 @@ class Factions(commands.Cog):
             }
 
             # Сохраняем данные
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             await inter.response.send_message(f"Группировка {name} успешно добавлена!", ephemeral=True)
         except Exception as e:
@@ -120,6 +122,7 @@ class Factions(commands.Cog):
         role: disnake.Role = commands.Param(description="Новая роль группировки", default=None),
         color: str = commands.Param(description="Новый цвет группировки (hex код)", default=None)
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             # Проверяем существование группировки
             if faction not in clan_data['factions']['factions']:
@@ -142,7 +145,7 @@ class Factions(commands.Cog):
                 faction_data['color'] = color
 
             # Сохраняем данные
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             await inter.response.send_message(f"Группировка успешно обновлена!", ephemeral=True)
         except Exception as e:
@@ -154,6 +157,7 @@ class Factions(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         faction: str = commands.Param(description="ID группировки")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             # Проверяем существование группировки
             if faction not in clan_data['factions']['factions']:
@@ -164,7 +168,7 @@ class Factions(commands.Cog):
             del clan_data['factions']['factions'][faction]
 
             # Сохраняем данные
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             await inter.response.send_message(f"Группировка успешно удалена!", ephemeral=True)
         except Exception as e:
@@ -172,6 +176,7 @@ class Factions(commands.Cog):
 
     @faction.sub_command(name="list", description="Показать список всех группировок")
     async def list_factions(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not clan_data['factions']['factions']:
                 await inter.response.send_message("Нет добавленных группировок!", ephemeral=True)
@@ -199,9 +204,10 @@ class Factions(commands.Cog):
     @commands.Cog.listener()
     async def on_button_click(self, inter: disnake.MessageInteraction):
         try:
-            if not inter.component.custom_id.startswith("faction_"):
+            if not inter.component.custom_id.startswith("faction_") or inter.guild is None:
                 return
 
+            clan_data = self.state.guild(inter.guild.id)
             if not clan_data['factions']['enabled']:
                 await inter.response.send_message("Система группировок отключена.", ephemeral=True)
                 return
@@ -143,53 +143,56 @@ class GiveawayCog(commands.Cog):
     async def check_giveaways(self):
         """Проверка завершенных розыгрышей"""
         try:
-            giveaways = await self.giveaway_manager.load_giveaways()
             current_time = datetime.now().timestamp()
             
-            for message_id, data in giveaways.items():
-                if not data['ended'] and current_time >= data['end_time']:
-                    try:
-                        guild = self.bot.get_guild(data['guild_id'])
-                        if not guild:
-                            continue
-                            
-                        channel = guild.get_channel(data['channel_id'])
-                        if not channel:
-                            continue
-                            
-                        message = await channel.fetch_message(int(message_id))
-                        if not message:
-                            continue
-                            
-                        reaction = disnake.utils.get(message.reactions, emoji="🎉")
-                        if not reaction:
-                            continue
-                            
-                        users = [user async for user in reaction.users() if not user.bot]
+            # Из индекса извлекаются только розыгрыши, время которых истекло
+            for message_id, data in await self.giveaway_manager.pop_due(current_time):
+                try:
+                    guild = self.bot.get_guild(data['guild_id'])
+                    if not guild:
+                        continue
                         
-                        if not users:
-                            await channel.send(f"❌ Розыгрыш завершен, но никто не участвовал! Приз: {data['prize']}")
-                        else:
-                            winners = random.sample(users, min(data['winners'], len(users)))
-                            await channel.send(
-                                f"🎉 Розыгрыш завершен! Приз: {data['prize']}\n"
-                                f"Победители: {', '.join(w.mention for w in winners)}!"
-                            )
-                            
-                        # Обновление эмбеда
-                        embed = message.embeds[0]
-                        embed.description = embed.description.replace(
-                            "Нажмите на 🎉 чтобы участвовать!",
-                            "Розыгрыш завершен!"
-                        )
-                        await message.edit(embed=embed)
+                    channel = guild.get_channel(data['channel_id'])
+                    if not channel:
+                        continue
+                        
+                    message = await channel.fetch_message(int(message_id))
+                    if not message:
+                        continue
                         
-                        # Отмечаем розыгрыш как завершенный
-                        data['ended'] = True
-                        await self.giveaway_manager.save_giveaway(int(message_id), data)
+                    reaction = disnake.utils.get(message.reactions, emoji="🎉")
+                    if not reaction:
+                        continue
+                        
+                    users = [user async for user in reaction.users() if not user.bot]
+                    
+                    if not users:
+                        await channel.send(f"❌ Розыгрыш завершен, но никто не участвовал! Приз: {data['prize']}")
+                    else:
+                        winners = random.sample(users, min(data['winners'], len(users)))
+                        await channel.send(
+                            f"🎉 Розыгрыш завершен! Приз: {data['prize']}\n"
+                            f"Победители: {', '.join(w.mention for w in winners)}!"
+                        )
                         
-                    except Exception as e:
-                        print(f"Ошибка при завершении розыгрыша {message_id}: {e}")
+                    # Обновление эмбеда
+                    embed = message.embeds[0]
+                    embed.description = embed.description.replace(
+                        "Нажмите на 🎉 чтобы участвовать!",
+                        "Розыгрыш завершен!"
+                    )
+                    await message.edit(embed=embed)
+                    
+                    # Отмечаем розыгрыш как завершенный
+                    data['ended'] = True
+                    await self.giveaway_manager.save_giveaway(int(message_id), data)
+                    
+                except Exception as e:
+                    print(f"Ошибка при завершении розыгрыша {message_id}: {e}")
+                finally:
+                    # Незавершенный розыгрыш (канал недоступен и т.п.) проверяется снова на следующей итерации
+                    if not data['ended']:
+                        self.giveaway_manager.schedule(message_id)
                         
         except Exception as e:
             print(f"Ошибка при проверке розыгрышей: {e}")
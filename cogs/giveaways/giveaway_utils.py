@@ -1,37 +1,64 @@
-import json
+import heapq
 import os
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import disnake
 from datetime import datetime, timedelta
+from storage import OffloopWriter, open_backend
 
 class GiveawayManager:
     def __init__(self):
         self.giveaway_file = 'data/giveaways.json'
+        self.backend = open_backend('giveaways', self.giveaway_file)
+        self.writer = OffloopWriter(self.backend)
+        # Кэш розыгрышей и min-куча (end_time, message_id) активных розыгрышей
+        self.giveaways: Optional[Dict] = None
+        self._by_end_time: List[Tuple[float, str]] = []
 
     async def load_giveaways(self) -> Dict:
-        """Загрузка активных розыгрышей"""
-        try:
-            with open(self.giveaway_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except FileNotFoundError:
-            return {}
+        """Загрузка розыгрышей (хранилище читается только при первом обращении)"""
+        if self.giveaways is None:
+            self.giveaways = await self.writer.load() or {}
+            self._by_end_time = [
+                (data['end_time'], message_id)
+                for message_id, data in self.giveaways.items() if not data.get('ended')
+            ]
+            heapq.heapify(self._by_end_time)
+        return self.giveaways
             
     async def save_giveaway(self, message_id: int, data: Dict):
         """Сохранение розыгрыша"""
         giveaways = await self.load_giveaways()
         giveaways[str(message_id)] = data
-        self._save_data(giveaways)
+        if not data.get('ended'):
+            self.schedule(str(message_id))
+        await self._save_data(giveaways)
         
     async def remove_giveaway(self, message_id: int):
         """Удаление розыгрыша"""
         giveaways = await self.load_giveaways()
         if str(message_id) in giveaways:
             del giveaways[str(message_id)]
-            self._save_data(giveaways)
+            await self._save_data(giveaways)
+
+    def schedule(self, message_id: str):
+        """Добавляет активный розыгрыш в индекс по времени окончания"""
+        heapq.heappush(self._by_end_time, (self.giveaways[message_id]['end_time'], message_id))
+
+    async def pop_due(self, now: float) -> List[Tuple[str, Dict]]:
+        """Извлекает из индекса активные розыгрыши, время которых истекло"""
+        giveaways = await self.load_giveaways()
+        due = []
+        while self._by_end_time and self._by_end_time[0][0] <= now:
+            end_time, message_id = heapq.heappop(self._by_end_time)
+            data = giveaways.get(message_id)
+            # Устаревшие записи: розыгрыш удалён, завершён или перенесён
+            if data is None or data.get('ended') or data['end_time'] != end_time:
+                continue
+            due.append((message_id, data))
+        return due
             
-    def _save_data(self, data: Dict):
-        with open(self.giveaway_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+    async def _save_data(self, data: Dict):
+        await self.writer.save(data)
 
     def format_time(self, seconds: int) -> str:
         """Форматирование времени"""
@@ -0,0 +1,40 @@
+from typing import Dict, List
+
+# Интервал применения накопленного опыта, секунды
+FLUSH_INTERVAL = 5
+
+
+class XPAccumulator:
+    """Накопитель приращений опыта за сообщения.
+
+    Обработчик сообщения только складывает приращение в словарь
+    {сервер: {участник: [xp, messages, voice]}}; применение к таблице,
+    проверка повышения уровня и запись в журнал выполняются пакетом раз в
+    FLUSH_INTERVAL секунд, по одному разу на участника."""
+
+    def __init__(self):
+        self._pending: Dict[int, Dict[int, List]] = {}
+        self.enqueued = 0
+        self.flushes = 0
+
+    def add(self, guild_id: int, user_id: int, xp: int, messages: int = 1):
+        users = self._pending.get(guild_id)
+        if users is None:
+            users = self._pending[guild_id] = {}
+        delta = users.get(user_id)
+        if delta is None:
+            users[user_id] = [xp, messages, 0.0]
+        else:
+            delta[0] += xp
+            delta[1] += messages
+        self.enqueued += 1
+
+    def drain(self) -> Dict[int, Dict[int, List]]:
+        """Забирает все накопленные приращения"""
+        pending, self._pending = self._pending, {}
+        if pending:
+            self.flushes += 1
+        return pending
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._pending.values())
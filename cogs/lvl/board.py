@@ -0,0 +1,38 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+import disnake
+
+# Число участников в закреплённой таблице лидеров
+BOARD_SIZE = 10
+
+
+def top_signature(partition) -> Tuple:
+    """Состав и значения топа по опыту: если они не изменились, таблицу не нужно перерисовывать"""
+    users = partition.data['users']
+    return tuple(
+        (user_id, users.get_field(user_id, 'xp'), users.get_field(user_id, 'level'))
+        for user_id in partition.ranks.top('xp', BOARD_SIZE)
+    )
+
+
+def render(signature: Tuple, names: List[Optional[str]], interval: int) -> disnake.Embed:
+    """Встраивание закреплённой таблицы лидеров"""
+    lines = [
+        f"**{i}.** {name or f'<@{user_id}>'} — уровень {level}, {xp:,} XP"
+        for i, ((user_id, xp, level), name) in enumerate(zip(signature, names), 1)
+    ]
+    embed = disnake.Embed(
+        title="Таблица лидеров по опыту",
+        description="\n".join(lines) if lines else "Пока нет данных для таблицы лидеров!",
+        color=disnake.Color.gold()
+    )
+    embed.set_footer(text=f"Обновляется каждые {max(interval // 60, 1)} мин.")
+    return embed
+
+
+def content_hash(embed: disnake.Embed) -> str:
+    """Хэш отображаемого содержимого сообщения"""
+    content: Dict = embed.to_dict()
+    return hashlib.sha1(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
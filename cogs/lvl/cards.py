@@ -0,0 +1,132 @@
+# Отрисовка карточек уровня и таблиц лидеров. Функции модуля выполняются
+# в потоках ThreadPoolExecutor: принимают только простые данные
+# (словари, байты аватаров) и возвращают PNG.
+import io
+import os
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageDraw, ImageFont
+
+CARD_SIZE = (934, 282)
+AVATAR_SIZE = 180
+ROW_HEIGHT = 72
+BOARD_WIDTH = 800
+
+BACKGROUND = (35, 39, 42)
+PANEL = (47, 49, 54)
+ACCENT = (88, 101, 242)
+TEXT = (255, 255, 255)
+MUTED = (185, 187, 190)
+GOLD = (250, 166, 26)
+
+# Шрифт с кириллицей; путь можно переопределить переменной окружения
+FONT = os.getenv('CARD_FONT', 'DejaVuSans.ttf')
+BOLD_FONT = os.getenv('CARD_BOLD_FONT', 'DejaVuSans-Bold.ttf')
+
+
+# Шрифты FreeType нельзя использовать из нескольких потоков одновременно: кэш у каждого потока свой
+_fonts = threading.local()
+
+
+def font(size: int, bold: bool = False) -> ImageFont.ImageFont:
+    cache = _fonts.__dict__.setdefault('cache', {})
+    key = (size, bold)
+    if key not in cache:
+        try:
+            cache[key] = ImageFont.truetype(BOLD_FONT if bold else FONT, size)
+        except OSError:
+            cache[key] = ImageFont.load_default(size)
+    return cache[key]
+
+
+@lru_cache(maxsize=None)
+def circle_mask(size: int) -> Image.Image:
+    # Маска рисуется в 4 раза крупнее и уменьшается для сглаживания края
+    mask = Image.new('L', (size * 4, size * 4), 0)
+    ImageDraw.Draw(mask).ellipse((0, 0, size * 4, size * 4), fill=255)
+    return mask.resize((size, size), Image.LANCZOS)
+
+
+def round_avatar(avatar: Optional[bytes], size: int) -> Image.Image:
+    """Круглый аватар; без аватара — круг цвета акцента"""
+    if avatar:
+        try:
+            image = Image.open(io.BytesIO(avatar)).convert('RGBA').resize((size, size), Image.LANCZOS)
+        except OSError:
+            image = Image.new('RGBA', (size, size), ACCENT)
+    else:
+        image = Image.new('RGBA', (size, size), ACCENT)
+    result = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    result.paste(image, (0, 0), circle_mask(size))
+    return result
+
+
+def fit_text(draw: ImageDraw.ImageDraw, text: str, text_font, width: int) -> str:
+    """Обрезает текст с многоточием, чтобы он поместился в ширину"""
+    if draw.textlength(text, font=text_font) <= width:
+        return text
+    while text and draw.textlength(text + '…', font=text_font) > width:
+        text = text[:-1]
+    return text + '…'
+
+
+def to_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    # Фон непрозрачный, поэтому без альфа-канала; быстрое сжатие ценой чуть большего файла
+    image.convert('RGB').save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+def render_rank_card(card: Dict, avatar: Optional[bytes]) -> bytes:
+    """Карточка уровня: name, level, rank, progress (0–100)"""
+    width, height = CARD_SIZE
+    image = Image.new('RGBA', CARD_SIZE, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.rounded_rectangle((16, 16, width - 16, height - 16), radius=24, fill=PANEL)
+
+    rounded = round_avatar(avatar, AVATAR_SIZE)
+    image.paste(rounded, (48, (height - AVATAR_SIZE) // 2), rounded)
+
+    left = 48 + AVATAR_SIZE + 40
+    right = width - 56
+    draw.text((left, 58), fit_text(draw, card['name'], font(40, True), right - left - 260), font=font(40, True), fill=TEXT)
+
+    level_text = f"Уровень {card['level']}"
+    draw.text((right, 58), level_text, font=font(36, True), fill=ACCENT, anchor='ra')
+    draw.text((left, 112), f"Место #{card['rank']}", font=font(26), fill=MUTED)
+
+    # Полоса прогресса до следующего уровня
+    bar_top, bar_bottom = 170, 206
+    draw.rounded_rectangle((left, bar_top, right, bar_bottom), radius=18, fill=BACKGROUND)
+    progress = max(0, min(card['progress'], 100))
+    if progress > 0:
+        filled = left + max(int((right - left) * progress / 100), bar_bottom - bar_top)
+        draw.rounded_rectangle((left, bar_top, filled, bar_bottom), radius=18, fill=ACCENT)
+    draw.text((right, bar_top - 12), f"{progress}%", font=font(24), fill=MUTED, anchor='rb')
+    return to_png(image)
+
+
+def render_leaderboard(title: str, rows: List[Dict], avatars: List[Optional[bytes]]) -> bytes:
+    """Таблица лидеров: строки с position, name, value"""
+    avatar_size = ROW_HEIGHT - 16
+    height = 80 + ROW_HEIGHT * max(len(rows), 1) + 16
+    image = Image.new('RGBA', (BOARD_WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.text((32, 24), fit_text(draw, title, font(32, True), BOARD_WIDTH - 64), font=font(32, True), fill=TEXT)
+
+    for i, (row, avatar) in enumerate(zip(rows, avatars)):
+        top = 80 + i * ROW_HEIGHT
+        draw.rounded_rectangle((16, top, BOARD_WIDTH - 16, top + ROW_HEIGHT - 8), radius=14, fill=PANEL)
+        color = GOLD if row['position'] == 1 else TEXT
+        draw.text((56, top + (ROW_HEIGHT - 8) // 2), f"{row['position']}", font=font(28, True), fill=color, anchor='mm')
+        rounded = round_avatar(avatar, avatar_size)
+        image.paste(rounded, (96, top + (ROW_HEIGHT - 8 - avatar_size) // 2), rounded)
+        value_font = font(24)
+        value_width = int(draw.textlength(row['value'], font=value_font))
+        name_left = 96 + avatar_size + 20
+        name = fit_text(draw, row['name'], font(26), BOARD_WIDTH - 48 - value_width - 24 - name_left)
+        draw.text((name_left, top + (ROW_HEIGHT - 8) // 2), name, font=font(26), fill=TEXT, anchor='lm')
+        draw.text((BOARD_WIDTH - 40, top + (ROW_HEIGHT - 8) // 2), row['value'], font=value_font, fill=MUTED, anchor='rm')
+    return to_png(image)
@@ -0,0 +1,51 @@
+import time
+from typing import Callable, Dict, Optional
+
+
+class CooldownStore:
+    """Задержка между начислениями опыта участнику.
+
+    Для каждого участника хранится только момент последнего начисления
+    (time.monotonic) в словаре сервера, без объекта-корзины на участника.
+    Длительность задержки передаётся при каждой проверке, поэтому
+    изменение настройки сервера действует сразу и не сбрасывает отметки.
+    Устаревшие отметки удаляет sweep."""
+
+    def __init__(self):
+        self._last: Dict[int, Dict[int, float]] = {}  # сервер: {участник: последнее начисление}
+
+    def try_acquire(self, guild_id: int, user_id: int, cooldown: float, now: Optional[float] = None) -> bool:
+        """True и новая отметка, если задержка истекла; иначе False"""
+        now = time.monotonic() if now is None else now
+        users = self._last.get(guild_id)
+        if users is None:
+            users = self._last[guild_id] = {}
+        last = users.get(user_id)
+        if last is not None and now - last < cooldown:
+            return False
+        users[user_id] = now
+        return True
+
+    def sweep(self, cooldown_for: Callable[[int], Optional[float]], now: Optional[float] = None) -> int:
+        """Удаляет отметки, задержка которых уже истекла; возвращает их число.
+
+        cooldown_for возвращает задержку сервера или None, если сервер
+        выгружен из памяти — тогда его отметки удаляются целиком."""
+        now = time.monotonic() if now is None else now
+        removed = 0
+        for guild_id, users in list(self._last.items()):
+            cooldown = cooldown_for(guild_id)
+            if cooldown is None:
+                removed += len(users)
+                del self._last[guild_id]
+                continue
+            expired = [user_id for user_id, last in users.items() if now - last >= cooldown]
+            for user_id in expired:
+                del users[user_id]
+            removed += len(expired)
+            if not users:
+                del self._last[guild_id]
+        return removed
+
+    def __len__(self) -> int:
+        return sum(len(users) for users in self._last.values())
@@ -0,0 +1,88 @@
+import abc
+import math
+from array import array
+from typing import Dict
+
+
+class LevelCurve(abc.ABC):
+    """Кривая уровней: порог опыта для уровня и обратное преобразование.
+
+    Подклассы задают порог и уровень по опыту в замкнутом виде."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+
+    @abc.abstractmethod
+    def xp_for_level(self, level: int) -> int:
+        """Опыт, необходимый для достижения уровня"""
+
+    @abc.abstractmethod
+    def level_for_xp(self, xp: int) -> int:
+        """Наибольший уровень, порог которого не превышает xp"""
+
+    def progress(self, xp: int, level: int) -> float:
+        """Прогресс до следующего уровня в процентах"""
+        current_level_xp = self.xp_for_level(level)
+        next_level_xp = self.xp_for_level(level + 1)
+        return (xp - current_level_xp) / (next_level_xp - current_level_xp) * 100
+
+    def recompute(self, users) -> int:
+        """Пересчитывает уровни всех пользователей таблицы; возвращает число изменённых"""
+        old_levels = users.column('level')
+        new_levels = array(old_levels.typecode, map(self.level_for_xp, users.column('xp')))
+        changed = sum(1 for old, new in zip(old_levels, new_levels) if old != new)
+        users.replace_column('level', new_levels)
+        return changed
+
+
+class QuadraticCurve(LevelCurve):
+    """Порог a·L² + b·L + c, уровень по опыту вычисляется по формуле корней"""
+
+    def __init__(self, name: str, description: str, a: int, b: int, c: int):
+        self.a, self.b, self.c = a, b, c
+        super().__init__(name, description)
+
+    def xp_for_level(self, level: int) -> int:
+        return self.a * level ** 2 + self.b * level + self.c
+
+    def level_for_xp(self, xp: int) -> int:
+        if xp < self.xp_for_level(1):
+            return 0
+        level = int((-self.b + math.sqrt(self.b ** 2 - 4 * self.a * (self.c - xp))) / (2 * self.a))
+        # Поправка на погрешность вещественной арифметики
+        while self.xp_for_level(level + 1) <= xp:
+            level += 1
+        while level > 0 and self.xp_for_level(level) > xp:
+            level -= 1
+        return level
+
+
+class LinearCurve(LevelCurve):
+    """Порог step·L + base: каждый уровень стоит одинаково"""
+
+    def __init__(self, name: str, description: str, step: int, base: int):
+        self.step, self.base = step, base
+        super().__init__(name, description)
+
+    def xp_for_level(self, level: int) -> int:
+        return self.step * level + self.base
+
+    def level_for_xp(self, xp: int) -> int:
+        return max((xp - self.base) // self.step, 0)
+
+
+# Кривые, доступные серверам (settings['level_curve'])
+CURVES: Dict[str, LevelCurve] = {
+    curve.name: curve for curve in (
+        QuadraticCurve('classic', "Стандартная: 5·L² + 50·L + 100", 5, 50, 100),
+        QuadraticCurve('gentle', "Пологая: 2·L² + 40·L + 100", 2, 40, 100),
+        LinearCurve('linear', "Линейная: 200·L + 100", 200, 100),
+    )
+}
+DEFAULT_CURVE = CURVES['classic']
+
+
+def get_curve(name: str) -> LevelCurve:
+    """Кривая по имени; неизвестное имя означает стандартную кривую"""
+    return CURVES.get(name, DEFAULT_CURVE)
@@ -0,0 +1,158 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class XPJournal:
+    """Журнал приращений опыта.
+
+    Каждое начисление дописывается в конец файла короткой строкой
+    [seq, user_id, xp, messages, voice, время], поэтому его
+    стоимость не зависит от числа пользователей. Снимок хранит номер
+    последней учтённой записи (journal_seq), что делает повторное
+    воспроизведение журнала после сбоя безопасным.
+
+    При очистке после снимка текущий файл переименовывается в старый
+    сегмент (path.old), новые записи идут в новый файл, а старый сегмент
+    переписывается в рабочем потоке. Воспроизводятся оба файла."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.old_path = f"{path}.old"
+        self.seq = 0
+        self.pending = 0  # записей с момента последнего снимка
+        self._file = None
+        self._compacting = False
+
+    def replay(self, data: Dict, new_user: Callable[[], Dict], on_record: Optional[Callable] = None) -> Set[str]:
+        """Применяет к снимку записи журнала, которых в нём ещё нет.
+
+        on_record(user_id, xp, messages, voice, at) вызывается для каждой применённой записи;
+        at — время начисления (None у записей без времени)."""
+        last_seq = data.get('journal_seq', 0)
+        self.seq = last_seq
+        self.pending = 0
+        touched = set()
+        users = data.setdefault('users', {})
+        for record in self._records():
+            seq, user_id, xp, messages, voice = record[:5]
+            if seq <= last_seq:
+                continue
+
+            user_data = users.setdefault(user_id, new_user())
+            user_data['xp'] += xp
+            user_data['total_messages'] += messages
+            user_data['voice_time'] += voice
+            if on_record is not None:
+                at = datetime.fromtimestamp(record[5]) if len(record) > 5 else None
+                on_record(user_id, xp, messages, voice, at)
+
+            touched.add(user_id)
+            self.seq = max(self.seq, seq)
+            self.pending += 1
+        return touched
+
+    def _records(self) -> Iterator[List]:
+        """Записи старого сегмента, затем текущего файла"""
+        for path in (self.old_path, self.path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Оборванная последняя строка после аварийного завершения
+                        continue
+
+    def append(self, user_id: str, xp: int = 0, messages: int = 0, voice: float = 0):
+        """Дописывает приращение в журнал"""
+        self.seq += 1
+        self._write([[self.seq, user_id, xp, messages, round(voice, 3), int(time.time())]])
+
+    def append_many(self, entries: Iterable[Tuple[str, int, int, float]]):
+        """Дописывает пакет приращений (user_id, xp, messages, voice) одной записью в файл"""
+        records = []
+        now = int(time.time())
+        for user_id, xp, messages, voice in entries:
+            self.seq += 1
+            records.append([self.seq, user_id, xp, messages, round(voice, 3), now])
+        if records:
+            self._write(records)
+
+    def _write(self, records: List[List]):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records))
+        self._file.flush()
+        self.pending += len(records)
+
+    def truncate(self):
+        """Очищает журнал после записи снимка, включающего все его записи"""
+        self.close()
+        if os.path.exists(self.path):
+            open(self.path, 'w', encoding='utf-8').close()
+        # Старый сегмент, который сейчас переписывается, удалит рабочий поток
+        if not self._compacting and os.path.exists(self.old_path):
+            os.remove(self.old_path)
+        self.pending = 0
+
+    async def discard_through(self, seq: int):
+        """Удаляет записи, вошедшие в снимок с journal_seq == seq.
+
+        Записи, добавленные пока снимок записывался, остаются в журнале.
+        Файл переписывается в рабочем потоке."""
+        if self._rotate(seq):
+            self._compacting = True
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self._compact, seq)
+            finally:
+                self._compacting = False
+
+    def discard_through_sync(self, seq: int):
+        """Синхронная очистка (при завершении работы)"""
+        if self._rotate(seq):
+            self._compact(seq)
+
+    def _rotate(self, seq: int) -> bool:
+        """Переносит текущий файл в старый сегмент; True, если сегмент нужно переписать"""
+        if seq >= self.seq:
+            self.truncate()
+            return False
+        # Записи после seq нумеруются подряд
+        self.pending = self.seq - seq
+        if self._compacting:
+            # Уже вошедшие в снимок записи пропускаются при воспроизведении
+            return False
+        self.close()
+        if os.path.exists(self.path) and not os.path.exists(self.old_path):
+            os.replace(self.path, self.old_path)
+        return os.path.exists(self.old_path)
+
+    def _compact(self, seq: int):
+        kept = []
+        with open(self.old_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    if json.loads(line)[0] > seq:
+                        kept.append(line)
+                except ValueError:
+                    continue
+        if not kept:
+            os.remove(self.old_path)
+            return
+        tmp_path = f"{self.old_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.writelines(kept)
+        os.replace(tmp_path, self.old_path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
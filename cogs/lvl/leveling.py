@@ -1,18 +1,35 @@
 import disnake
-from disnake.ext import commands
-import json
-import os
+from disnake.ext import commands, tasks
+import copy
+import io
 from datetime import datetime, timedelta
 import random
+import time
+from storage import PartitionedStore, open_backend, open_guild_backend
+from storage.backends import LEGACY_GUILD_ID, guild_path
+from . import board
+from .accumulator import FLUSH_INTERVAL, XPAccumulator
+from .cooldowns import CooldownStore
+from .curves import CURVES, DEFAULT_CURVE, get_curve
+from .journal import XPJournal
+from .migrations import migrations
+from .partition import GuildLevels
+from .periods import PERIODS
+from .render import CardRenderer
+from .voice import VoiceSessions
+
+# Строк в одном объявлении о повышениях уровня
+ANNOUNCEMENT_LINES = 30
 
 class Leveling(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.xp_cooldown = commands.CooldownMapping.from_cooldown(1, 60, commands.BucketType.member)
-        self.voice_cooldown = commands.CooldownMapping.from_cooldown(1, 300, commands.BucketType.member)
+        # Задержка между начислениями за сообщения берётся из настроек сервера (xp_cooldown)
+        self.cooldowns = CooldownStore()
+        # Общие файлы, созданные до разделения данных по серверам
         self.data_file = 'cogs/lvl/lvl_data.json'
         self.backup_file = 'cogs/lvl/lvl_data_backup.json'
-        self.last_save = datetime.now()
+        self.journal_file = 'cogs/lvl/lvl_data.journal'
         
         # Создаем начальные настройки
         self.default_settings = {
@@ -20,7 +37,7 @@ class Leveling(commands.Cog):
             'xp_per_message': 5,
             'xp_per_voice_minute': 2,
             'xp_cooldown': 20,
-            'voice_cooldown': 100,
+            'level_curve': DEFAULT_CURVE.name,
             'level_roles': {},
             'rewards': {},
             'announcements': {
@@ -34,229 +51,328 @@ class Leveling(commands.Cog):
             }
         }
         
-        # Загружаем данные из файла
-        self.data = self.load_data()
+        # Данные серверов загружаются при первом обращении
+        self.guilds = PartitionedStore('leveling', self.load_guild)
+        self.compact_journal.start()
+        self.update_leaderboards.start()
+        # Участники в голосовых каналах; опыт начисляется раз в минуту
+        self.voice = VoiceSessions()
+        self.voice_tick.start()
+        # Опыт за сообщения, ещё не применённый к данным
+        self.pending_xp = XPAccumulator()
+        self.flush_xp.start()
+        # Изображения карточек и таблиц лидеров (при установленном Pillow)
+        self.renderer = CardRenderer()
+
+    def cog_unload(self):
+        self.compact_journal.cancel()
+        self.update_leaderboards.cancel()
+        self.voice_tick.cancel()
+        self.flush_xp.cancel()
+        # Накопленный опыт применяется без объявлений о повышении уровня
+        for guild_id, deltas in self.pending_xp.drain().items():
+            partition = self.guilds.get(guild_id)
+            partition.apply(deltas, self.get_curve(partition.data), self.new_user)
+        # Цикл событий уже может быть остановлен, поэтому пишем синхронно
+        self.guilds.flush()
+        for partition in self.guilds.partitions.values():
+            partition.close()
+        self.renderer.close()
+
+    @staticmethod
+    def new_user():
+        """Данные нового пользователя"""
+        return {
+            'xp': 0,
+            'level': 0,
+            'total_messages': 0,
+            'voice_time': 0,
+            'last_voice_update': None
+        }
 
-    def load_data(self):
-        """Загружает данные из файла"""
+    def new_guild_data(self):
+        """Данные сервера без единого пользователя"""
+        return migrations.stamp({
+            'settings': copy.deepcopy(self.default_settings),
+            'users': {},
+            'last_update': datetime.now().isoformat()
+        })
+
+    def load_guild(self, guild_id):
+        """Загружает снимок данных сервера и применяет к нему журнал"""
+        backend = open_guild_backend('leveling', guild_id, backup=True)
+        journal = XPJournal(guild_path(guild_id, 'leveling.journal'))
+        migrated = False
         try:
-            # Создаем директорию, если её нет
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            
-            # Пробуем загрузить основной файл
-            if os.path.exists(self.data_file) and os.path.getsize(self.data_file) > 0:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-            # Если основной файл не существует или пуст, пробуем загрузить бэкап
-            elif os.path.exists(self.backup_file) and os.path.getsize(self.backup_file) > 0:
-                with open(self.backup_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print("Загружены данные из резервной копии")
-            else:
-                # Создаем новую структуру данных
-                data = {
-                    'settings': self.default_settings,
-                    'users': {},
-                    'last_update': datetime.now().isoformat()
-                }
-                print("Создана новая структура данных")
-            
-            print(f"Данные уровней успешно загружены из {self.data_file}")
-            return data
-            
+            # Основной файл, при его отсутствии — резервная копия
+            data = backend.load()
+            if data is None and guild_id == LEGACY_GUILD_ID:
+                data = self.load_legacy()
+                migrated = data is not None
         except Exception as e:
-            print(f"Ошибка при загрузке данных уровней: {e}")
-            # Создаем пустую структуру данных
-            data = {
-                'settings': self.default_settings,
-                'users': {},
-                'last_update': datetime.now().isoformat()
-            }
-            print("Создана пустая структура данных с начальными настройками")
-            return data
+            print(f"Ошибка при загрузке данных уровней сервера {guild_id}: {e}")
+            data = None
+
+        created = data is None
+        if created:
+            data = self.new_guild_data()
+        # Миграции выполняются один раз: версия записывается вместе с данными
+        elif migrations.apply(data, self):
+            migrated = True
+        # В памяти пользователи хранятся компактной таблицей
+        GuildLevels.prepare(data)
+
+        # Начисления, сделанные после последнего снимка; в счётчики периодов — по времени записи
+        periods = data['periods']
+
+        def credit_period(user_id, xp, messages, voice, at):
+            if at is not None:
+                periods.add(int(user_id), xp, messages, voice, now=at)
+
+        touched = journal.replay(data, self.new_user, credit_period)
+        curve = self.get_curve(data)
+        for user_id in touched:
+            data['users'][user_id]['level'] = self.calculate_level(data['users'][user_id]['xp'], curve)
+        if touched:
+            print(f"Сервер {guild_id}: из журнала восстановлено записей: {journal.pending}")
+
+        partition = GuildLevels(guild_id, backend, data, journal)
+        if created or migrated:
+            partition.mark_dirty()
+        return partition
+
+    def load_legacy(self):
+        """Общие данные уровней вместе с их журналом"""
+        data = open_backend('leveling', self.data_file, self.backup_file).load()
+        if data is None:
+            return None
+        XPJournal(self.journal_file).replay(data, self.new_user)
+        # Журнал сервера начинается заново
+        data['journal_seq'] = 0
+        print(f"Данные уровней перенесены из {self.data_file} в раздел сервера {LEGACY_GUILD_ID}")
+        return data
+
+    def guild_data(self, guild_id):
+        """Данные уровней сервера"""
+        return self.guilds.get(guild_id).data
+
+    def save_data(self, guild_id):
+        """Помечает данные сервера как изменённые; снимок запишет фоновая задача (compact_journal)"""
+        self.guilds.mark_dirty(guild_id)
+
+    @tasks.loop(minutes=5)
+    async def compact_journal(self):
+        """Периодически сворачивает журналы в снимки и выгружает неактивные серверы"""
+        await self.guilds.save_pending()
+        await self.guilds.evict_idle()
+        # Отметки задержки, которые уже ничего не блокируют
+        self.cooldowns.sweep(self.loaded_cooldown)
+
+    def loaded_cooldown(self, guild_id):
+        """Задержка начисления сервера, если его данные загружены"""
+        partition = self.guilds.partitions.get(guild_id)
+        return partition.data['settings']['xp_cooldown'] if partition else None
+
+    @compact_journal.before_loop
+    async def before_compact_journal(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(minutes=1)
+    async def update_leaderboards(self):
+        """Обновляет закреплённые таблицы лидеров серверов, загруженных в память"""
+        # Выгруженный сервер неактивен с момента выгрузки, его топ не менялся
+        now = time.monotonic()
+        for partition in list(self.guilds.partitions.values()):
+            settings = partition.data['settings'].get('leaderboard') or {}
+            if not settings.get('message_id') or not settings.get('channel_id'):
+                continue
+            if now - partition.board_checked < settings.get('update_interval', 300):
+                continue
+            partition.board_checked = now
+            try:
+                await self.refresh_leaderboard(partition)
+            except Exception as e:
+                print(f"Ошибка при обновлении таблицы лидеров сервера {partition.guild_id}: {e}")
+
+    @update_leaderboards.before_loop
+    async def before_update_leaderboards(self):
+        await self.bot.wait_until_ready()
+
+    async def refresh_leaderboard(self, partition, force=False):
+        """Перерисовывает таблицу лидеров, только если топ изменился; возвращает True, если сообщение изменено"""
+        settings = partition.data['settings']['leaderboard']
+        signature = board.top_signature(partition)
+        if signature == partition.board_signature and not force:
+            return False
+
+        guild = self.bot.get_guild(partition.guild_id)
+        channel = guild.get_channel(settings['channel_id']) if guild else None
+        if channel is None:
+            return False
+
+        users = await self.bot.user_resolver.resolve_many((user_id for user_id, _, _ in signature), guild)
+        embed = board.render(signature, [user.display_name if user else None for user in users], settings['update_interval'])
+        digest = board.content_hash(embed)
+        partition.board_signature = signature
+        # Содержимое совпадает с уже опубликованным: запрос к API не нужен
+        if digest == settings.get('content_hash') and not force:
+            return False
 
-    def save_data(self, guild_id, force=False):
-        """Сохраняет данные"""
         try:
-            # Создаем директорию, если её нет
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            
-            # Обновляем время последнего обновления
-            self.data['last_update'] = datetime.now().isoformat()
-            
-            # Сначала сохраняем в бэкап
-            with open(self.backup_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
-            
-            # Затем сохраняем в основной файл
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=4)
-            
-            # Обновляем время последнего сохранения
-            self.last_save = datetime.now()
-            
-            print(f"Данные уровней успешно сохранены в {self.data_file}")
-            
-        except Exception as e:
-            print(f"Ошибка при сохранении данных уровней: {e}")
-            # Пробуем восстановить из бэкапа при ошибке
-            try:
-                if os.path.exists(self.backup_file):
-                    with open(self.backup_file, 'r', encoding='utf-8') as f:
-                        backup_data = json.load(f)
-                    with open(self.data_file, 'w', encoding='utf-8') as f:
-                        json.dump(backup_data, f, ensure_ascii=False, indent=4)
-                    print("Данные восстановлены из резервной копии")
-            except Exception as backup_error:
-                print(f"Ошибка при восстановлении из резервной копии: {backup_error}")
-
-    def calculate_level(self, xp):
+            await channel.get_partial_message(settings['message_id']).edit(embed=embed)
+        except disnake.NotFound:
+            # Сообщение удалено: автообновление отключается
+            settings['message_id'] = None
+            settings['content_hash'] = None
+            partition.mark_dirty()
+            return False
+        settings['content_hash'] = digest
+        partition.mark_dirty()
+        return True
+
+    def get_curve(self, data):
+        """Кривая уровней сервера"""
+        return get_curve(data['settings'].get('level_curve', DEFAULT_CURVE.name))
+
+    def calculate_level(self, xp, curve=DEFAULT_CURVE):
         """Вычисляет уровень на основе опыта"""
-        level = 0
-        while xp >= self.get_xp_for_level(level + 1):
-            level += 1
-        return level
+        return curve.level_for_xp(xp)
 
-    def get_xp_for_level(self, level):
+    def get_xp_for_level(self, level, curve=DEFAULT_CURVE):
         """Вычисляет необходимый опыт для достижения уровня"""
-        return 5 * (level ** 2) + 50 * level + 100
+        return curve.xp_for_level(level)
 
-    def get_progress(self, xp, level):
+    def get_progress(self, xp, level, curve=DEFAULT_CURVE):
         """Вычисляет прогресс до следующего уровня"""
-        current_level_xp = self.get_xp_for_level(level)
-        next_level_xp = self.get_xp_for_level(level + 1)
-        return (xp - current_level_xp) / (next_level_xp - current_level_xp) * 100
+        return curve.progress(xp, level)
 
     @commands.Cog.listener()
     async def on_message(self, message):
-        if not self.data['settings']['enabled'] or message.author.bot:
+        if message.author.bot or not message.guild:
             return
 
-        # Проверяем кулдаун
-        bucket = self.xp_cooldown.get_bucket(message)
-        if bucket.update_rate_limit():
+        data = self.guild_data(message.guild.id)
+        if not data['settings']['enabled']:
             return
 
-        # Получаем или создаем данные пользователя
-        user_id = str(message.author.id)
-        if user_id not in self.data['users']:
-            self.data['users'][user_id] = {
-                'xp': 0,
-                'level': 0,
-                'total_messages': 0,
-                'voice_time': 0,
-                'last_voice_update': None
-            }
-
-        user_data = self.data['users'][user_id]
-        old_level = user_data['level']
-
-        # Добавляем опыт
-        user_data['xp'] += self.data['settings']['xp_per_message']
-        user_data['total_messages'] += 1
-
-        # Проверяем повышение уровня
-        new_level = self.calculate_level(user_data['xp'])
-        if new_level > old_level:
-            user_data['level'] = new_level
-            await self.handle_level_up(message.author, new_level)
+        # Проверяем кулдаун
+        if not self.cooldowns.try_acquire(message.guild.id, message.author.id, data['settings']['xp_cooldown']):
+            return
 
-        # Сохраняем данные
-        self.save_data(message.guild.id if message.guild else 0)
+        # Опыт применяется к данным пакетом в flush_xp
+        self.pending_xp.add(message.guild.id, message.author.id, data['settings']['xp_per_message'])
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member, before, after):
-        if not self.data['settings']['enabled'] or member.bot:
-            return
-
-        # Проверяем кулдаун
-        bucket = self.voice_cooldown.get_bucket(member)
-        if bucket.update_rate_limit():
+        if member.bot:
             return
 
-        user_id = str(member.id)
-        if user_id not in self.data['users']:
-            self.data['users'][user_id] = {
-                'xp': 0,
-                'level': 0,
-                'total_messages': 0,
-                'voice_time': 0,
-                'last_voice_update': None
-            }
-
-        user_data = self.data['users'][user_id]
-
-        # Если пользователь присоединился к голосовому каналу
-        if after.channel and (not before.channel or before.channel != after.channel):
-            user_data['last_voice_update'] = datetime.now().isoformat()
-            self.save_data(member.guild.id)
-        # Если пользователь покинул голосовой канал
-        elif before.channel and (not after.channel or before.channel != after.channel):
-            if user_data['last_voice_update']:
-                last_update = datetime.fromisoformat(user_data['last_voice_update'])
-                time_spent = datetime.now() - last_update
-                minutes = time_spent.total_seconds() / 60
-                
-                # Добавляем опыт за время в голосовом канале
-                xp_gained = int(minutes * self.data['settings']['xp_per_voice_minute'])
-                user_data['xp'] += xp_gained
-                user_data['voice_time'] += minutes
-
-                # Проверяем повышение уровня
-                old_level = user_data['level']
-                new_level = self.calculate_level(user_data['xp'])
-                if new_level > old_level:
-                    user_data['level'] = new_level
-                    await self.handle_level_up(member, new_level)
-
-                user_data['last_voice_update'] = None
-                self.save_data(member.guild.id)
+        # Переход между каналами сессию не прерывает
+        if after.channel and not before.channel:
+            self.voice.start(member.guild.id, member.id)
+        elif before.channel and not after.channel:
+            # Минуты, не вошедшие в последнее начисление
+            minutes = self.voice.stop(member.guild.id, member.id)
+            if minutes > 0:
+                await self.credit_voice(member.guild, {member.id: minutes})
 
     @commands.Cog.listener()
     async def on_ready(self):
-        """При запуске бота проверяем и восстанавливаем данные"""
-        print("Проверка и восстановление данных уровней...")
-        for guild in self.bot.guilds:
-            # Проверяем и восстанавливаем данные пользователей
-            for user_id, user_data in self.data['users'].items():
-                # Проверяем наличие всех необходимых полей
-                required_fields = ['xp', 'level', 'total_messages', 'voice_time', 'last_voice_update']
-                for field in required_fields:
-                    if field not in user_data:
-                        user_data[field] = 0 if field != 'last_voice_update' else None
-                
-                # Пересчитываем уровень на основе опыта
-                user_data['level'] = self.calculate_level(user_data['xp'])
-
-            # Принудительно сохраняем данные при запуске
-            self.save_data(guild.id, force=True)
-        
-        print("Проверка и восстановление данных уровней завершены")
-
-    async def handle_level_up(self, member, new_level):
-        """Обрабатывает повышение уровня"""
-        # Проверяем награды за уровень
-        if str(new_level) in self.data['settings']['rewards']:
-            reward = self.data['settings']['rewards'][str(new_level)]
-            role = member.guild.get_role(reward['role_id'])
-            if role:
-                try:
-                    await member.add_roles(role)
-                    await member.send(f"Поздравляем! Вы получили роль {role.mention} за достижение {new_level} уровня!")
-                except:
-                    pass
+        # После (пере)подключения сессии сверяются с фактическими голосовыми состояниями
+        self.voice.rebuild(self.bot.guilds)
+
+    @tasks.loop(minutes=1)
+    async def voice_tick(self):
+        """Раз в минуту начисляет опыт всем участникам в голосовых каналах"""
+        for guild_id, minutes_by_user in self.voice.tick():
+            guild = self.bot.get_guild(guild_id)
+            if guild:
+                await self.credit_voice(guild, minutes_by_user)
+
+    @voice_tick.before_loop
+    async def before_voice_tick(self):
+        await self.bot.wait_until_ready()
+
+    async def credit_voice(self, guild, minutes_by_user):
+        """Начисляет опыт за минуты в голосовых каналах пакетом: одна запись в журнал на сервер"""
+        partition = self.guilds.get(guild.id)
+        data = partition.data
+        if not data['settings']['enabled']:
+            return
+
+        rate = data['settings']['xp_per_voice_minute']
+        deltas = {user_id: (int(minutes * rate), 0, minutes) for user_id, minutes in minutes_by_user.items()}
+        level_ups = partition.apply(deltas, self.get_curve(data), self.new_user)
+        await self.announce_level_ups(guild, level_ups)
+
+    @tasks.loop(seconds=FLUSH_INTERVAL)
+    async def flush_xp(self):
+        """Применяет накопленный за интервал опыт за сообщения"""
+        for guild_id, deltas in self.pending_xp.drain().items():
+            partition = self.guilds.get(guild_id)
+            level_ups = partition.apply(deltas, self.get_curve(partition.data), self.new_user)
+            guild = self.bot.get_guild(guild_id)
+            if guild:
+                await self.announce_level_ups(guild, level_ups)
+
+    @flush_xp.before_loop
+    async def before_flush_xp(self):
+        await self.bot.wait_until_ready()
+
+    async def announce_level_ups(self, guild, level_ups):
+        """Выдаёт награды и объявляет о повышениях уровня пакета одним сообщением"""
+        partition = self.guilds.get(guild.id)
+        lines = []
+        for user_id, old_level, new_level in level_ups:
+            member = guild.get_member(user_id)
+            if member is None:
+                continue
+            roles = await self.grant_rewards(member, partition.rewards.crossed(old_level, new_level), new_level)
+            line = f"{member.mention} достиг {new_level} уровня!"
+            if roles:
+                line += f" Награды: {', '.join(role.mention for role in roles)}"
+            lines.append(line)
 
         # Отправляем уведомление
-        if self.data['settings']['announcements']['enabled'] and self.data['settings']['announcements']['channel_id']:
-            channel = member.guild.get_channel(self.data['settings']['announcements']['channel_id'])
-            if channel:
+        announcements = partition.data['settings']['announcements']
+        if not lines or not announcements['enabled'] or not announcements['channel_id']:
+            return
+        channel = guild.get_channel(announcements['channel_id'])
+        if channel:
+            for start in range(0, len(lines), ANNOUNCEMENT_LINES):
                 embed = disnake.Embed(
                     title="🎉 Повышение уровня!",
-                    description=f"{member.mention} достиг {new_level} уровня!",
+                    description="\n".join(lines[start:start + ANNOUNCEMENT_LINES]),
                     color=disnake.Color.green()
                 )
                 await channel.send(embed=embed)
 
+    async def grant_rewards(self, member, role_ids, new_level):
+        """Выдаёт роли всех пройденных порогов одним запросом и сообщает о них одним личным сообщением"""
+        roles = [role for role in map(member.guild.get_role, role_ids) if role and role not in member.roles]
+        if not roles:
+            return []
+        try:
+            # atomic=False: один PATCH со всем списком ролей вместо запроса на каждую
+            await member.add_roles(*roles, atomic=False, reason=f"Награда за {new_level} уровень")
+        except disnake.HTTPException as e:
+            print(f"Не удалось выдать награды за уровень {member}: {e}")
+            return []
+        names = ", ".join(role.name for role in roles)
+        self.bot.dm.send(member, f"Поздравляем! За достижение {new_level} уровня вы получили: {names}!")
+        return roles
+
+    async def set_rendered_image(self, embed, render, filename):
+        """Прикрепляет к встраиванию отрисованное изображение; без Pillow или при ошибке встраивание остаётся прежним"""
+        if not self.renderer.available:
+            return
+        try:
+            image = await render()
+        except Exception as e:
+            print(f"Ошибка при отрисовке {filename}: {e}")
+            return
+        embed.set_image(file=disnake.File(io.BytesIO(image), filename=filename))
+
     @commands.slash_command(
         name="level",
         description="Показать уровень участника"
@@ -266,22 +382,24 @@ class Leveling(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         member: disnake.Member = commands.Param(description="Участник", default=None)
     ):
-        if not self.data['settings']['enabled']:
+        data = self.guild_data(inter.guild.id)
+        if not data['settings']['enabled']:
             await inter.response.send_message("Система уровней отключена!", ephemeral=True)
             return
 
         target = member or inter.author
         user_id = str(target.id)
 
-        if user_id not in self.data['users']:
+        if user_id not in data['users']:
             await inter.response.send_message(f"У {target.mention} пока нет уровня!", ephemeral=True)
             return
 
-        user_data = self.data['users'][user_id]
+        user_data = data['users'][user_id]
         level = user_data['level']
         xp = user_data['xp']
-        progress = self.get_progress(xp, level)
-        next_level_xp = self.get_xp_for_level(level + 1)
+        curve = self.get_curve(data)
+        progress = self.get_progress(xp, level, curve)
+        next_level_xp = self.get_xp_for_level(level + 1, curve)
 
         embed = disnake.Embed(
             title=f"Уровень {target.name}",
@@ -313,7 +431,13 @@ class Leveling(commands.Cog):
             inline=False
         )
 
-        await inter.response.send_message(embed=embed)
+        # Отрисовка выполняется в отдельном потоке и может занять больше времени ответа
+        await inter.response.defer()
+        rank, _ = self.guilds.get(inter.guild.id).ranks.rank('xp', target.id)
+        await self.set_rendered_image(
+            embed, lambda: self.renderer.rank_card(target, level, progress, rank), 'rank.png'
+        )
+        await inter.followup.send(embed=embed)
 
     @commands.slash_command(
         name="leaderboard",
@@ -325,62 +449,107 @@ class Leveling(commands.Cog):
         type: str = commands.Param(
             description="Тип таблицы лидеров",
             choices=["xp", "messages", "voice"]
+        ),
+        period: str = commands.Param(
+            description="Период",
+            choices={"За всё время": "all", "За день": "day", "За неделю": "week", "За месяц": "month"},
+            default="all"
         )
     ):
-        if not self.data['settings']['enabled']:
+        data = self.guild_data(inter.guild.id)
+        if not data['settings']['enabled']:
             await inter.response.send_message("Система уровней отключена!", ephemeral=True)
             return
 
-        if not self.data['users']:
+        if not data['users']:
             await inter.response.send_message("Пока нет данных для таблицы лидеров!", ephemeral=True)
             return
 
-        # Сортируем пользователей
+        # Топ берётся из индекса рейтинга, без сортировки всех пользователей
         if type == "xp":
-            sorted_users = sorted(
-                self.data['users'].items(),
-                key=lambda x: x[1]['xp'],
-                reverse=True
-            )
             title = "Таблица лидеров по опыту"
             value_key = 'xp'
             value_format = lambda x: f"{x:,} XP"
         elif type == "messages":
-            sorted_users = sorted(
-                self.data['users'].items(),
-                key=lambda x: x[1]['total_messages'],
-                reverse=True
-            )
             title = "Таблица лидеров по сообщениям"
             value_key = 'total_messages'
             value_format = lambda x: f"{x:,} сообщений"
         else:  # voice
-            sorted_users = sorted(
-                self.data['users'].items(),
-                key=lambda x: x[1]['voice_time'],
-                reverse=True
-            )
             title = "Таблица лидеров по времени в голосовых каналах"
             value_key = 'voice_time'
             value_format = lambda x: f"{int(x)} мин."
+        if period == "all":
+            top_users = [(user_id, data['users'][user_id][value_key])
+                         for user_id in self.guilds.get(inter.guild.id).ranks.top(value_key, 10)]
+        else:
+            # Счётчики текущего периода содержат только активных в нём участников
+            top_users = data['periods'].top(period, value_key, 10)
+            title = f"{title} {PERIODS[period][0]}"
 
         embed = disnake.Embed(
             title=title,
             color=disnake.Color.gold()
         )
-
-        # Добавляем топ-10 пользователей
-        for i, (user_id, data) in enumerate(sorted_users[:10], 1):
-            try:
-                user = await self.bot.fetch_user(int(user_id))
-                value = data[value_key]
-                embed.add_field(
-                    name=f"{i}. {user.name}",
-                    value=value_format(value),
-                    inline=False
-                )
-            except:
+        if not top_users:
+            embed.description = "Пока нет данных для таблицы лидеров!"
+
+        await inter.response.defer()
+        # Добавляем топ-10 пользователей; недостающие загружаются параллельно
+        users = await self.bot.user_resolver.resolve_many((user_id for user_id, _ in top_users), inter.guild)
+        rows = []
+        for i, ((user_id, value), user) in enumerate(zip(top_users, users), 1):
+            if user is None:
                 continue
+            embed.add_field(
+                name=f"{i}. {user.name}",
+                value=value_format(value),
+                inline=False
+            )
+            rows.append(({'position': i, 'name': user.display_name, 'value': value_format(value)}, user))
+
+        if rows:
+            await self.set_rendered_image(
+                embed,
+                lambda: self.renderer.leaderboard(title, [row for row, _ in rows], [user for _, user in rows]),
+                'leaderboard.png'
+            )
+        await inter.followup.send(embed=embed)
+
+    @commands.slash_command(
+        name="rank",
+        description="Показать место участника в рейтинге"
+    )
+    async def show_rank(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        member: disnake.Member = commands.Param(description="Участник", default=None)
+    ):
+        data = self.guild_data(inter.guild.id)
+        if not data['settings']['enabled']:
+            await inter.response.send_message("Система уровней отключена!", ephemeral=True)
+            return
+
+        target = member or inter.author
+        if str(target.id) not in data['users']:
+            await inter.response.send_message(f"У {target.mention} пока нет уровня!", ephemeral=True)
+            return
+
+        ranks = self.guilds.get(inter.guild.id).ranks
+        embed = disnake.Embed(
+            title=f"Рейтинг {target.name}",
+            color=disnake.Color.gold()
+        )
+        embed.set_thumbnail(url=target.display_avatar.url)
+
+        for name, field in (("Опыт", 'xp'), ("Сообщения", 'total_messages'), ("Голосовые каналы", 'voice_time')):
+            position, total = ranks.rank(field, target.id)
+            # Доля участников, у которых показатель ниже
+            percentile = (total - position) / total * 100 if total > 1 else 100.0
+            embed.add_field(
+                name=name,
+                value=f"**#{position}** из {total}\nВыше, чем у {percentile:.1f}%",
+                inline=True
+            )
 
         await inter.response.send_message(embed=embed)
 
@@ -400,13 +569,14 @@ class Leveling(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         enabled: bool = commands.Param(description="Включить/выключить систему уровней")
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
-        self.data['settings']['enabled'] = enabled
-        self.save_data(inter.guild.id, force=True)
+        data['settings']['enabled'] = enabled
+        self.save_data(inter.guild.id)
 
         status = "включена" if enabled else "выключена"
         await inter.response.send_message(f"Система уровней {status}!", ephemeral=True)
@@ -427,49 +597,73 @@ class Leveling(commands.Cog):
             min_value=1
         )
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
         if action == "message":
-            self.data['settings']['xp_per_message'] = amount
+            data['settings']['xp_per_message'] = amount
         else:
-            self.data['settings']['xp_per_voice_minute'] = amount
+            data['settings']['xp_per_voice_minute'] = amount
 
-        self.save_data(inter.guild.id, force=True)
+        self.save_data(inter.guild.id)
         await inter.response.send_message(f"Количество опыта за {action} установлено на {amount}!", ephemeral=True)
 
     @level_settings.sub_command(
         name="setcooldown",
-        description="Установить задержку между начислениями опыта"
+        description="Установить задержку между начислениями опыта за сообщения"
     )
     async def set_cooldown(
         self,
         inter: disnake.ApplicationCommandInteraction,
-        action: str = commands.Param(
-            description="Действие",
-            choices=["message", "voice"]
-        ),
         seconds: int = commands.Param(
             description="Задержка в секундах",
             min_value=1
         )
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
-        if action == "message":
-            self.data['settings']['xp_cooldown'] = seconds
-            self.xp_cooldown = commands.CooldownMapping.from_cooldown(1, seconds, commands.BucketType.member)
-        else:
-            self.data['settings']['voice_cooldown'] = seconds
-            self.voice_cooldown = commands.CooldownMapping.from_cooldown(1, seconds, commands.BucketType.member)
+        # Отметки последних начислений сохраняются, новая задержка действует сразу;
+        # опыт за голосовые каналы начисляется поминутно и задержки не имеет
+        data['settings']['xp_cooldown'] = seconds
+
+        self.save_data(inter.guild.id)
+        await inter.response.send_message(f"Задержка для сообщений установлена на {seconds} секунд!", ephemeral=True)
+
+    @level_settings.sub_command(
+        name="curve",
+        description="Выбрать кривую опыта для уровней"
+    )
+    async def set_curve(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        curve: str = commands.Param(
+            description="Кривая уровней",
+            choices={c.description: c.name for c in CURVES.values()}
+        )
+    ):
+        # Проверяем права
+        if not inter.author.guild_permissions.administrator:
+            await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
+            return
 
-        self.save_data(inter.guild.id, force=True)
-        await inter.response.send_message(f"Задержка для {action} установлена на {seconds} секунд!", ephemeral=True)
+        data = self.guild_data(inter.guild.id)
+        data['settings']['level_curve'] = curve
+        # Пересчитываем уровни всех участников по новой кривой
+        changed = get_curve(curve).recompute(data['users'])
+        self.save_data(inter.guild.id)
+
+        await inter.response.send_message(
+            f"Кривая уровней изменена: {get_curve(curve).description}. "
+            f"Уровень изменился у {changed} участников.",
+            ephemeral=True
+        )
 
     @level_settings.sub_command(
         name="setannouncements",
@@ -481,18 +675,66 @@ class Leveling(commands.Cog):
         channel: disnake.TextChannel = commands.Param(description="Канал для объявлений"),
         enabled: bool = commands.Param(description="Включить/выключить объявления", default=True)
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
-        self.data['settings']['announcements']['channel_id'] = channel.id
-        self.data['settings']['announcements']['enabled'] = enabled
-        self.save_data(inter.guild.id, force=True)
+        data['settings']['announcements']['channel_id'] = channel.id
+        data['settings']['announcements']['enabled'] = enabled
+        self.save_data(inter.guild.id)
 
         status = "включены" if enabled else "выключены"
         await inter.response.send_message(f"Объявления о повышении уровня {status} в канале {channel.mention}!", ephemeral=True)
 
+    @level_settings.sub_command(
+        name="setleaderboard",
+        description="Закрепить в канале автоматически обновляемую таблицу лидеров"
+    )
+    async def set_leaderboard(
+        self,
+        inter: disnake.ApplicationCommandInteraction,
+        channel: disnake.TextChannel = commands.Param(description="Канал для таблицы лидеров"),
+        interval: int = commands.Param(description="Интервал обновления в минутах", default=5, min_value=1, max_value=1440),
+        enabled: bool = commands.Param(description="Включить/выключить автообновление", default=True)
+    ):
+        # Проверяем права
+        if not inter.author.guild_permissions.administrator:
+            await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
+            return
+
+        partition = self.guilds.get(inter.guild.id)
+        settings = partition.data['settings']['leaderboard']
+        if not enabled:
+            settings['message_id'] = None
+            settings['content_hash'] = None
+            self.save_data(inter.guild.id)
+            await inter.response.send_message("Автообновление таблицы лидеров выключено!", ephemeral=True)
+            return
+
+        await inter.response.defer(ephemeral=True)
+        try:
+            message = await channel.send(embed=disnake.Embed(title="Таблица лидеров по опыту", color=disnake.Color.gold()))
+        except disnake.Forbidden:
+            await inter.edit_original_response(content=f"Нет прав на отправку сообщений в {channel.mention}!")
+            return
+        try:
+            await message.pin()
+        except disnake.HTTPException:
+            pass
+
+        settings['channel_id'] = channel.id
+        settings['message_id'] = message.id
+        settings['update_interval'] = interval * 60
+        partition.board_checked = time.monotonic()
+        await self.refresh_leaderboard(partition, force=True)
+        self.save_data(inter.guild.id)
+
+        await inter.edit_original_response(
+            content=f"Таблица лидеров закреплена в {channel.mention} и обновляется каждые {interval} мин.!"
+        )
+
     @level_settings.sub_command(
         name="addreward",
         description="Добавить награду за достижение уровня"
@@ -503,19 +745,21 @@ class Leveling(commands.Cog):
         level: int = commands.Param(description="Уровень", min_value=1),
         role: disnake.Role = commands.Param(description="Роль для выдачи")
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
-        if 'rewards' not in self.data['settings']:
-            self.data['settings']['rewards'] = {}
+        if 'rewards' not in data['settings']:
+            data['settings']['rewards'] = {}
 
-        self.data['settings']['rewards'][str(level)] = {
+        data['settings']['rewards'][str(level)] = {
             'role_id': role.id,
             'role_name': role.name
         }
-        self.save_data(inter.guild.id, force=True)
+        self.guilds.get(inter.guild.id).invalidate_rewards()
+        self.save_data(inter.guild.id)
 
         await inter.response.send_message(f"Награда за {level} уровень установлена: {role.mention}!", ephemeral=True)
 
@@ -528,17 +772,19 @@ class Leveling(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         level: int = commands.Param(description="Уровень", min_value=1)
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
-        if 'rewards' not in self.data['settings'] or str(level) not in self.data['settings']['rewards']:
+        if 'rewards' not in data['settings'] or str(level) not in data['settings']['rewards']:
             await inter.response.send_message(f"Награда за {level} уровень не найдена!", ephemeral=True)
             return
 
-        del self.data['settings']['rewards'][str(level)]
-        self.save_data(inter.guild.id, force=True)
+        del data['settings']['rewards'][str(level)]
+        self.guilds.get(inter.guild.id).invalidate_rewards()
+        self.save_data(inter.guild.id)
 
         await inter.response.send_message(f"Награда за {level} уровень удалена!", ephemeral=True)
 
@@ -550,7 +796,8 @@ class Leveling(commands.Cog):
         self,
         inter: disnake.ApplicationCommandInteraction
     ):
-        if 'rewards' not in self.data['settings'] or not self.data['settings']['rewards']:
+        data = self.guild_data(inter.guild.id)
+        if 'rewards' not in data['settings'] or not data['settings']['rewards']:
             await inter.response.send_message("Награды за уровни не настроены!", ephemeral=True)
             return
 
@@ -559,7 +806,7 @@ class Leveling(commands.Cog):
             color=disnake.Color.blue()
         )
 
-        for level, reward in sorted(self.data['settings']['rewards'].items(), key=lambda x: int(x[0])):
+        for level, reward in sorted(data['settings']['rewards'].items(), key=lambda x: int(x[0])):
             role = inter.guild.get_role(reward['role_id'])
             if role:
                 embed.add_field(
@@ -579,13 +826,14 @@ class Leveling(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         member: disnake.Member = commands.Param(description="Участник для сброса прогресса")
     ):
+        data = self.guild_data(inter.guild.id)
         # Проверяем права
         if not inter.author.guild_permissions.administrator:
             await inter.response.send_message("У вас нет прав для изменения настроек!", ephemeral=True)
             return
 
         user_id = str(member.id)
-        if user_id not in self.data['users']:
+        if user_id not in data['users']:
             await inter.response.send_message(f"У {member.mention} нет прогресса для сброса!", ephemeral=True)
             return
 
@@ -641,8 +889,9 @@ class Leveling(commands.Cog):
         )
 
         # Удаляем данные пользователя
-        del self.data['users'][user_id]
-        self.save_data(inter.guild.id, force=True)
+        del data['users'][user_id]
+        data['periods'].discard(member.id)
+        self.save_data(inter.guild.id)
 
         await interaction.edit_original_response(
             content=f"Прогресс {member.mention} успешно сброшен!",
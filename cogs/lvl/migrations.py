@@ -0,0 +1,28 @@
+from storage.schema import SchemaMigrations
+
+# Миграции данных уровней сервера. Каждая функция получает данные сервера
+# и ког Leveling; новые миграции добавляются только в конец списка.
+migrations = SchemaMigrations('leveling')
+
+
+@migrations.migration
+def backfill_user_fields(data, cog):
+    """Версия 1: у всех пользователей есть полный набор полей"""
+    for user_data in data['users'].values():
+        for field, value in cog.new_user().items():
+            user_data.setdefault(field, value)
+
+
+@migrations.migration
+def recompute_levels(data, cog):
+    """Версия 2: уровни соответствуют накопленному опыту"""
+    curve = cog.get_curve(data)
+    for user_data in data['users'].values():
+        user_data['level'] = cog.calculate_level(user_data['xp'], curve)
+
+
+@migrations.migration
+def clear_voice_timestamps(data, cog):
+    """Версия 3: голосовые сессии хранятся в памяти, старые отметки входа не нужны"""
+    for user_data in data['users'].values():
+        user_data['last_voice_update'] = None
@@ -0,0 +1,98 @@
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from storage import Partition
+from .journal import XPJournal
+from .periods import PeriodCounters
+from .ranks import RankIndex
+from .rewards import RewardTable
+from .users import UserTable
+
+
+class GuildLevels(Partition):
+    """Уровни одного сервера: снимок данных и журнал начислений после него"""
+
+    @staticmethod
+    def prepare(data: Dict) -> Dict:
+        """Переводит загруженный снимок в представление в памяти (таблица пользователей, счётчики периодов)"""
+        data['users'] = UserTable.from_dict(data['users'])
+        data['periods'] = PeriodCounters.from_dict(data.get('periods'))
+        return data
+
+    def __init__(self, guild_id: int, backend, data: Dict, journal: XPJournal):
+        super().__init__(guild_id, backend, data)
+        self.journal = journal
+        # Рейтинг обновляется вместе с таблицей пользователей
+        self.ranks = RankIndex(data['users'])
+        # Закреплённая таблица лидеров: последний отрисованный топ и время проверки
+        self.board_signature = None
+        self.board_checked = 0.0
+        self._rewards = None
+
+    @property
+    def rewards(self) -> RewardTable:
+        """Пороги наград сервера; строятся заново после invalidate_rewards"""
+        if self._rewards is None:
+            self._rewards = RewardTable(self.data['settings'])
+        return self._rewards
+
+    def invalidate_rewards(self):
+        self._rewards = None
+
+    def apply(self, deltas: Dict[int, Sequence], curve, new_user: Callable[[], Dict]) -> List[Tuple[int, int, int]]:
+        """Применяет приращения {участник: (xp, messages, voice)} одним пакетом.
+
+        Журнал дописывается одной записью в файл; возвращает повышения уровня
+        (участник, прежний уровень, новый уровень)."""
+        users = self.data['users']
+        entries = []
+        level_ups = []
+        for user_id, (xp, messages, voice) in deltas.items():
+            key = str(user_id)
+            if key not in users:
+                users[key] = new_user()
+            user_data = users[key]
+            if xp:
+                user_data['xp'] += xp
+            if messages:
+                user_data['total_messages'] += messages
+            if voice:
+                user_data['voice_time'] += voice
+            entries.append((key, xp, messages, voice))
+
+            # Уровень проверяется один раз на участника за пакет
+            old_level = user_data['level']
+            level = curve.level_for_xp(user_data['xp'])
+            if level > old_level:
+                user_data['level'] = level
+                level_ups.append((user_id, old_level, level))
+        self.journal.append_many(entries)
+        self.data['periods'].add_many(deltas)
+        return level_ups
+
+    @property
+    def pending(self) -> bool:
+        return self.dirty or self.journal.pending > 0
+
+    async def save(self) -> bool:
+        """Записывает полный снимок и удаляет из журнала вошедшие в него записи"""
+        self.data['last_update'] = datetime.now().isoformat()
+        seq = self.journal.seq
+        self.data['journal_seq'] = seq
+        if not await super().save():
+            return False
+        # Записи журнала до seq теперь входят в снимок
+        await self.journal.discard_through(seq)
+        return True
+
+    def save_sync(self) -> bool:
+        self.data['last_update'] = datetime.now().isoformat()
+        seq = self.journal.seq
+        self.data['journal_seq'] = seq
+        if not super().save_sync():
+            return False
+        self.journal.discard_through_sync(seq)
+        return True
+
+    def close(self):
+        self.journal.close()
@@ -0,0 +1,93 @@
+import heapq
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Периоды таблиц лидеров: название и ключ текущего периода
+PERIODS = {
+    'day': ("за день", lambda now: now.strftime('%Y-%m-%d')),
+    'week': ("за неделю", lambda now: '%d-W%02d' % now.isocalendar()[:2]),
+    'month': ("за месяц", lambda now: now.strftime('%Y-%m')),
+}
+
+# Поля счётчика участника за период
+FIELDS = ('xp', 'total_messages', 'voice_time')
+
+
+class PeriodCounters:
+    """Счётчики участников за текущий день, неделю и месяц.
+
+    Для каждого периода хранится ключ периода и таблица
+    {участник: [xp, messages, voice]} только тех, кто был активен в нём,
+    поэтому топ за период строится без просмотра всей истории. Смена
+    периода обрабатывается лениво: таблица очищается при первом обращении
+    с новым ключом, без ночной перезаписи данных."""
+
+    def __init__(self):
+        self._keys: Dict[str, Optional[str]] = {period: None for period in PERIODS}
+        self._tables: Dict[str, Dict[int, List]] = {period: {} for period in PERIODS}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> 'PeriodCounters':
+        counters = cls()
+        for period, stored in (data or {}).items():
+            if period in PERIODS:
+                counters._keys[period] = stored['key']
+                counters._tables[period] = {int(user_id): list(values) for user_id, values in stored['users'].items()}
+        return counters
+
+    def to_json(self) -> Dict:
+        return {
+            period: {'key': self._keys[period], 'users': {str(user_id): values for user_id, values in table.items()}}
+            for period, table in self._tables.items()
+        }
+
+    def snapshot(self) -> 'PeriodCounters':
+        copy = PeriodCounters.__new__(PeriodCounters)
+        copy._keys = dict(self._keys)
+        copy._tables = {period: {user_id: list(values) for user_id, values in table.items()}
+                        for period, table in self._tables.items()}
+        return copy
+
+    def table(self, period: str, now: Optional[datetime] = None) -> Dict[int, List]:
+        """Таблица текущего периода; начавшийся период начинается с пустой таблицы"""
+        key = PERIODS[period][1](now or datetime.now())
+        if self._keys[period] != key:
+            self._keys[period] = key
+            self._tables[period] = {}
+        return self._tables[period]
+
+    def add_many(self, deltas: Dict[int, Sequence], now: Optional[datetime] = None):
+        """Добавляет приращения {участник: (xp, messages, voice)} во все периоды"""
+        now = now or datetime.now()
+        for period in PERIODS:
+            # Приращение из уже закончившегося периода (воспроизведение журнала) не попадает в текущий
+            key = self._keys[period]
+            if key is not None and PERIODS[period][1](now) < key:
+                continue
+            table = self.table(period, now)
+            for user_id, (xp, messages, voice) in deltas.items():
+                values = table.get(user_id)
+                if values is None:
+                    table[user_id] = [xp, messages, voice]
+                else:
+                    values[0] += xp
+                    values[1] += messages
+                    values[2] += voice
+
+    def add(self, user_id: int, xp: int = 0, messages: int = 0, voice: float = 0, now: Optional[datetime] = None):
+        self.add_many({user_id: (xp, messages, voice)}, now)
+
+    def discard(self, user_id: int):
+        """Удаляет участника из всех периодов (сброс прогресса)"""
+        for table in self._tables.values():
+            table.pop(user_id, None)
+
+    def top(self, period: str, field: str, limit: int = 10, now: Optional[datetime] = None) -> List[Tuple[int, float]]:
+        """(участник, значение) с наибольшим значением поля за текущий период"""
+        index = FIELDS.index(field)
+        table = self.table(period, now)
+        return [
+            (user_id, values[index])
+            for user_id, values in heapq.nlargest(limit, table.items(), key=lambda item: item[1][index])
+            if values[index] > 0
+        ]
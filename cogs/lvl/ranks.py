@@ -0,0 +1,67 @@
+from itertools import islice
+from typing import Dict, List, Tuple
+
+from sortedcontainers import SortedList
+
+# Поля, по которым строится рейтинг, и множитель для перевода значения в целое
+METRICS = {
+    'xp': 1,
+    'total_messages': 1,
+    'voice_time': 1000,
+}
+
+_ID_BITS = 64
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+class RankIndex:
+    """Рейтинг участников сервера по каждой метрике.
+
+    Для каждой метрики хранится отсортированный список ключей
+    (значение << 64 | ID), который обновляется при каждом изменении
+    таблицы пользователей. Топ-N читается с конца списка за O(N), а место
+    участника находится двоичным поиском за O(log n)."""
+
+    fields = METRICS
+
+    def __init__(self, users):
+        self.users = users
+        self.rebuild()
+        users.attach(self)
+
+    def rebuild(self):
+        """Строит списки заново по текущей таблице"""
+        ids = self.users.user_ids()
+        self._lists: Dict[str, SortedList] = {
+            field: SortedList(self._key(field, value, user_id) for user_id, value in zip(ids, self.users.column(field)))
+            for field in METRICS
+        }
+
+    @staticmethod
+    def _key(field: str, value, user_id: int) -> int:
+        return (int(value * METRICS[field]) << _ID_BITS) | user_id
+
+    # Вызывается таблицей пользователей
+    def changed(self, user_id: int, field: str, old, new):
+        keys = self._lists[field]
+        keys.discard(self._key(field, old, user_id))
+        keys.add(self._key(field, new, user_id))
+
+    def added(self, user_id: int):
+        for field, keys in self._lists.items():
+            keys.add(self._key(field, 0, user_id))
+
+    def removed(self, user_id: int, values: Dict):
+        for field, keys in self._lists.items():
+            keys.discard(self._key(field, values[field], user_id))
+
+    def top(self, field: str, limit: int = 10) -> List[int]:
+        """ID участников с наибольшим значением метрики"""
+        return [key & _ID_MASK for key in islice(reversed(self._lists[field]), limit)]
+
+    def rank(self, field: str, user_id: int) -> Tuple[int, int]:
+        """Место участника (начиная с 1) и общее число участников"""
+        keys = self._lists[field]
+        value = self.users.get_field(user_id, field)
+        position = len(keys) - keys.bisect_right(self._key(field, value, user_id)) + 1
+        return position, len(keys)
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import disnake
+
+try:
+    from . import cards
+except ImportError:
+    # Pillow не установлен: команды отвечают обычными встраиваниями
+    cards = None
+
+# Один поток уже разгружает цикл событий; больше имеет смысл на многоядерных машинах
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', '1'))
+AVATAR_CACHE_DIR = os.getenv('AVATAR_CACHE_DIR', 'data/cache/avatars')
+AVATAR_FETCH_SIZE = 256
+
+
+class _LRU(OrderedDict):
+    """OrderedDict с ограничением размера: при переполнении удаляется самый давний элемент"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def lookup(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        self[key] = value
+        self.move_to_end(key)
+        while len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+class CardRenderer:
+    """Карточки уровня и таблицы лидеров в виде изображений.
+
+    Отрисовка выполняется в ThreadPoolExecutor и не блокирует цикл
+    событий: Pillow отпускает GIL на масштабировании и сжатии PNG, а
+    потоки, в отличие от процессов, не импортируют заново main.py и не
+    требуют запуска интерпретатора. Аватары кэшируются в памяти и на диске по хэшу аватара
+    (Asset.key), поэтому загружаются один раз за смену аватара, а готовые
+    изображения — по (участник, уровень, процент прогресса, место)."""
+
+    def __init__(self, workers: int = RENDER_WORKERS, cache_dir: str = AVATAR_CACHE_DIR,
+                 avatars: int = 512, renders: int = 256):
+        self.workers = workers
+        self.cache_dir = cache_dir
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._avatars = _LRU(avatars)
+        self._renders = _LRU(renders)
+
+        # Метрики
+        self.render_count = 0
+        self.render_hits = 0
+        self.render_ms_total = 0.0
+        self.avatar_memory_hits = 0
+        self.avatar_disk_hits = 0
+        self.avatar_fetches = 0
+
+    @property
+    def available(self) -> bool:
+        return cards is not None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='render')
+        return self._executor
+
+    async def avatar(self, asset: Optional[disnake.Asset]) -> Optional[bytes]:
+        """PNG аватара: из памяти, с диска или из CDN Discord"""
+        if asset is None:
+            return None
+        key = asset.key
+        data = self._avatars.lookup(key)
+        if data is not None:
+            self.avatar_memory_hits += 1
+            return data
+
+        path = os.path.join(self.cache_dir, f"{key}.png")
+        # Файлы читаются и пишутся в общем пуле, не занимая потоки отрисовки
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(None, self._read_file, path)
+        if data is not None:
+            self.avatar_disk_hits += 1
+        else:
+            try:
+                data = await asset.with_static_format('png').with_size(AVATAR_FETCH_SIZE).read()
+            except disnake.HTTPException as e:
+                print(f"Не удалось загрузить аватар {key}: {e}")
+                return None
+            self.avatar_fetches += 1
+            await loop.run_in_executor(None, self._write_file, path, data)
+        self._avatars.store(key, data)
+        return data
+
+    @staticmethod
+    def _read_file(path: str) -> Optional[bytes]:
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_file(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    async def _render(self, key, func, *args) -> bytes:
+        image = self._renders.lookup(key)
+        if image is not None:
+            self.render_hits += 1
+            return image
+        started = time.perf_counter()
+        image = await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        self.render_ms_total += (time.perf_counter() - started) * 1000
+        self.render_count += 1
+        self._renders.store(key, image)
+        return image
+
+    async def rank_card(self, member: disnake.Member, level: int, progress: float, rank: int) -> bytes:
+        """PNG карточки уровня участника"""
+        asset = member.display_avatar
+        card = {'name': member.display_name, 'level': level, 'progress': int(progress), 'rank': rank}
+        # Опыт в пределах одного процента прогресса даёт одинаковую картинку
+        key = ('rank', member.id, level, card['progress'], rank, card['name'], asset.key)
+        avatar = await self.avatar(asset)
+        return await self._render(key, cards.render_rank_card, card, avatar)
+
+    async def leaderboard(self, title: str, rows: List[Dict], users: List) -> bytes:
+        """PNG таблицы лидеров; rows — position, name, value, users — участники строк"""
+        assets = [user.display_avatar if user else None for user in users]
+        key = ('board', title, tuple((row['position'], row['name'], row['value']) for row in rows),
+               tuple(asset.key if asset else None for asset in assets))
+        cached = self._renders.lookup(key)
+        if cached is not None:
+            self.render_hits += 1
+            return cached
+        avatars = await asyncio.gather(*(self.avatar(asset) for asset in assets))
+        return await self._render(key, cards.render_leaderboard, title, rows, list(avatars))
+
+    def metrics(self) -> Dict:
+        return {
+            'render_count': self.render_count,
+            'render_hits': self.render_hits,
+            'avg_render_ms': round(self.render_ms_total / self.render_count, 1) if self.render_count else 0.0,
+            'avatar_memory_hits': self.avatar_memory_hits,
+            'avatar_disk_hits': self.avatar_disk_hits,
+            'avatar_fetches': self.avatar_fetches,
+        }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,27 @@
+from bisect import bisect_right
+from typing import Dict, List
+
+
+class RewardTable:
+    """Роли-награды за уровни в виде отсортированного массива порогов.
+
+    Роли всех порогов, пройденных при переходе с уровня old на new
+    (включая пропущенные при скачке через несколько уровней), находятся
+    двумя двоичными поисками."""
+
+    def __init__(self, settings: Dict):
+        thresholds = {}
+        # Прежний формат {уровень: ID роли}
+        for level, role_id in (settings.get('level_roles') or {}).items():
+            thresholds[int(level)] = int(role_id)
+        for level, reward in (settings.get('rewards') or {}).items():
+            thresholds[int(level)] = reward['role_id']
+        self.levels = sorted(thresholds)
+        self.role_ids = [thresholds[level] for level in self.levels]
+
+    def crossed(self, old_level: int, new_level: int) -> List[int]:
+        """ID ролей за уровни в промежутке (old_level, new_level]"""
+        return self.role_ids[bisect_right(self.levels, old_level):bisect_right(self.levels, new_level)]
+
+    def __len__(self) -> int:
+        return len(self.levels)
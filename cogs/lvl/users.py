@@ -0,0 +1,237 @@
+from array import array
+from typing import Dict, Iterator, Optional, Tuple
+
+# Числовые поля пользователя и типы столбцов array
+COLUMNS = {
+    'xp': 'q',
+    'level': 'l',
+    'total_messages': 'q',
+    'voice_time': 'd',
+}
+
+
+class UserRecord:
+    """Представление строки таблицы с доступом как к словарю пользователя.
+
+    Строка ищется по ID при каждом обращении, поэтому ссылка остаётся
+    верной, даже если другие строки были удалены и таблица сдвинулась."""
+
+    __slots__ = ('_table', '_id')
+
+    def __init__(self, table: 'UserTable', user_id: int):
+        self._table = table
+        self._id = user_id
+
+    def __getitem__(self, field: str):
+        return self._table.get_field(self._id, field)
+
+    def __setitem__(self, field: str, value):
+        self._table.set_field(self._id, field, value)
+
+    def __contains__(self, field: str) -> bool:
+        return field in COLUMNS or field == 'last_voice_update'
+
+    def get(self, field: str, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def to_dict(self) -> Dict:
+        return self._table.record_dict(self._id)
+
+
+class UserTable:
+    """Таблица пользователей уровней в столбцах array.
+
+    Вместо словаря из пяти строковых ключей на каждого пользователя
+    хранится по одному числу в каждом столбце и индекс ID -> строка.
+    Снаружи таблица ведёт себя как прежний словарь {str(user_id): {...}},
+    а в хранилище записывается в том же формате JSON."""
+
+    __slots__ = ('_index', '_ids', '_columns', '_voice_since', '_extra', '_listener')
+
+    def __init__(self):
+        self._index: Dict[int, int] = {}
+        self._ids = array('Q')
+        self._columns = {field: array(code) for field, code in COLUMNS.items()}
+        # Редкие поля: время входа в голосовой канал и неизвестные поля старых файлов
+        self._voice_since: Dict[int, str] = {}
+        self._extra: Dict[int, Dict] = {}
+        # Индекс, который нужно уведомлять об изменениях (RankIndex)
+        self._listener = None
+
+    @classmethod
+    def from_dict(cls, users: Dict[str, Dict]) -> 'UserTable':
+        """Строит таблицу из словаря в формате файла"""
+        table = cls()
+        ids = [int(user_id) for user_id in users]
+        records = list(users.values())
+        table._ids = array('Q', ids)
+        table._index = dict(zip(ids, range(len(ids))))
+        # Столбцы заполняются целиком, без поштучной вставки
+        for field, code in COLUMNS.items():
+            table._columns[field] = array(code, [record.get(field) or 0 for record in records])
+
+        known = set(COLUMNS) | {'last_voice_update'}
+        for user_id, record in zip(ids, records):
+            if record.get('last_voice_update') is not None:
+                table._voice_since[user_id] = record['last_voice_update']
+            if len(record) > len(known) or not known.issuperset(record):
+                extra = {field: value for field, value in record.items() if field not in known}
+                if extra:
+                    table._extra[user_id] = extra
+        return table
+
+    def to_dict(self) -> Dict[str, Dict]:
+        """Словарь в формате файла"""
+        columns = list(self._columns.items())
+        users = {}
+        for row, user_id in enumerate(self._ids):
+            record = {field: column[row] for field, column in columns}
+            record['last_voice_update'] = self._voice_since.get(user_id)
+            if user_id in self._extra:
+                record.update(self._extra[user_id])
+            users[str(user_id)] = record
+        return users
+
+    def snapshot(self) -> 'UserTable':
+        """Независимая копия таблицы (копирование столбцов занимает доли миллисекунды)"""
+        copy = UserTable.__new__(UserTable)
+        copy._index = dict(self._index)
+        copy._ids = self._ids[:]
+        copy._columns = {field: column[:] for field, column in self._columns.items()}
+        copy._voice_since = dict(self._voice_since)
+        copy._extra = {user_id: dict(extra) for user_id, extra in self._extra.items()}
+        copy._listener = None
+        return copy
+
+    def to_json(self) -> Dict[str, Dict]:
+        return self.to_dict()
+
+    def record_dict(self, user_id: int) -> Dict:
+        row = self._index[user_id]
+        record = {field: column[row] for field, column in self._columns.items()}
+        record['last_voice_update'] = self._voice_since.get(user_id)
+        if user_id in self._extra:
+            record.update(self._extra[user_id])
+        return record
+
+    def get_field(self, user_id: int, field: str):
+        column = self._columns.get(field)
+        if column is not None:
+            return column[self._index[user_id]]
+        if user_id not in self._index:
+            raise KeyError(str(user_id))
+        if field == 'last_voice_update':
+            return self._voice_since.get(user_id)
+        return self._extra.get(user_id, {})[field]
+
+    def set_field(self, user_id: int, field: str, value):
+        column = self._columns.get(field)
+        if column is not None:
+            row = self._index[user_id]
+            if self._listener is not None and field in self._listener.fields:
+                old = column[row]
+                column[row] = value
+                self._listener.changed(user_id, field, old, column[row])
+            else:
+                column[row] = value
+        elif field == 'last_voice_update':
+            if value is None:
+                self._voice_since.pop(user_id, None)
+            else:
+                self._voice_since[user_id] = value
+        else:
+            self._extra.setdefault(user_id, {})[field] = value
+
+    def __setitem__(self, user_id, record: Dict):
+        user_id = int(user_id)
+        if user_id not in self._index:
+            self._index[user_id] = len(self._ids)
+            self._ids.append(user_id)
+            for field, column in self._columns.items():
+                column.append(0)
+            if self._listener is not None:
+                self._listener.added(user_id)
+        self._voice_since.pop(user_id, None)
+        self._extra.pop(user_id, None)
+        for field, value in record.items():
+            if value is None and field in self._columns:
+                value = 0
+            self.set_field(user_id, field, value)
+
+    def __getitem__(self, user_id) -> UserRecord:
+        user_id = int(user_id)
+        if user_id not in self._index:
+            raise KeyError(str(user_id))
+        return UserRecord(self, user_id)
+
+    def __delitem__(self, user_id):
+        user_id = int(user_id)
+        row = self._index[user_id]
+        if self._listener is not None:
+            self._listener.removed(user_id, {field: column[row] for field, column in self._columns.items()})
+        del self._index[user_id]
+        last = len(self._ids) - 1
+        # Последняя строка переносится на место удалённой
+        if row != last:
+            moved_id = self._ids[last]
+            self._ids[row] = moved_id
+            for column in self._columns.values():
+                column[row] = column[last]
+            self._index[moved_id] = row
+        self._ids.pop()
+        for column in self._columns.values():
+            column.pop()
+        self._voice_since.pop(user_id, None)
+        self._extra.pop(user_id, None)
+
+    def __contains__(self, user_id) -> bool:
+        try:
+            return int(user_id) in self._index
+        except (TypeError, ValueError):
+            return False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        return (str(user_id) for user_id in self._ids)
+
+    def get(self, user_id, default=None) -> Optional[UserRecord]:
+        return self[user_id] if user_id in self else default
+
+    def setdefault(self, user_id, record: Dict) -> UserRecord:
+        if user_id not in self:
+            self[user_id] = record
+        return self[user_id]
+
+    def keys(self) -> Iterator[str]:
+        return iter(self)
+
+    def values(self) -> Iterator[UserRecord]:
+        return (UserRecord(self, user_id) for user_id in self._ids)
+
+    def items(self) -> Iterator[Tuple[str, UserRecord]]:
+        return ((str(user_id), UserRecord(self, user_id)) for user_id in self._ids)
+
+    def column(self, field: str) -> array:
+        """Столбец поля целиком (для сортировки и подсчётов без создания записей)"""
+        return self._columns[field]
+
+    def replace_column(self, field: str, values: array):
+        """Заменяет столбец целиком (массовый пересчёт)"""
+        if len(values) != len(self._ids):
+            raise ValueError(f"Длина столбца {field} не совпадает с числом пользователей")
+        self._columns[field] = values
+        if self._listener is not None and field in self._listener.fields:
+            self._listener.rebuild()
+
+    def attach(self, listener):
+        """Подключает индекс, получающий уведомления об изменениях столбцов"""
+        self._listener = listener
+
+    def user_ids(self) -> array:
+        """ID пользователей в порядке строк таблицы"""
+        return self._ids
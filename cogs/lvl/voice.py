@@ -0,0 +1,67 @@
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+
+class VoiceSessions:
+    """Активные голосовые сессии участников.
+
+    Для каждого участника в голосовом канале хранится момент, до которого
+    его время уже начислено. Раз в минуту tick отдаёт всех участников с
+    накопленными целыми минутами одним пакетом, поэтому стоимость
+    начисления не зависит от числа входов и выходов. Сессии живут только в
+    памяти и после перезапуска восстанавливаются по guild.voice_states."""
+
+    def __init__(self):
+        self._sessions: Dict[int, Dict[int, float]] = {}  # сервер: {участник: начислено до}
+
+    def start(self, guild_id: int, user_id: int, now: Optional[float] = None):
+        """Начинает сессию; повторный вызов (переход между каналами) её не сбрасывает"""
+        now = time.monotonic() if now is None else now
+        self._sessions.setdefault(guild_id, {}).setdefault(user_id, now)
+
+    def stop(self, guild_id: int, user_id: int, now: Optional[float] = None) -> float:
+        """Завершает сессию; возвращает ещё не начисленные минуты"""
+        now = time.monotonic() if now is None else now
+        sessions = self._sessions.get(guild_id)
+        if not sessions or user_id not in sessions:
+            return 0.0
+        since = sessions.pop(user_id)
+        if not sessions:
+            del self._sessions[guild_id]
+        return max(now - since, 0.0) / 60
+
+    def rebuild(self, guilds: Iterable, now: Optional[float] = None):
+        """Восстанавливает сессии по текущим голосовым состояниям серверов.
+
+        Участники, уже отслеживаемые и всё ещё находящиеся в канале,
+        сохраняют своё время начала."""
+        now = time.monotonic() if now is None else now
+        sessions = {}
+        for guild in guilds:
+            previous = self._sessions.get(guild.id, {})
+            current = {}
+            for user_id, state in guild.voice_states.items():
+                member = guild.get_member(user_id)
+                if state.channel is None or (member is not None and member.bot):
+                    continue
+                current[user_id] = previous.get(user_id, now)
+            if current:
+                sessions[guild.id] = current
+        self._sessions = sessions
+
+    def tick(self, now: Optional[float] = None) -> Iterator[Tuple[int, Dict[int, int]]]:
+        """Отдаёт по каждому серверу участников и целые минуты, накопленные с прошлого начисления"""
+        now = time.monotonic() if now is None else now
+        for guild_id, sessions in list(self._sessions.items()):
+            credited = {}
+            for user_id, since in sessions.items():
+                minutes = int((now - since) // 60)
+                if minutes > 0:
+                    # Остаток меньше минуты переходит в следующее начисление
+                    sessions[user_id] = since + minutes * 60
+                    credited[user_id] = minutes
+            if credited:
+                yield guild_id, credited
+
+    def __len__(self) -> int:
+        return sum(len(sessions) for sessions in self._sessions.values())
@@ -1,11 +1,12 @@
 import disnake
 from disnake.ext import commands
 from datetime import datetime
-from main import clan_data, save_clan_data
+from services.dm import URGENT
 
 class Members(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
 
     @commands.slash_command(
         name="profile",
@@ -16,6 +17,7 @@ class Members(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         member: disnake.Member = commands.Param(description="Участник, чей профиль нужно просмотреть", default=None)
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if member is None:
             member = inter.author
 
@@ -105,6 +107,7 @@ class Members(commands.Cog):
         member: disnake.Member = commands.Param(description="Участник, которому нужно выдать предупреждение"),
         reason: str = commands.Param(description="Причина предупреждения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if str(member.id) not in clan_data['members']:
             await inter.response.send_message('Этот пользователь не является участником клана!', ephemeral=True)
             return
@@ -116,18 +119,15 @@ class Members(commands.Cog):
             'timestamp': datetime.now().isoformat(),
             'issued_by': str(inter.author.id)
         }
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправка уведомления в ЛС
-        try:
-            embed = disnake.Embed(
-                title="Вы получили предупреждение",
-                description=f"**Причина:** {reason}",
-                color=disnake.Color.red()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title="Вы получили предупреждение",
+            description=f"**Причина:** {reason}",
+            color=disnake.Color.red()
+        )
+        self.bot.dm.send(member, embed=embed)
 
         await inter.response.send_message(f'Предупреждение выдано {member.mention}!', ephemeral=True)
 
@@ -141,6 +141,7 @@ class Members(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         member: disnake.Member = commands.Param(description="Участник, чьи предупреждения нужно просмотреть")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         warnings = [w for w in clan_data['warnings'].values() if w['user_id'] == str(member.id)]
         
         if not warnings:
@@ -152,15 +153,18 @@ class Members(commands.Cog):
             color=disnake.Color.orange()
         )
         
-        for warning_id, warning in clan_data['warnings'].items():
-            if warning['user_id'] == str(member.id):
-                issued_by = await self.bot.fetch_user(int(warning['issued_by']))
-                embed.add_field(
-                    name=f"Предупреждение от {datetime.fromisoformat(warning['timestamp']).strftime('%d.%m.%Y %H:%M')} [ID: {warning_id}]",
-                    value=f"**Причина:** {warning['reason']}\n"
-                          f"**Выдал:** {issued_by.name}",
-                    inline=False
-                )
+        member_warnings = [(warning_id, warning) for warning_id, warning in clan_data['warnings'].items()
+                           if warning['user_id'] == str(member.id)]
+        issuers = await self.bot.user_resolver.resolve_many(
+            (int(warning['issued_by']) for _, warning in member_warnings), inter.guild
+        )
+        for (warning_id, warning), issued_by in zip(member_warnings, issuers):
+            embed.add_field(
+                name=f"Предупреждение от {datetime.fromisoformat(warning['timestamp']).strftime('%d.%m.%Y %H:%M')} [ID: {warning_id}]",
+                value=f"**Причина:** {warning['reason']}\n"
+                      f"**Выдал:** {issued_by.name if issued_by else 'Неизвестный пользователь'}",
+                inline=False
+            )
 
         await inter.response.send_message(embed=embed, ephemeral=True)
 
@@ -175,6 +179,7 @@ class Members(commands.Cog):
         member: disnake.Member = commands.Param(description="Участник, которого нужно исключить"),
         reason: str = commands.Param(description="Причина исключения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if str(member.id) not in clan_data['members']:
             await inter.response.send_message('Этот пользователь не является участником клана!', ephemeral=True)
             return
@@ -184,6 +189,9 @@ class Members(commands.Cog):
             await inter.response.send_message('Нельзя исключить администратора сервера!', ephemeral=True)
             return
 
+        # Снятие ролей и ожидание доставки ЛС могут занять больше 3 секунд
+        await inter.response.defer(ephemeral=True)
+
         # Удаление всех ролей группировок
         for faction in clan_data['factions']['factions'].values():
             if faction['role_id']:
@@ -197,19 +205,16 @@ class Members(commands.Cog):
             await member.remove_roles(member_role)
 
         # Удаление из списка участников
-        del clan_data['members'][str(member.id)]
-        save_clan_data()
+        self.state.remove_member(inter.guild.id, member.id)
 
         # Отправка уведомления в ЛС
-        try:
-            embed = disnake.Embed(
-                title="Вы были исключены из клана и с сервера",
-                description=f"**Причина:** {reason}\n**Выдал:** {inter.author.name}",
-                color=disnake.Color.red()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title="Вы были исключены из клана и с сервера",
+            description=f"**Причина:** {reason}\n**Выдал:** {inter.author.name}",
+            color=disnake.Color.red()
+        )
+        # После кика у бота и участника нет общего сервера: ждём доставки
+        await self.bot.dm.send(member, embed=embed, priority=URGENT)
 
         # Кик с сервера
         await member.kick(reason=f"{reason} | Выдал: {inter.author.name}")
@@ -225,7 +230,7 @@ class Members(commands.Cog):
                 )
                 await channel.send(embed=embed)
 
-        await inter.response.send_message(f'{member.mention} исключен из клана и с сервера!', ephemeral=True)
+        await inter.followup.send(f'{member.mention} исключен из клана и с сервера!', ephemeral=True)
 
     @commands.slash_command(
         name="ban",
@@ -244,6 +249,7 @@ class Members(commands.Cog):
             max_value=30
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if str(member.id) not in clan_data['members']:
             await inter.response.send_message('Этот пользователь не является участником клана!', ephemeral=True)
             return
@@ -253,6 +259,9 @@ class Members(commands.Cog):
             await inter.response.send_message('Нельзя забанить администратора сервера!', ephemeral=True)
             return
 
+        # Снятие ролей и ожидание доставки ЛС могут занять больше 3 секунд
+        await inter.response.defer(ephemeral=True)
+
         # Удаление всех ролей группировок
         for faction in clan_data['factions']['factions'].values():
             if faction['role_id']:
@@ -266,19 +275,15 @@ class Members(commands.Cog):
             await member.remove_roles(member_role)
 
         # Удаление из списка участников
-        del clan_data['members'][str(member.id)]
-        save_clan_data()
+        self.state.remove_member(inter.guild.id, member.id)
 
         # Отправка уведомления в ЛС перед баном
-        try:
-            embed = disnake.Embed(
-                title="Вы были забанены",
-                description=f"**Причина:** {reason}\n**Выдал:** {inter.author.name}",
-                color=disnake.Color.dark_red()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title="Вы были забанены",
+            description=f"**Причина:** {reason}\n**Выдал:** {inter.author.name}",
+            color=disnake.Color.dark_red()
+        )
+        await self.bot.dm.send(member, embed=embed, priority=URGENT)
 
         # Бан участника
         await member.ban(reason=f"{reason} | Выдал: {inter.author.name}", delete_message_days=delete_messages)
@@ -294,7 +299,7 @@ class Members(commands.Cog):
                 )
                 await channel.send(embed=embed)
 
-        await inter.response.send_message(f'{member.mention} забанен!', ephemeral=True)
+        await inter.followup.send(f'{member.mention} забанен!', ephemeral=True)
 
     @commands.slash_command(
         name="deletewarn",
@@ -306,6 +311,7 @@ class Members(commands.Cog):
         member: disnake.Member = commands.Param(description="Участник, у которого нужно удалить предупреждение"),
         warning_id: str = commands.Param(description="ID предупреждения для удаления")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         # Проверяем, является ли пользователь лидером
         leader_role = disnake.utils.get(inter.guild.roles, id=clan_data['roles']['leader'])
         if not leader_role or leader_role not in inter.author.roles:
@@ -323,18 +329,15 @@ class Members(commands.Cog):
 
         # Удаляем предупреждение
         del clan_data['warnings'][warning_id]
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправляем уведомление в ЛС
-        try:
-            embed = disnake.Embed(
-                title="Предупреждение удалено",
-                description=f"Ваше предупреждение было удалено лидером клана.",
-                color=disnake.Color.green()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title="Предупреждение удалено",
+            description=f"Ваше предупреждение было удалено лидером клана.",
+            color=disnake.Color.green()
+        )
+        self.bot.dm.send(member, embed=embed)
 
         await inter.response.send_message(f'Предупреждение успешно удалено у {member.mention}!', ephemeral=True)
 
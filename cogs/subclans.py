@@ -1,11 +1,11 @@
 import disnake
 from disnake.ext import commands
 from datetime import datetime, timedelta
-from main import clan_data, save_clan_data
 
 class Subclans(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
 
     @commands.slash_command(
         name="createsubclan",
@@ -18,11 +18,12 @@ class Subclans(commands.Cog):
         description: str = commands.Param(description="Описание подразделения"),
         max_members: int = commands.Param(description="Максимальное количество участников", default=50)
     ):
+        clan_data = self.state.guild(inter.guild.id)
         # Отправляем отложенный ответ
         await inter.response.defer(ephemeral=True)
 
         # Проверяем кулдаун
-        can_create, remaining_time = self.check_cooldown(str(inter.author.id))
+        can_create, remaining_time = self.check_cooldown(inter.guild.id, str(inter.author.id))
         if not can_create:
             await inter.edit_original_response(content=f'Вы не можете создать подразделение еще {remaining_time}!')
             return
@@ -121,7 +122,7 @@ class Subclans(commands.Cog):
                     'member': member_role.id
                 }
             }
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Отправляем сообщение об успешном создании
             embed = disnake.Embed(
@@ -161,6 +162,7 @@ class Subclans(commands.Cog):
         member: disnake.Member = commands.Param(description="Участник для приглашения"),
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -195,7 +197,7 @@ class Subclans(commands.Cog):
         member_role = inter.guild.get_role(subclan['roles']['member'])
         await member.add_roles(member_role)
         subclan['members'].append(str(member.id))
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправляем уведомления
         announcements_channel = inter.guild.get_channel(subclan['channels']['announcements'])
@@ -207,16 +209,13 @@ class Subclans(commands.Cog):
             )
             await announcements_channel.send(embed=embed)
 
-        try:
-            embed = disnake.Embed(
-                title=f"Приглашение в подразделение {subclan_name}",
-                description=f"Вы были приглашены в подразделение {subclan_name}!\n"
-                           f"Описание: {subclan['description']}",
-                color=disnake.Color.blue()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title=f"Приглашение в подразделение {subclan_name}",
+            description=f"Вы были приглашены в подразделение {subclan_name}!\n"
+                       f"Описание: {subclan['description']}",
+            color=disnake.Color.blue()
+        )
+        self.bot.dm.send(member, embed=embed)
 
         await inter.response.send_message(f'{member.mention} приглашен в подразделение!', ephemeral=True)
 
@@ -231,6 +230,7 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         reason: str = commands.Param(description="Причина исключения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -258,7 +258,7 @@ class Subclans(commands.Cog):
 
         # Удаляем из списка участников
         subclan['members'].remove(str(member.id))
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправляем уведомления
         announcements_channel = inter.guild.get_channel(subclan['channels']['announcements'])
@@ -270,15 +270,12 @@ class Subclans(commands.Cog):
             )
             await announcements_channel.send(embed=embed)
 
-        try:
-            embed = disnake.Embed(
-                title=f"Исключение из подразделения {subclan_name}",
-                description=f"Вы были исключены из подразделения {subclan_name}.\nПричина: {reason}",
-                color=disnake.Color.red()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title=f"Исключение из подразделения {subclan_name}",
+            description=f"Вы были исключены из подразделения {subclan_name}.\nПричина: {reason}",
+            color=disnake.Color.red()
+        )
+        self.bot.dm.send(member, embed=embed)
 
         await inter.response.send_message(f'{member.mention} исключен из подразделения!', ephemeral=True)
 
@@ -291,13 +288,16 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
 
         subclan = clan_data['subclans'][subclan_name]
         created_at = datetime.fromisoformat(subclan['created_at'])
-        leader = await self.bot.fetch_user(int(subclan['created_by']))
+        # Лидер и участники ищутся одним пакетом
+        user_ids = [int(subclan['created_by'])] + [int(member_id) for member_id in subclan['members']]
+        users = dict(zip(user_ids, await self.bot.user_resolver.resolve_many(user_ids, inter.guild)))
 
         embed = disnake.Embed(
             title=f"Информация о подразделении {subclan_name}",
@@ -307,7 +307,7 @@ class Subclans(commands.Cog):
 
         embed.add_field(
             name="Лидер",
-            value=leader.mention,
+            value=f"<@{subclan['created_by']}>",
             inline=True
         )
         embed.add_field(
@@ -325,7 +325,7 @@ class Subclans(commands.Cog):
         members_list = []
         for member_id in subclan['members']:
             try:
-                member = await self.bot.fetch_user(int(member_id))
+                member = users[int(member_id)]
                 member_obj = inter.guild.get_member(int(member_id))
                 if member_obj:
                     display_role_name = "Участник" # Default if no specific role found
@@ -368,10 +368,10 @@ class Subclans(commands.Cog):
             except Exception as e:
                 print(f"Error fetching member or roles for {member_id}: {e}")
                 # If an error occurs for a member, still try to list them without role
-                try:
-                    basic_member = await self.bot.fetch_user(int(member_id))
+                basic_member = users.get(int(member_id))
+                if basic_member:
                     members_list.append(f"{basic_member.name} (Не удалось определить роль)")
-                except:
+                else:
                     members_list.append(f"Unknown User (Не удалось определить роль)")
                 continue
 
@@ -389,6 +389,7 @@ class Subclans(commands.Cog):
         description="Список всех подразделений"
     )
     async def list_subclans_slash(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         if not clan_data.get('subclans'):
             await inter.response.send_message('Нет созданных подразделений!', ephemeral=True)
             return
@@ -400,12 +401,11 @@ class Subclans(commands.Cog):
 
         for name, subclan in clan_data['subclans'].items():
             created_at = datetime.fromisoformat(subclan['created_at'])
-            leader = await self.bot.fetch_user(int(subclan['created_by']))
             
             embed.add_field(
                 name=name,
                 value=f"**Описание:** {subclan['description']}\n"
-                      f"**Лидер:** {leader.mention}\n"
+                      f"**Лидер:** <@{subclan['created_by']}>\n"
                       f"**Участников:** {len(subclan['members'])}/{subclan['max_members']}\n"
                       f"**Создано:** {created_at.strftime('%d.%m.%Y')}",
                 inline=False
@@ -423,12 +423,13 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         reason: str = commands.Param(description="Причина вступления")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
 
         # Проверяем кулдаун
-        can_join, remaining_time = self.check_cooldown(str(inter.author.id))
+        can_join, remaining_time = self.check_cooldown(inter.guild.id, str(inter.author.id))
         if not can_join:
             await inter.response.send_message(f'Вы не можете присоединиться к подразделению еще {remaining_time}!', ephemeral=True)
             return
@@ -468,10 +469,9 @@ class Subclans(commands.Cog):
             'timestamp': datetime.now().isoformat(),
             'status': 'pending'
         }
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправляем уведомление лидеру и офицерам
-        leader = await self.bot.fetch_user(int(subclan['created_by']))
         leader_role = inter.guild.get_role(subclan['roles']['leader'])
         officer_role = inter.guild.get_role(subclan['roles']['officer'])
 
@@ -503,6 +503,7 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         user: disnake.Member = commands.Param(description="Участник, чью заявку принимаем")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -540,7 +541,7 @@ class Subclans(commands.Cog):
         
         # Удаляем заявку
         del subclan['applications'][str(user.id)]
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправляем уведомления
         announcements_channel = inter.guild.get_channel(subclan['channels']['announcements'])
@@ -552,15 +553,12 @@ class Subclans(commands.Cog):
             )
             await announcements_channel.send(embed=embed)
 
-        try:
-            embed = disnake.Embed(
-                title=f"Заявка в подразделение {subclan_name} принята!",
-                description=f"Ваша заявка на вступление в подразделение {subclan_name} была принята!",
-                color=disnake.Color.green()
-            )
-            await user.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title=f"Заявка в подразделение {subclan_name} принята!",
+            description=f"Ваша заявка на вступление в подразделение {subclan_name} была принята!",
+            color=disnake.Color.green()
+        )
+        self.bot.dm.send(user, embed=embed)
 
         await inter.response.send_message(f'Заявка от {user.mention} принята!', ephemeral=True)
 
@@ -575,6 +573,7 @@ class Subclans(commands.Cog):
         user: disnake.Member = commands.Param(description="Участник, чью заявку отклоняем"),
         reason: str = commands.Param(description="Причина отклонения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -596,7 +595,7 @@ class Subclans(commands.Cog):
 
         # Удаляем заявку
         del subclan['applications'][str(user.id)]
-        save_clan_data()
+        self.state.save(inter.guild.id)
 
         # Отправляем уведомления
         announcements_channel = inter.guild.get_channel(subclan['channels']['announcements'])
@@ -608,15 +607,12 @@ class Subclans(commands.Cog):
             )
             await announcements_channel.send(embed=embed)
 
-        try:
-            embed = disnake.Embed(
-                title=f"Заявка в подразделение {subclan_name} отклонена",
-                description=f"Ваша заявка на вступление в подразделение {subclan_name} была отклонена.\nПричина: {reason}",
-                color=disnake.Color.red()
-            )
-            await user.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title=f"Заявка в подразделение {subclan_name} отклонена",
+            description=f"Ваша заявка на вступление в подразделение {subclan_name} была отклонена.\nПричина: {reason}",
+            color=disnake.Color.red()
+        )
+        self.bot.dm.send(user, embed=embed)
 
         await inter.response.send_message(f'Заявка от {user.mention} отклонена!', ephemeral=True)
 
@@ -629,6 +625,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         # Отправляем отложенный ответ
         await inter.response.defer(ephemeral=True)
 
@@ -741,7 +738,7 @@ class Subclans(commands.Cog):
 
             # Удаляем из данных
             del clan_data['subclans'][subclan_name]
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Отправляем финальное сообщение через новый ответ
             await interaction.followup.send(
@@ -780,6 +777,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -803,12 +801,13 @@ class Subclans(commands.Cog):
             color=disnake.Color.blue()
         )
 
-        for user_id, application in subclan['applications'].items():
-            user = await self.bot.fetch_user(int(user_id))
+        applications = list(subclan['applications'].items())
+        users = await self.bot.user_resolver.resolve_many((int(user_id) for user_id, _ in applications), inter.guild)
+        for (user_id, application), user in zip(applications, users):
             timestamp = datetime.fromisoformat(application['timestamp'])
             
             embed.add_field(
-                name=f"Заявка от {user.name}",
+                name=f"Заявка от {user.name if user else user_id}",
                 value=f"**Причина:** {application['reason']}\n"
                       f"**Подана:** {timestamp.strftime('%d.%m.%Y %H:%M')}\n"
                       f"**Статус:** {application['status']}",
@@ -827,6 +826,7 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         member: disnake.Member = commands.Param(description="Участник для повышения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -862,15 +862,12 @@ class Subclans(commands.Cog):
             )
             await announcements_channel.send(embed=embed)
 
-        try:
-            embed = disnake.Embed(
-                title=f"Повышение в подразделении {subclan_name}",
-                description=f"Вы были повышены до офицера в подразделении {subclan_name}!",
-                color=disnake.Color.blue()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title=f"Повышение в подразделении {subclan_name}",
+            description=f"Вы были повышены до офицера в подразделении {subclan_name}!",
+            color=disnake.Color.blue()
+        )
+        self.bot.dm.send(member, embed=embed)
 
         await inter.response.send_message(f'{member.mention} повышен до офицера!', ephemeral=True)
 
@@ -884,6 +881,7 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         member: disnake.Member = commands.Param(description="Офицер для понижения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -914,15 +912,12 @@ class Subclans(commands.Cog):
             )
             await announcements_channel.send(embed=embed)
 
-        try:
-            embed = disnake.Embed(
-                title=f"Понижение в подразделении {subclan_name}",
-                description=f"Вы были понижены до участника в подразделении {subclan_name}.",
-                color=disnake.Color.orange()
-            )
-            await member.send(embed=embed)
-        except:
-            pass
+        embed = disnake.Embed(
+            title=f"Понижение в подразделении {subclan_name}",
+            description=f"Вы были понижены до участника в подразделении {subclan_name}.",
+            color=disnake.Color.orange()
+        )
+        self.bot.dm.send(member, embed=embed)
 
         await inter.response.send_message(f'{member.mention} понижен до участника!', ephemeral=True)
 
@@ -935,6 +930,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -974,6 +970,7 @@ class Subclans(commands.Cog):
         role_name: str = commands.Param(description="Название новой роли"),
         color: str = commands.Param(description="Цвет роли (hex код, например #FF0000)", default="#000000")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1002,7 +999,7 @@ class Subclans(commands.Cog):
                 'name': role_name,
                 'color': color
             }
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Настраиваем права доступа для каналов
             for channel_id in subclan['channels'].values():
@@ -1027,6 +1024,7 @@ class Subclans(commands.Cog):
         new_name: str = commands.Param(description="Новое название роли", default=None),
         new_color: str = commands.Param(description="Новый цвет роли (hex код)", default=None)
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1057,7 +1055,7 @@ class Subclans(commands.Cog):
                 await role.edit(color=disnake.Color.from_str(new_color))
                 subclan['custom_roles'][role_name]['color'] = new_color
 
-            save_clan_data()
+            self.state.save(inter.guild.id)
             await inter.response.send_message(f'Роль {role.mention} успешно обновлена!', ephemeral=True)
 
         except Exception as e:
@@ -1074,6 +1072,7 @@ class Subclans(commands.Cog):
         member: disnake.Member = commands.Param(description="Участник, у которого нужно убрать роль"),
         role: disnake.Role = commands.Param(description="Роль для удаления у участника")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1151,6 +1150,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1209,6 +1209,7 @@ class Subclans(commands.Cog):
         ),
         value: str = commands.Param(description="Новое значение настройки")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1243,7 +1244,7 @@ class Subclans(commands.Cog):
                 subclan['settings']['welcome_message'] = value
                 await inter.response.send_message(f'Приветственное сообщение обновлено!', ephemeral=True)
 
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
         except Exception as e:
             await inter.response.send_message(f'Произошла ошибка при обновлении настроек: {str(e)}', ephemeral=True)
@@ -1257,6 +1258,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1326,6 +1328,7 @@ class Subclans(commands.Cog):
         member: disnake.Member = commands.Param(description="Участник для выдачи роли"),
         role: disnake.Role = commands.Param(description="Роль для выдачи из подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         # Отправляем отложенный ответ
         await inter.response.defer(ephemeral=True)
 
@@ -1446,6 +1449,7 @@ class Subclans(commands.Cog):
         role1: str = commands.Param(description="Первая роль"),
         role2: str = commands.Param(description="Вторая роль")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1513,6 +1517,7 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         role_name: str = commands.Param(description="Название роли для удаления")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1554,7 +1559,7 @@ class Subclans(commands.Cog):
             elif 'custom_roles' in subclan and role_name in subclan['custom_roles']:
                 del subclan['custom_roles'][role_name]
 
-            save_clan_data()
+            self.state.save(inter.guild.id)
             
             # Отправляем уведомления
             announcements_channel = inter.guild.get_channel(subclan['channels']['announcements'])
@@ -1599,6 +1604,7 @@ class Subclans(commands.Cog):
             max_value=99
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1667,7 +1673,7 @@ class Subclans(commands.Cog):
                 'type': channel_type,
                 'created_at': datetime.now().isoformat()
             }
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Отправляем уведомление
             announcements_channel = inter.guild.get_channel(subclan['channels']['announcements'])
@@ -1702,6 +1708,7 @@ class Subclans(commands.Cog):
             max_value=99
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1738,7 +1745,7 @@ class Subclans(commands.Cog):
                 if 'additional_channels' in subclan and str(channel.id) in subclan['additional_channels']:
                     if new_name:
                         subclan['additional_channels'][str(channel.id)]['name'] = new_name
-                    save_clan_data()
+                    self.state.save(inter.guild.id)
 
                 await inter.response.send_message(f'Канал {channel.mention} успешно обновлен!', ephemeral=True)
             else:
@@ -1757,6 +1764,7 @@ class Subclans(commands.Cog):
         subclan_name: str = commands.Param(description="Название подразделения"),
         channel: disnake.abc.GuildChannel = commands.Param(description="Канал для удаления")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1836,7 +1844,7 @@ class Subclans(commands.Cog):
             # Удаляем информацию из данных
             if 'additional_channels' in subclan and str(channel.id) in subclan['additional_channels']:
                 del subclan['additional_channels'][str(channel.id)]
-                save_clan_data()
+                self.state.save(inter.guild.id)
 
             await interaction.edit_original_response(
                 content=f'Канал успешно удален!',
@@ -1855,6 +1863,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         if subclan_name not in clan_data.get('subclans', {}):
             await inter.response.send_message('Подразделение не найдено!', ephemeral=True)
             return
@@ -1912,6 +1921,7 @@ class Subclans(commands.Cog):
     @commands.Cog.listener()
     async def on_member_remove(self, member: disnake.Member):
         """Обработчик события выхода участника из клана"""
+        clan_data = self.state.guild(member.guild.id)
         # Проверяем все подразделения
         for subclan_name, subclan in clan_data.get('subclans', {}).items():
             # Если участник был в подразделении
@@ -1953,7 +1963,7 @@ class Subclans(commands.Cog):
                     await announcements_channel.send(embed=embed)
 
         # Сохраняем изменения
-        save_clan_data()
+        self.state.save(member.guild.id)
 
     @commands.slash_command(
         name="subclanleave",
@@ -1964,6 +1974,7 @@ class Subclans(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         subclan_name: str = commands.Param(description="Название подразделения")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         # Отправляем отложенный ответ
         await inter.response.defer(ephemeral=True)
 
@@ -2074,7 +2085,7 @@ class Subclans(commands.Cog):
                 except Exception as e:
                     print(f"Ошибка при отправке уведомления в канал объявлений: {str(e)}")
 
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             # Отправляем финальное сообщение через новый ответ
             await interaction.followup.send(
@@ -2105,8 +2116,9 @@ class Subclans(commands.Cog):
                         ephemeral=True
                     )
 
-    def check_cooldown(self, user_id: str) -> tuple[bool, str]:
+    def check_cooldown(self, guild_id: int, user_id: str) -> tuple[bool, str]:
         """Проверяет кулдаун для пользователя"""
+        clan_data = self.state.guild(guild_id)
         if 'leave_cooldowns' not in clan_data:
             return True, ""
 
@@ -5,30 +5,13 @@ from datetime import datetime, timedelta
 import json
 import os
 from typing import Optional, Dict, List
-from main import clan_data, save_clan_data
 
 class TempChannels(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
         self.active_channels = {}  # {channel_id: {"owner": member_id, "created_at": timestamp}}
         self.voice_states = {}  # {member_id: {"channel": channel_id, "joined_at": timestamp}}
-        
-        # Загружаем настройки временных каналов
-        if 'temp_channels' not in clan_data:
-            clan_data['temp_channels'] = {
-                'enabled': False,
-                'category_id': None,
-                'name_template': "🎮 {username}",
-                'user_limit': 0,
-                'bitrate': 128000,
-                'auto_delete': True,
-                'delete_after': 300,  # 5 минут
-                'allowed_roles': [],
-                'prefix': "🎮",
-                'suffix': "",
-                'default_name': "Временный канал"
-            }
-            save_clan_data()
 
     @commands.slash_command(
         name="temp",
@@ -81,6 +64,7 @@ class TempChannels(commands.Cog):
             default=""
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             clan_data['temp_channels'].update({
                 'enabled': True,
@@ -93,7 +77,7 @@ class TempChannels(commands.Cog):
                 'prefix': prefix,
                 'suffix': suffix
             })
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             embed = disnake.Embed(
                 title="✅ Настройки временных каналов обновлены",
@@ -118,9 +102,10 @@ class TempChannels(commands.Cog):
         description="Включить/выключить систему временных каналов"
     )
     async def toggle_temp(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             clan_data['temp_channels']['enabled'] = not clan_data['temp_channels']['enabled']
-            save_clan_data()
+            self.state.save(inter.guild.id)
 
             status = "включена" if clan_data['temp_channels']['enabled'] else "выключена"
             await inter.response.send_message(f"✅ Система временных каналов {status}!")
@@ -132,6 +117,7 @@ class TempChannels(commands.Cog):
         description="Показать текущие настройки временных каналов"
     )
     async def show_settings(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             settings = clan_data['temp_channels']
             category = self.bot.get_channel(settings['category_id']) if settings['category_id'] else None
@@ -157,6 +143,7 @@ class TempChannels(commands.Cog):
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: disnake.Member, before: disnake.VoiceState, after: disnake.VoiceState):
+        clan_data = self.state.guild(member.guild.id)
         if not clan_data['temp_channels']['enabled']:
             return
 
@@ -183,6 +170,7 @@ class TempChannels(commands.Cog):
 
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: disnake.Member, before: disnake.VoiceState, after: disnake.VoiceState):
+        clan_data = self.state.guild(member.guild.id)
         if not clan_data['temp_channels']['enabled']:
             return
 
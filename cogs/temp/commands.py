@@ -2,11 +2,11 @@ import disnake
 from disnake.ext import commands
 from datetime import datetime, timedelta
 from typing import Optional
-from main import clan_data, save_clan_data
 
 class TempCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        self.state = bot.clan_state
 
     @commands.slash_command(
         name="tempchannel",
@@ -36,6 +36,7 @@ class TempCommands(commands.Cog):
             max_value=384
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not clan_data['temp_channels']['enabled']:
                 await inter.response.send_message("❌ Система временных каналов отключена!", ephemeral=True)
@@ -77,6 +78,7 @@ class TempCommands(commands.Cog):
             max_value=99
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not inter.author.voice:
                 await inter.response.send_message("❌ Вы должны быть в голосовом канале!", ephemeral=True)
@@ -104,6 +106,7 @@ class TempCommands(commands.Cog):
         inter: disnake.ApplicationCommandInteraction,
         name: str = commands.Param(description="Новое название канала")
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not inter.author.voice:
                 await inter.response.send_message("❌ Вы должны быть в голосовом канале!", ephemeral=True)
@@ -135,6 +138,7 @@ class TempCommands(commands.Cog):
             max_value=384
         )
     ):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not inter.author.voice:
                 await inter.response.send_message("❌ Вы должны быть в голосовом канале!", ephemeral=True)
@@ -158,6 +162,7 @@ class TempCommands(commands.Cog):
         description="Удалить временный канал"
     )
     async def delete_channel(self, inter: disnake.ApplicationCommandInteraction):
+        clan_data = self.state.guild(inter.guild.id)
         try:
             if not inter.author.voice:
                 await inter.response.send_message("❌ Вы должны быть в голосовом канале!", ephemeral=True)
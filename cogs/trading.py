@@ -1,9 +1,21 @@
 import disnake
-from disnake.ext import commands
+from disnake.ext import commands, tasks
 from datetime import datetime, timedelta
+import asyncio
+import heapq
 import json
 import os
+import time
+from collections import deque
 from pathlib import Path
+from services.dm import URGENT
+from state import TradeRepository
+from storage import OffloopWriter, open_backend
+
+# Marketplace messages of expired trades are edited in small batches
+# (Discord allows about 5 message edits per 5 seconds per channel)
+EXPIRY_EDIT_BATCH = 5
+EXPIRY_EDIT_INTERVAL = 5
 
 class Trading(commands.Cog):
     def __init__(self, bot):
@@ -12,6 +24,8 @@ class Trading(commands.Cog):
         self.data_dir = Path("data")
         self.data_dir.mkdir(exist_ok=True) # Create data directory if it doesn't exist
         self.data_file = self.data_dir / "trading.json"
+        self.backend = open_backend('trading', str(self.data_file))
+        self.writer = OffloopWriter(self.backend)
 
         # Load trading data
         self.trading_data = self.load_trading_data()
@@ -22,31 +36,128 @@ class Trading(commands.Cog):
             'general_channel_id': None
         })
         self.trading_data.setdefault('trades', {})
+        self.trading_data.setdefault('archive', {}) # Expired trades, moved out of 'trades'
 
         self.marketplace_data = self.trading_data['marketplace'] # Still use this for convenience
+        # Indexed access to trading_data['trades'] (by message, seller, status/category)
+        self.trades = TradeRepository(self.trading_data['trades'])
+
+        # Expiry index: heap of (expires_at timestamp, trade_id) for active trades.
+        # Cancelled/completed trades are skipped lazily when their entry comes due.
+        self.expiry_heap = [(self.expiry_timestamp(trade), trade['id']) for trade in self.trades.by_status('active')]
+        heapq.heapify(self.expiry_heap)
+        self.expiry_wakeup = asyncio.Event()
+        # Archived trades whose marketplace message still has to be updated
+        self.expired_messages = deque(
+            trade_id for trade_id, trade in self.trading_data['archive'].items()
+            if not trade.get('message_updated')
+        )
+        self.expire_trades.start()
+        self.update_expired_messages.start()
+
+    def cog_unload(self):
+        self.expire_trades.cancel()
+        self.update_expired_messages.cancel()
 
     def load_trading_data(self):
-        """Loads trading data from trading.json"""
-        if self.data_file.exists():
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except json.JSONDecodeError:
-                print(f"Warning: Could not decode JSON from {self.data_file}. Starting with empty data.")
-                return {}
-            except Exception as e:
-                print(f"Error loading trading data from {self.data_file}: {e}")
-                return {}
-        else:
-            return {} # Return empty data if file doesn't exist
+        """Loads trading data from the configured storage backend"""
+        try:
+            return self.backend.load() or {} # Return empty data if nothing is stored yet
+        except json.JSONDecodeError:
+            print(f"Warning: Could not decode JSON from {self.data_file}. Starting with empty data.")
+            return {}
+        except Exception as e:
+            print(f"Error loading trading data from {self.backend.name}: {e}")
+            return {}
 
-    def save_trading_data(self):
-        """Saves trading data to trading.json"""
+    async def save_trading_data(self):
+        """Saves trading data to the configured storage backend (encoded and written off the event loop)"""
         try:
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(self.trading_data, f, indent=4, ensure_ascii=False)
+            await self.writer.save(self.trading_data)
         except Exception as e:
-            print(f"Error saving trading data to {self.data_file}: {e}")
+            print(f"Error saving trading data to {self.backend.name}: {e}")
+
+    @staticmethod
+    def expiry_timestamp(trade):
+        return datetime.fromisoformat(trade['expires_at']).timestamp()
+
+    def schedule_expiry(self, trade):
+        """Adds an active trade to the expiry index and wakes the sweeper if it expires first"""
+        expires_at = self.expiry_timestamp(trade)
+        if not self.expiry_heap or expires_at < self.expiry_heap[0][0]:
+            self.expiry_wakeup.set()
+        heapq.heappush(self.expiry_heap, (expires_at, trade['id']))
+
+    @tasks.loop(seconds=0)
+    async def expire_trades(self):
+        """Sleeps until the next trade expires, then marks due trades expired and archives them"""
+        self.expiry_wakeup.clear()
+        timeout = self.expiry_heap[0][0] - time.time() if self.expiry_heap else None
+        if timeout is None or timeout > 0:
+            try:
+                await asyncio.wait_for(self.expiry_wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        now = time.time()
+        expired = 0
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            expires_at, trade_id = heapq.heappop(self.expiry_heap)
+            trade = self.trades.get(trade_id)
+            if not trade or trade['status'] != 'active' or self.expiry_timestamp(trade) != expires_at:
+                continue
+            trade = self.trades.remove(trade_id)
+            trade['status'] = 'expired'
+            trade['expired_at'] = datetime.now().isoformat()
+            self.trading_data['archive'][trade_id] = trade
+            self.expired_messages.append(trade_id)
+            expired += 1
+        if expired:
+            await self.save_trading_data()
+
+    @expire_trades.before_loop
+    async def before_expire_trades(self):
+        await self.bot.wait_until_ready()
+
+    @tasks.loop(seconds=EXPIRY_EDIT_INTERVAL)
+    async def update_expired_messages(self):
+        """Marks marketplace messages of expired trades, at most EXPIRY_EDIT_BATCH per run"""
+        if not self.expired_messages:
+            return
+        batch = [self.expired_messages.popleft() for _ in range(min(EXPIRY_EDIT_BATCH, len(self.expired_messages)))]
+        trades = [self.trading_data['archive'][trade_id] for trade_id in batch if trade_id in self.trading_data['archive']]
+        await asyncio.gather(*(self.mark_message_expired(trade) for trade in trades))
+        await self.save_trading_data()
+
+    @update_expired_messages.before_loop
+    async def before_update_expired_messages(self):
+        await self.bot.wait_until_ready()
+
+    async def mark_message_expired(self, trade):
+        channel = self.bot.get_channel(trade.get('channel_id'))
+        if channel and trade.get('message_id'):
+            # The stored embed is reused, so the message does not have to be fetched first
+            changes = {'view': None}
+            if trade.get('original_embed'):
+                embed = disnake.Embed.from_dict(trade['original_embed'])
+                embed.color = disnake.Color.dark_grey()
+                embed.title = f"⌛ Истекло: {trade['item_name']}"
+                embed.add_field(
+                    name="Статус",
+                    value=f"Истекло <t:{int(self.expiry_timestamp(trade))}:R>",
+                    inline=False
+                )
+                changes['embed'] = embed
+            try:
+                await channel.get_partial_message(trade['message_id']).edit(**changes)
+            except disnake.NotFound:
+                pass
+            except disnake.HTTPException as e:
+                print(f"Error marking message {trade['message_id']} as expired: {e}")
+        trade['message_updated'] = True
+        # The embed is only needed to switch back from the profile view
+        trade.pop('original_embed', None)
 
     async def ensure_marketplace_setup(self, guild):
         # Ensure marketplace category exists
@@ -63,7 +174,7 @@ class Trading(commands.Cog):
             }
             marketplace_category = await guild.create_category("💹 Торговая Площадка", overwrites=overwrites)
             self.marketplace_data['category_id'] = marketplace_category.id
-            self.save_trading_data()
+            await self.save_trading_data()
 
         # Ensure general marketplace channel exists
         general_channel = guild.get_channel(self.marketplace_data['general_channel_id'])
@@ -79,7 +190,7 @@ class Trading(commands.Cog):
             }
             general_channel = await marketplace_category.create_text_channel("общий-рынок", topic="Общая торговая площадка", overwrites=overwrites)
             self.marketplace_data['general_channel_id'] = general_channel.id
-            self.save_trading_data()
+            await self.save_trading_data()
 
         # Ensure specific category channels exist
         await self.ensure_category_channels(marketplace_category)
@@ -115,7 +226,7 @@ class Trading(commands.Cog):
                 self.marketplace_data['category_channels'][category_name] = channel.id
                 changes_made = True
         if changes_made:
-            self.save_trading_data()
+            await self.save_trading_data()
 
     @commands.slash_command(
         name="createtrade",
@@ -222,17 +333,13 @@ class Trading(commands.Cog):
                 await interaction.response.defer(ephemeral=True)
 
                 # Find the trade
-                trade_id = None
-                for tid, trade in self.cog.trading_data['trades'].items():
-                    if trade.get('message_id') == interaction.message.id:
-                        trade_id = tid
-                        break
+                trade = self.cog.trades.by_message(interaction.message.id)
 
-                if not trade_id:
+                if not trade:
                     await interaction.edit_original_response(content="❌ Торговое предложение не найдено.")
                     return
 
-                trade = self.cog.trading_data['trades'][trade_id]
+                trade_id = trade['id']
 
                 # Prevent seller from showing interest in their own item
                 if str(interaction.user.id) == trade['seller']:
@@ -253,27 +360,23 @@ class Trading(commands.Cog):
 
                 # Add user to interested_users list
                 trade['interested_users'].append(str(buyer.id))
-                self.cog.save_trading_data()
+                await self.cog.save_trading_data()
 
                 # Notify seller (via DM for now)
                 seller = self.cog.bot.get_user(int(trade['seller']))
                 if seller:
-                    try:
-                        # Format interest notification as an embed
-                        interest_embed = disnake.Embed(
-                            title=f"👋 Новый интерес к вашему предложению!",
-                            description=f"Пользователь {buyer.mention} проявил интерес к вашему предмету:\n\n"
-                                       f"**🛍️ Предмет:** {trade['item_name']}\n"
-                                       f"**💰 Цена:** {trade['price']} монет\n\n"
-                                       f"*Используйте `/viewinterest {trade_id}` для просмотра всех заинтересованных и `/manageinterest` для управления.*",
-                            color=disnake.Color.blue()
-                        )
-                        if trade.get('image_urls'):
-                            interest_embed.set_image(url=trade['image_urls'][0]) # Use first image as thumbnail
-                        await seller.send(embed=interest_embed)
-
-                    except disnake.Forbidden:
-                         print(f"Could not send interest notification DM to seller {seller.id}.")
+                    # Format interest notification as an embed
+                    interest_embed = disnake.Embed(
+                        title=f"👋 Новый интерес к вашему предложению!",
+                        description=f"Пользователь {buyer.mention} проявил интерес к вашему предмету:\n\n"
+                                   f"**🛍️ Предмет:** {trade['item_name']}\n"
+                                   f"**💰 Цена:** {trade['price']} монет\n\n"
+                                   f"*Используйте `/viewinterest {trade_id}` для просмотра всех заинтересованных и `/manageinterest` для управления.*",
+                        color=disnake.Color.blue()
+                    )
+                    if trade.get('image_urls'):
+                        interest_embed.set_image(url=trade['image_urls'][0]) # Use first image as thumbnail
+                    self.cog.bot.dm.send(seller, embed=interest_embed)
 
                 await interaction.edit_original_response(content="✅ Ваш интерес к этому предложению зарегистрирован. Продавец уведомлен.")
 
@@ -281,7 +384,7 @@ class Trading(commands.Cog):
             async def cancel_button(self, button: disnake.ui.Button, interaction: disnake.MessageInteraction):
                 await interaction.response.defer(ephemeral=True)
                 # Use self.trade_id to get the trade
-                trade = self.cog.trading_data['trades'].get(self.trade_id)
+                trade = self.cog.trades.get(self.trade_id)
 
                 if not trade:
                     await interaction.edit_original_response(content="❌ Торговое предложение не найдено.")
@@ -295,7 +398,7 @@ class Trading(commands.Cog):
                 await interaction.response.defer()
                 
                 # Find the trade using the stored trade_id
-                trade = self.cog.trading_data['trades'].get(self.trade_id)
+                trade = self.cog.trades.get(self.trade_id)
 
                 if not trade:
                     await interaction.edit_original_response(content="❌ Торговое предложение не найдено.")
@@ -317,7 +420,7 @@ class Trading(commands.Cog):
                         title=f"👤 Профиль продавца: {seller.name}",
                         description=f"**ID продавца:** {seller.id}\n"
                                   f"**Дата регистрации:** <t:{int(seller.created_at.timestamp())}:R>\n"
-                                  f"**Активных объявлений:** {len([t for t in self.cog.trading_data['trades'].values() if t['seller'] == str(seller.id) and t['status'] == 'active'])}",
+                                  f"**Активных объявлений:** {self.cog.trades.count_by_seller(seller.id, 'active')}",
                         color=disnake.Color.blue() # Use a different color for profile embed
                     )
                     profile_embed.set_thumbnail(url=seller.display_avatar.url)
@@ -355,25 +458,26 @@ class Trading(commands.Cog):
         trade['message_id'] = message.id
         trade['channel_id'] = target_channel.id
         trade['original_embed'] = embed.to_dict() # Store embed as dictionary
-        self.trading_data['trades'][trade_id] = trade
-        self.save_trading_data()
+        self.trades.add(trade)
+        self.schedule_expiry(trade)
+        await self.save_trading_data()
 
         await inter.edit_original_response(content="✅ Торговое предложение успешно создано!")
 
     async def cancel_trade_message(self, inter: disnake.ApplicationCommandInteraction, trade_id: str):
-        if trade_id not in self.trading_data.get('trades', {}):
+        if trade_id not in self.trades:
             await inter.edit_original_response(content="❌ Торговое предложение не найдено.")
             return
 
-        trade = self.trading_data['trades'][trade_id]
+        trade = self.trades.get(trade_id)
 
         if str(inter.user.id) != trade['seller']:
             await inter.edit_original_response(content="❌ У вас нет прав для отмены этого торгового предложения!")
             return
 
-        trade['status'] = 'cancelled'
+        self.trades.set_status(trade_id, 'cancelled')
         trade['cancelled_at'] = datetime.now().isoformat()
-        self.save_trading_data()
+        await self.save_trading_data()
 
         channel = self.bot.get_channel(trade['channel_id'])
         if channel:
@@ -413,11 +517,8 @@ class Trading(commands.Cog):
     ):
         await inter.response.defer()
 
-        # Filter trades
-        active_trades = [
-            trade for trade in self.trading_data['trades'].values()
-            if trade['status'] == 'active' and (category == "Все" or trade['category'] == category)
-        ]
+        # Filter trades (index lookup by status and category)
+        active_trades = self.trades.by_status('active', None if category == "Все" else category)
 
         if not active_trades:
             await inter.edit_original_response(content="📭 Активных торговых предложений не найдено!")
@@ -467,11 +568,14 @@ class Trading(commands.Cog):
     ):
         await inter.response.defer()
 
-        # Filter trades
-        completed_trades = [
-            trade for trade in self.trading_data['trades'].values()
-            if trade['status'] == 'completed' and (user is None or str(user.id) in [trade['seller'], trade.get('buyer')])
-        ]
+        # Filter trades (index lookup by status, then by seller or buyer)
+        if user is None:
+            completed_trades = self.trades.by_status('completed')
+        else:
+            completed_trades = self.trades.by_seller(user.id, 'completed') + [
+                trade for trade in self.trades.by_buyer(user.id, 'completed')
+                if trade['seller'] != str(user.id)
+            ]
 
         if not completed_trades:
             await inter.edit_original_response(content="📭 История торгов пуста!")
@@ -526,11 +630,11 @@ class Trading(commands.Cog):
         await inter.response.defer(ephemeral=True)
 
         # Find the trade by trade ID
-        if trade_id not in self.trading_data.get('trades', {}):
+        if trade_id not in self.trades:
             await inter.edit_original_response(content="❌ Торговое предложение не найдено.")
             return
 
-        trade = self.trading_data['trades'][trade_id]
+        trade = self.trades.get(trade_id)
 
         # Check if the user is the seller
         if str(inter.user.id) != trade['seller']:
@@ -543,9 +647,9 @@ class Trading(commands.Cog):
             return
 
         # Update trade status to completed
-        trade['status'] = 'completed'
+        self.trades.set_status(trade_id, 'completed')
         trade['completed_at'] = datetime.now().isoformat()
-        self.save_trading_data()
+        await self.save_trading_data()
 
         # Edit the message to indicate completion
         channel = self.bot.get_channel(trade['channel_id'])
@@ -585,7 +689,7 @@ class Trading(commands.Cog):
         await inter.response.defer(ephemeral=True)
 
         # Find the trade
-        trade = self.trading_data['trades'].get(trade_id)
+        trade = self.trades.get(trade_id)
 
         if not trade:
             await inter.edit_original_response(content="❌ Торговое предложение не найдено.")
@@ -635,7 +739,7 @@ class Trading(commands.Cog):
         await inter.response.defer(ephemeral=True)
 
         # Find the trade
-        trade = self.trading_data['trades'].get(trade_id)
+        trade = self.trades.get(trade_id)
 
         if not trade:
             await inter.edit_original_response(content="❌ Торговое предложение не найдено.")
@@ -672,7 +776,7 @@ class Trading(commands.Cog):
                 if trade.get('image_urls'):
                     buyer_embed.set_image(url=trade['image_urls'][0])
                 buyer_embed.set_thumbnail(url=seller.display_avatar.url) # Add seller thumbnail
-                await buyer.send(embed=buyer_embed)
+                delivered = await self.bot.dm.send(buyer, embed=buyer_embed, priority=URGENT)
 
                 # Send DM to seller with buyer info
                 seller_embed = disnake.Embed(
@@ -685,18 +789,20 @@ class Trading(commands.Cog):
                 if trade.get('image_urls'):
                     seller_embed.set_image(url=trade['image_urls'][0])
                 seller_embed.set_thumbnail(url=buyer.display_avatar.url) # Add buyer thumbnail
-                await seller.send(embed=seller_embed)
+                if delivered:
+                    delivered = await self.bot.dm.send(seller, embed=seller_embed, priority=URGENT)
+                if not delivered:
+                    await inter.edit_original_response(content="❌ Не удалось отправить личные сообщения. Убедитесь, что у обоих пользователей разрешены ЛС от участников сервера.")
+                    return
 
                 # Optionally remove other interested users or mark this one as approved in data
                 # For now, just remove all from the list after one is approved
                 trade['interested_users'] = [] # Clear list after one approval
                 trade['approved_buyer'] = user_id_str # Store the approved buyer
-                self.save_trading_data()
+                await self.save_trading_data()
 
                 await inter.edit_original_response(content=f"✅ Интерес пользователя {user.mention} одобрен. Информация для связи отправлена в ЛС.")
 
-            except disnake.Forbidden:
-                 await inter.edit_original_response(content="❌ Не удалось отправить личные сообщения. Убедитесь, что у обоих пользователей разрешены ЛС от участников сервера.")
             except Exception as e:
                  print(f"Error sending approval DMs: {e}")
                  await inter.edit_original_response(content=f"❌ Произошла ошибка при отправке контактной информации: {e}")
@@ -704,25 +810,21 @@ class Trading(commands.Cog):
         elif action == "reject":
             # Reject the user - remove from interested list
             trade['interested_users'].remove(user_id_str)
-            self.save_trading_data()
+            await self.save_trading_data()
 
             # Optionally notify the rejected user (via DM)
-            try:
-                # Format rejection notification as an embed
-                rejection_embed = disnake.Embed(
-                    title=f"❌ Интерес отклонен",
-                    description=f"К сожалению, продавец отклонил ваш интерес к предложению:\n\n"
-                               f"**🛍️ Предмет:** {trade['item_name']}\n"
-                               f"**💰 Цена:** {trade['price']} монет\n\n"
-                               f"*Вы больше не в списке заинтересованных пользователей для этого предложения.*",
-                    color=disnake.Color.red()
-                )
-                if trade.get('image_urls'):
-                    rejection_embed.set_image(url=trade['image_urls'][0])
-                await user.send(embed=rejection_embed)
-
-            except disnake.Forbidden:
-                 print(f"Could not send rejection DM to user {user.id}.")
+            # Format rejection notification as an embed
+            rejection_embed = disnake.Embed(
+                title=f"❌ Интерес отклонен",
+                description=f"К сожалению, продавец отклонил ваш интерес к предложению:\n\n"
+                           f"**🛍️ Предмет:** {trade['item_name']}\n"
+                           f"**💰 Цена:** {trade['price']} монет\n\n"
+                           f"*Вы больше не в списке заинтересованных пользователей для этого предложения.*",
+                color=disnake.Color.red()
+            )
+            if trade.get('image_urls'):
+                rejection_embed.set_image(url=trade['image_urls'][0])
+            self.bot.dm.send(user, embed=rejection_embed)
 
             await inter.edit_original_response(content=f"✅ Интерес пользователя {user.mention} отклонен и удален из списка.")
 
@@ -0,0 +1,8 @@
+"""
+Общие сервисы бота
+"""
+from .dm import DMOutbox
+from .reminders import ReminderScheduler
+from .users import UserResolver
+
+__all__ = ['DMOutbox', 'ReminderScheduler', 'UserResolver']
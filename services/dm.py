@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import random
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import aiohttp
+import disnake
+
+# Рабочих задач отправки личных сообщений
+DM_WORKERS = 5
+# Сколько не пытаться писать пользователю с закрытыми личными сообщениями
+CLOSED_TTL = 6 * 3600
+CLOSED_MAX_SIZE = 10000
+MAX_ATTEMPTS = 4
+BACKOFF_BASE = 1.0
+
+# Коды ошибок Discord
+OPENING_DMS_TOO_FAST = 40003
+
+# Приоритеты очереди: ответы на действия модераторов раньше массовых рассылок
+URGENT = 0
+NORMAL = 1
+BULK = 2
+
+
+class DMOutbox:
+    """Очередь личных сообщений с пулом рабочих задач.
+
+    Все личные сообщения бота проходят через bot.dm. Отправка выполняется
+    не более чем workers задачами одновременно; временные ошибки (429,
+    5xx, сетевые) повторяются с экспоненциальной задержкой, а после 429
+    маршрут (открытие ЛС или канал ЛС пользователя) приостанавливается
+    на Retry-After. Пользователи с закрытыми личными сообщениями
+    запоминаются на CLOSED_TTL, и сообщения им не отправляются.
+
+    send возвращает Future с результатом доставки: его можно не ждать,
+    а ждать стоит, если сообщение должно уйти до действия (кик, бан)."""
+
+    def __init__(self, workers: int = DM_WORKERS, closed_ttl: float = CLOSED_TTL,
+                 max_attempts: int = MAX_ATTEMPTS, backoff: float = BACKOFF_BASE):
+        self.workers = workers
+        self.closed_ttl = closed_ttl
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks = []
+        self._counter = itertools.count()
+        self._closed: Dict[int, float] = {}  # ID пользователя: до какого времени не писать
+        self._blocked: Dict[object, float] = {}  # маршрут: до какого времени ждать
+
+        # Метрики
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.closed_skips = 0
+        self.send_ms_total = 0.0
+        self.wait_ms_total = 0.0
+
+    def _start(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+        self._tasks = [task for task in self._tasks if not task.done()]
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    def is_closed(self, user_id: int) -> bool:
+        """Личные сообщения пользователя недавно оказались закрыты"""
+        expires = self._closed.get(user_id)
+        if expires is None:
+            return False
+        if expires > time.monotonic():
+            return True
+        del self._closed[user_id]
+        return False
+
+    def _mark_closed(self, user_id: int):
+        now = time.monotonic()
+        if len(self._closed) >= CLOSED_MAX_SIZE:
+            self._closed = {uid: expires for uid, expires in self._closed.items() if expires > now}
+        self._closed[user_id] = now + self.closed_ttl
+
+    def send(self, user, content: Optional[str] = None, *, embed: Optional[disnake.Embed] = None,
+             priority: int = NORMAL) -> asyncio.Future:
+        """Ставит сообщение в очередь; Future получит True, если сообщение доставлено"""
+        future = asyncio.get_running_loop().create_future()
+        if self.is_closed(user.id):
+            self.closed_skips += 1
+            future.set_result(False)
+            return future
+        self._start()
+        self._queue.put_nowait((priority, next(self._counter), user, content, embed, future, time.monotonic()))
+        return future
+
+    async def send_many(self, users: Iterable, content: Optional[str] = None, *,
+                        embed: Optional[disnake.Embed] = None) -> Tuple[int, int]:
+        """Рассылка одного сообщения; возвращает (доставлено, не доставлено)"""
+        results = await asyncio.gather(*(self.send(user, content, embed=embed, priority=BULK) for user in users))
+        sent = sum(results)
+        return sent, len(results) - sent
+
+    async def _worker(self):
+        while True:
+            _, _, user, content, embed, future, enqueued = await self._queue.get()
+            try:
+                self.wait_ms_total += (time.monotonic() - enqueued) * 1000
+                delivered = await self._deliver(user, content, embed)
+            except Exception as e:
+                print(f"Ошибка при отправке личного сообщения {user.id}: {e}")
+                delivered = False
+            finally:
+                self._queue.task_done()
+            if delivered:
+                self.sent += 1
+            else:
+                self.failed += 1
+            if not future.done():
+                future.set_result(delivered)
+
+    @staticmethod
+    def _route(user):
+        # Без открытого канала ЛС сначала выполняется общий для бота запрос создания канала
+        return ('dm', user.id) if user.dm_channel is not None else 'create_dm'
+
+    async def _deliver(self, user, content, embed) -> bool:
+        for attempt in range(self.max_attempts):
+            route = self._route(user)
+            delay = self._blocked.get(route, 0) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            started = time.monotonic()
+            try:
+                await user.send(content, embed=embed)
+                self.send_ms_total += (time.monotonic() - started) * 1000
+                return True
+            except disnake.Forbidden as e:
+                if e.code != OPENING_DMS_TOO_FAST:
+                    self._mark_closed(user.id)
+                    return False
+                retry_after = self._retry_after(e, attempt)
+                self._blocked['create_dm'] = time.monotonic() + retry_after
+            except disnake.NotFound:
+                self._mark_closed(user.id)
+                return False
+            except disnake.HTTPException as e:
+                if e.status != 429 and e.status < 500:
+                    print(f"Не удалось отправить личное сообщение {user.id}: {e}")
+                    return False
+                retry_after = self._retry_after(e, attempt)
+                if e.status == 429:
+                    self.rate_limited += 1
+                    self._blocked[route] = time.monotonic() + retry_after
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                retry_after = self._retry_after(None, attempt)
+
+            if attempt + 1 < self.max_attempts:
+                self.retries += 1
+                await asyncio.sleep(retry_after)
+        return False
+
+    def _retry_after(self, error: Optional[disnake.HTTPException], attempt: int) -> float:
+        """Задержка перед повтором: Retry-After из ответа или экспоненциальная с разбросом"""
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            return float(headers['Retry-After'])
+        except (KeyError, TypeError, ValueError):
+            return self.backoff * 2 ** attempt * random.uniform(1.0, 1.5)
+
+    def metrics(self) -> Dict:
+        done = self.sent + self.failed
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'sent': self.sent,
+            'failed': self.failed,
+            'failure_rate': round(self.failed / done * 100, 1) if done else 0.0,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'closed_skips': self.closed_skips,
+            'closed_cached': len(self._closed),
+            'avg_send_ms': round(self.send_ms_total / self.sent, 1) if self.sent else 0.0,
+            'avg_wait_ms': round(self.wait_ms_total / done, 1) if done else 0.0,
+        }
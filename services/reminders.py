@@ -0,0 +1,196 @@
+import asyncio
+import heapq
+import itertools
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from storage import OffloopWriter, open_backend
+from .dm import BULK
+
+# За сколько минут до начала события напоминать участникам
+DEFAULT_OFFSETS = [24 * 60, 60, 10]
+
+
+def format_minutes(minutes: int) -> str:
+    """Оставшееся время: «2 ч 30 мин», «10 мин»"""
+    hours, minutes = divmod(max(minutes, 0), 60)
+    if hours and minutes:
+        return f"{hours} ч {minutes} мин"
+    if hours:
+        return f"{hours} ч"
+    return f"{minutes} мин"
+
+
+class ReminderScheduler:
+    """Напоминания о событиях клана в точное время.
+
+    Напоминания лежат в куче по времени срабатывания, а одна задача спит
+    до ближайшего из них. Куча сохраняется в отдельный документ, поэтому
+    при запуске данные кланов не загружаются: раздел сервера читается
+    только при отправке его напоминания. Отправленные отступы
+    записываются в событие (reminders_sent) и не повторяются после
+    перезапуска. Записи кучи не удаляются при отмене или переносе
+    события: перед отправкой проверяется, что событие существует и его
+    дата не изменилась."""
+
+    def __init__(self, bot, clan_state, data_file: str = 'data/reminders.json'):
+        self.bot = bot
+        self.clan_state = clan_state
+        self.backend = open_backend('reminders', data_file)
+        self.writer = OffloopWriter(self.backend)
+        self._heap: List[Tuple[float, int, int, str, str, int]] = []
+        self._counter = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+
+        # Метрики
+        self.fired = 0
+        self.skipped = 0
+
+    def start(self):
+        """Загружает сохранённую очередь и запускает таймер; повторный вызов ничего не делает"""
+        if self._task is not None and not self._task.done():
+            return
+        self._wakeup = asyncio.Event()
+        if not self._loaded:
+            self._load()
+        self._task = asyncio.create_task(self._run())
+
+    def _load(self):
+        try:
+            stored = self.backend.load()
+        except Exception as e:
+            print(f"Ошибка при загрузке очереди напоминаний: {e}")
+            stored = None
+        self._loaded = True
+        if stored is None:
+            self._seed()
+            return
+
+        now = time.time()
+        overdue: Dict[Tuple[int, str, str], int] = {}
+        for due, guild_id, event_id, date, offset in stored.get('entries', []):
+            if due > now:
+                self._push(due, guild_id, event_id, date, offset, save=False)
+            elif datetime.fromisoformat(date).timestamp() > now:
+                # Пропущенные за время простоя напоминания заменяются одним — ближайшим к началу
+                key = (guild_id, event_id, date)
+                overdue[key] = min(offset, overdue.get(key, offset))
+        for (guild_id, event_id, date), offset in overdue.items():
+            self._push(now, guild_id, event_id, date, offset, save=False)
+
+    def _seed(self):
+        """Первый запуск без сохранённой очереди: события читаются из хранилища, не загружая разделы"""
+        for guild in self.bot.guilds:
+            clan_data = self.clan_state.peek(guild.id)
+            for event_id, event in ((clan_data or {}).get('events') or {}).items():
+                self._schedule_event(guild.id, event_id, event, (clan_data.get('settings') or {}))
+        self._save()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    @staticmethod
+    def _offsets(settings: Dict) -> List[int]:
+        return sorted(set(settings.get('event_reminders', DEFAULT_OFFSETS)), reverse=True)
+
+    def schedule(self, guild_id: int, event_id: str):
+        """Ставит в очередь ещё не отправленные напоминания события"""
+        if not self._loaded:
+            # Сохранённая очередь не должна быть перезаписана до загрузки
+            self._load()
+        clan_data = self.clan_state.guild(guild_id)
+        event = clan_data['events'].get(event_id)
+        if event is None:
+            return
+        self._schedule_event(guild_id, event_id, event, clan_data['settings'])
+        self._save()
+
+    def _schedule_event(self, guild_id: int, event_id: str, event: Dict, settings: Dict):
+        starts_at = datetime.fromisoformat(event['date']).timestamp()
+        now = time.time()
+        if starts_at <= now:
+            return
+        sent = set(event.get('reminders_sent', []))
+        overdue = None
+        for offset in self._offsets(settings):
+            if offset in sent:
+                continue
+            due = starts_at - offset * 60
+            if due <= now:
+                # Пропущенные за время простоя напоминания заменяются одним — ближайшим к началу
+                overdue = offset
+                continue
+            self._push(due, guild_id, event_id, event['date'], offset, save=False)
+        if overdue is not None:
+            self._push(now, guild_id, event_id, event['date'], overdue, save=False)
+
+    def _push(self, due: float, guild_id: int, event_id: str, date: str, offset: int, save: bool = True):
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (due, next(self._counter), guild_id, event_id, date, offset))
+        if self._wakeup is not None and (earliest is None or due < earliest):
+            self._wakeup.set()
+        if save:
+            self._save()
+
+    def _save(self):
+        """Записывает очередь в фоне (запись выполняется в рабочем потоке)"""
+        entries = [[due, guild_id, event_id, date, offset] for due, _, guild_id, event_id, date, offset in self._heap]
+        asyncio.get_running_loop().create_task(self._write({'entries': entries}))
+
+    async def _write(self, data: Dict):
+        try:
+            await self.writer.save(data)
+        except Exception as e:
+            print(f"Ошибка при сохранении очереди напоминаний: {e}")
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, guild_id, event_id, date, offset = heapq.heappop(self._heap)
+            self._save()
+            try:
+                await self._fire(guild_id, event_id, date, offset)
+            except Exception as e:
+                print(f"Ошибка при отправке напоминания о событии {event_id} на сервере {guild_id}: {e}")
+
+    async def _fire(self, guild_id: int, event_id: str, date: str, offset: int):
+        clan_data = self.clan_state.guild(guild_id)
+        event = clan_data['events'].get(event_id)
+        sent = event.setdefault('reminders_sent', []) if event is not None else None
+        if event is None or event['date'] != date or offset in sent:
+            self.skipped += 1
+            return
+
+        # Более ранние отступы тоже считаются отправленными
+        sent.extend(o for o in self._offsets(clan_data['settings']) if o >= offset and o not in sent)
+        self.clan_state.save(guild_id)
+        self.fired += 1
+
+        guild = self.bot.get_guild(guild_id)
+        users = await self.bot.user_resolver.resolve_many(event['participants'], guild)
+        minutes = round((datetime.fromisoformat(date).timestamp() - time.time()) / 60)
+        content = f'Напоминание: событие "{event["name"]}" начнется через {format_minutes(minutes)}!'
+        # Доставкой занимается очередь личных сообщений: таймер не ждёт рассылку
+        for user in users:
+            if user:
+                self.bot.dm.send(user, content, priority=BULK)
+
+    def metrics(self) -> Dict:
+        return {
+            'scheduled': len(self._heap),
+            'fired': self.fired,
+            'skipped': self.skipped,
+        }
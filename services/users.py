@@ -0,0 +1,110 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import disnake
+
+
+class UserResolver:
+    """Поиск пользователей по ID с минимумом запросов к API.
+
+    Порядок поиска: кэш участников сервера, кэш пользователей бота,
+    собственный LRU-кэш загруженных пользователей с ограниченным временем
+    жизни и только затем REST-запрос. Промахи загружаются параллельно, но
+    не более concurrency запросов одновременно; одновременные запросы
+    одного и того же ID объединяются."""
+
+    def __init__(self, bot, max_size: int = 5000, ttl: float = 3600.0, concurrency: int = 5):
+        self.bot = bot
+        self.max_size = max_size
+        self.ttl = ttl
+        self._cache: 'OrderedDict[int, tuple]' = OrderedDict()  # ID: (пользователь или None, истекает)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._concurrency = concurrency
+
+        # Метрики
+        self.member_hits = 0
+        self.user_cache_hits = 0
+        self.lru_hits = 0
+        self.rest_calls = 0
+        self.rest_failures = 0
+
+    def get_cached(self, user_id: int, guild: Optional[disnake.Guild] = None):
+        """Ищет пользователя без обращения к API; None, если его нет в кэшах"""
+        if guild is not None:
+            member = guild.get_member(user_id)
+            if member is not None:
+                self.member_hits += 1
+                return member
+
+        user = self.bot.get_user(user_id)
+        if user is not None:
+            self.user_cache_hits += 1
+            return user
+
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            user, expires = entry
+            if expires > time.monotonic():
+                self._cache.move_to_end(user_id)
+                self.lru_hits += 1
+                return user
+            del self._cache[user_id]
+        return None
+
+    async def resolve(self, user_id: int, guild: Optional[disnake.Guild] = None):
+        """Возвращает участника или пользователя; None, если пользователь не найден"""
+        user_id = int(user_id)
+        user = self.get_cached(user_id, guild)
+        if user is not None or user_id in self._cache:
+            return user
+
+        # Запрос этого ID уже выполняется: ждём его результата
+        task = self._pending.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(user_id))
+            self._pending[user_id] = task
+            task.add_done_callback(lambda _: self._pending.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, user_ids: Iterable[int], guild: Optional[disnake.Guild] = None) -> List:
+        """Возвращает пользователей в том же порядке; промахи загружаются параллельно"""
+        return await asyncio.gather(*(self.resolve(user_id, guild) for user_id in user_ids))
+
+    async def _fetch(self, user_id: int):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        async with self._semaphore:
+            self.rest_calls += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except disnake.NotFound:
+                # Удалённый аккаунт: запоминаем, чтобы не запрашивать снова
+                user = None
+            except disnake.HTTPException:
+                self.rest_failures += 1
+                return None
+        self._remember(user_id, user)
+        return user
+
+    def _remember(self, user_id: int, user):
+        self._cache[user_id] = (user, time.monotonic() + self.ttl)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    def metrics(self) -> Dict:
+        """Возвращает счётчики попаданий и запросов"""
+        hits = self.member_hits + self.user_cache_hits + self.lru_hits
+        total = hits + self.rest_calls
+        return {
+            'member_hits': self.member_hits,
+            'user_cache_hits': self.user_cache_hits,
+            'lru_hits': self.lru_hits,
+            'rest_calls': self.rest_calls,
+            'rest_failures': self.rest_failures,
+            'hit_rate': round(hits / total * 100, 1) if total else 0.0,
+            'cached': len(self._cache),
+        }
@@ -0,0 +1,8 @@
+"""
+Модуль общего состояния бота
+"""
+from .activity import LastSeenIndex, LastSeenTracker
+from .clan import ClanState
+from .trades import TradeRepository
+
+__all__ = ['ClanState', 'LastSeenIndex', 'LastSeenTracker', 'TradeRepository']
@@ -0,0 +1,124 @@
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+# Отметка активности обновляется не чаще раза в TOUCH_GRANULARITY секунд
+TOUCH_GRANULARITY = 300
+
+_ID_BITS = 64
+_ID_MASK = (1 << _ID_BITS) - 1
+
+
+def _timestamp(value: Optional[str]) -> int:
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except (TypeError, ValueError):
+        return 0
+
+
+class LastSeenIndex:
+    """Участники клана, упорядоченные по времени последней активности.
+
+    Ключи (время << 64 | ID) хранятся в отсортированном списке, поэтому
+    давно неактивные участники читаются с начала списка за O(k), где k —
+    число неактивных, а обновление отметки стоит O(log n)."""
+
+    def __init__(self, seen: Dict[int, int]):
+        self._seen = seen
+        keys = (self._key(user_id, seen_at) for user_id, seen_at in seen.items())
+        self._keys = SortedList(keys)
+
+    @classmethod
+    def from_members(cls, members: Dict[str, Dict]) -> 'LastSeenIndex':
+        """Индекс по данным клана; без отметки активности учитывается дата вступления"""
+        return cls({
+            int(user_id): _timestamp(record.get('last_seen') or record.get('joined_at'))
+            for user_id, record in members.items()
+        })
+
+    @staticmethod
+    def _key(user_id: int, seen_at: int) -> int:
+        return (seen_at << _ID_BITS) | user_id
+
+    def get(self, user_id: int, default=None) -> Optional[int]:
+        return self._seen.get(user_id, default)
+
+    def set(self, user_id: int, seen_at: int):
+        if user_id in self._seen:
+            self._keys.discard(self._key(user_id, self._seen[user_id]))
+        self._seen[user_id] = seen_at
+        self._keys.add(self._key(user_id, seen_at))
+
+    def discard(self, user_id: int):
+        if user_id in self._seen:
+            self._keys.discard(self._key(user_id, self._seen.pop(user_id)))
+
+    def older_than(self, cutoff: int) -> List[int]:
+        """ID участников, последняя активность которых раньше cutoff"""
+        result = []
+        for key in self._keys:
+            if key >> _ID_BITS >= cutoff:
+                break
+            result.append(key & _ID_MASK)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+class LastSeenTracker:
+    """Время последней активности (сообщения, голосовые каналы) участников клана.
+
+    Обработчики событий вызывают touch на каждое действие, но отметка в
+    индексе и в данных клана меняется не чаще раза в TOUCH_GRANULARITY
+    секунд на участника, поэтому запись данных клана происходит редко.
+    Индекс сервера строится при первом обращении, удаляется вместе с
+    выгрузкой данных сервера и строится заново, когда меняется состав
+    клана (ClanState.add_member/remove_member увеличивают members_version)."""
+
+    def __init__(self, clan_state, granularity: int = TOUCH_GRANULARITY):
+        self.clan_state = clan_state
+        self.granularity = granularity
+        # Сервер: (members_version, по которой построен индекс, индекс)
+        self._indexes: Dict[int, Tuple[int, LastSeenIndex]] = {}
+        clan_state.on_evict(self.forget)
+
+    def _index(self, guild_id: int, members: Dict[str, Dict]) -> LastSeenIndex:
+        version = self.clan_state.members_version(guild_id)
+        cached = self._indexes.get(guild_id)
+        if cached is None or cached[0] != version:
+            cached = self._indexes[guild_id] = (version, LastSeenIndex.from_members(members))
+        return cached[1]
+
+    def forget(self, guild_id: int):
+        """Удаляет индекс сервера (данные сервера выгружены из памяти)"""
+        self._indexes.pop(guild_id, None)
+
+    def touch(self, guild_id: int, user_id: int, now: Optional[float] = None):
+        """Отмечает активность участника клана; остальные пользователи игнорируются"""
+        members = self.clan_state.guild(guild_id)['members']
+        record = members.get(str(user_id))
+        if record is None:
+            return
+        now = int(time.time() if now is None else now)
+        index = self._index(guild_id, members)
+        if now - index.get(user_id, 0) < self.granularity:
+            return
+        index.set(user_id, now)
+        record['last_seen'] = datetime.fromtimestamp(now).isoformat()
+        self.clan_state.save(guild_id)
+
+    def inactive(self, guild_id: int, cutoff: float) -> List[int]:
+        """ID участников клана без активности с момента cutoff (Unix-время)"""
+        members = self.clan_state.guild(guild_id)['members']
+        index = self._index(guild_id, members)
+        result = []
+        for user_id in index.older_than(int(cutoff)):
+            if str(user_id) in members:
+                result.append(user_id)
+            else:
+                # Участник покинул клан: индекс очищается при чтении
+                index.discard(user_id)
+        return result
@@ -0,0 +1,187 @@
+import copy
+import os
+from typing import Dict, Optional
+
+from storage import Partition, PartitionedStore, open_backend, open_guild_backend
+from storage.backends import LEGACY_GUILD_ID
+
+# Структура данных клана по умолчанию
+DEFAULT_CLAN_DATA = {
+    'members': {},  # ID участника: {joined_at, role, last_seen}
+    'applications': {},  # ID заявки: {timestamp, status, age, experience, motivation, screenshots}
+    'roles': {
+        'leader': None,
+        'member': None,
+        'applicant': None,
+        'new_member': None
+    },
+    'events': {},  # ID события: {name, date, description, participants, created_by}
+    'warnings': {},  # ID предупреждения: {user_id, reason, timestamp, issued_by}
+    'announcements': [],  # Список объявлений
+    'subclans': {},  # Подразделения клана
+    'factions': {  # Система группировок
+        'enabled': False,  # Включена ли система
+        'message_id': None,  # ID сообщения с embed
+        'channel_id': None,  # ID канала с выбором группировок
+        'factions': {}  # Словарь группировок: {id: {name, role_id, emoji, description, color}}
+    },
+    'notifications': {
+        'youtube': {},
+        'twitch': {}
+    },
+    'settings': {
+        'welcome_channel': None,
+        'announcement_channel': None,
+        'log_channel': None,
+        'prefix': '!',  # Префикс команд
+        'auto_role': None,  # Автоматическая роль для новых участников
+        'welcome_message': 'Добро пожаловать на сервер!',  # Сообщение приветствия
+        'inactivity_days': 30,  # Количество дней неактивности
+        'max_warnings': 3,  # Максимальное количество предупреждений
+        'event_reminders': [1440, 60, 10],  # За сколько минут до события напоминать участникам
+        'allowed_screenshot_domains': [],  # Разрешенные домены для скриншотов
+        'moderation_roles': [],  # ID ролей модераторов
+        'admin_roles': [],  # ID ролей администраторов
+        'custom_commands': {},  # Пользовательские команды
+        'auto_delete_messages': False,  # Автоматическое удаление сообщений
+        'auto_delete_delay': 60,  # Задержка удаления сообщений в секундах
+        'log_events': True,  # Логирование событий
+        'log_types': {  # Типы событий для логирования
+            'member_join': True,
+            'member_leave': True,
+            'message_delete': True,
+            'message_edit': True,
+            'role_changes': True,
+            'channel_changes': True,
+            'server_changes': True
+        }
+    },
+    'temp_channels': {  # Настройки временных каналов
+        'enabled': False,
+        'category_id': None,
+        'name_template': "🎮 {username}",
+        'user_limit': 0,
+        'bitrate': 128000,
+        'auto_delete': True,
+        'delete_after': 300,  # 5 минут
+        'allowed_roles': [],
+        'prefix': "🎮",
+        'suffix': "",
+        'default_name': "Временный канал"
+    }
+}
+
+
+class ClanPartition(Partition):
+    """Данные клана одного сервера.
+
+    members_version увеличивается при каждом добавлении и удалении
+    участника через ClanState, чтобы построенные по составу клана индексы
+    узнавали об изменениях."""
+
+    def __init__(self, guild_id: int, backend, data: Dict):
+        super().__init__(guild_id, backend, data)
+        self.members_version = 0
+
+
+class ClanState:
+    """Данные клана по серверам: загрузка, доступ и сохранение.
+
+    Создаётся в main.py и доступна когам как bot.clan_state. Данные сервера
+    загружаются при первом обращении и выгружаются после простоя."""
+
+    def __init__(self, interval: float = 5.0):
+        # Отложенная запись: пачка изменений стоит одной записи раздела
+        self.store = PartitionedStore('clan', self._load_partition, interval=interval)
+        if LEGACY_GUILD_ID is None and os.path.exists('clan_data.json'):
+            print("Найден общий clan_data.json: укажите LEGACY_GUILD_ID, чтобы перенести его в раздел сервера")
+
+    def _load_partition(self, guild_id: int) -> ClanPartition:
+        backend = open_guild_backend('clan', guild_id)
+        data = copy.deepcopy(DEFAULT_CLAN_DATA)
+        migrated = False
+        try:
+            loaded_data = backend.load()
+            if loaded_data is None and guild_id == LEGACY_GUILD_ID:
+                loaded_data = self._load_legacy()
+                migrated = loaded_data is not None
+        except Exception as e:
+            print(f"Ошибка при загрузке данных сервера {guild_id}: {e}")
+            loaded_data = None
+
+        if loaded_data:
+            # Обновляем значения по умолчанию, сохраняя структуру
+            for key, value in loaded_data.items():
+                if key in data and isinstance(data[key], dict):
+                    data[key].update(value)
+                else:
+                    data[key] = value
+        partition = ClanPartition(guild_id, backend, data)
+        if loaded_data is None or migrated:
+            partition.mark_dirty()
+        return partition
+
+    @staticmethod
+    def _load_legacy() -> Optional[Dict]:
+        """Общий clan_data.json, созданный до разделения данных по серверам"""
+        legacy = open_backend('clan', 'clan_data.json')
+        data = legacy.load()
+        if data is not None:
+            print(f"Данные клана перенесены из {legacy.name} в раздел сервера {LEGACY_GUILD_ID}")
+        return data
+
+    def guild(self, guild_id: int) -> Dict:
+        """Данные клана сервера"""
+        return self.store.get(guild_id).data
+
+    def add_member(self, guild_id: int, user_id: int, record: Dict):
+        """Добавляет участника клана (или заменяет его запись)"""
+        partition = self.store.get(guild_id)
+        partition.data['members'][str(user_id)] = record
+        partition.members_version += 1
+        partition.mark_dirty()
+
+    def remove_member(self, guild_id: int, user_id: int) -> Optional[Dict]:
+        """Удаляет участника клана и возвращает его запись"""
+        partition = self.store.get(guild_id)
+        record = partition.data['members'].pop(str(user_id), None)
+        if record is not None:
+            partition.members_version += 1
+            partition.mark_dirty()
+        return record
+
+    def members_version(self, guild_id: int) -> int:
+        """Номер изменения состава клана сервера"""
+        return self.store.get(guild_id).members_version
+
+    def peek(self, guild_id: int) -> Optional[Dict]:
+        """Данные клана сервера без загрузки раздела в память.
+
+        Если раздел загружен, возвращаются его данные, иначе — документ,
+        прочитанный из хранилища (None, если его нет); изменения такого
+        документа не сохраняются."""
+        partition = self.store.partitions.get(guild_id)
+        if partition is not None:
+            return partition.data
+        try:
+            return open_guild_backend('clan', guild_id).load()
+        except Exception as e:
+            print(f"Ошибка при чтении данных сервера {guild_id}: {e}")
+            return None
+
+    def on_evict(self, callback):
+        """Регистрирует callback(guild_id), вызываемый после выгрузки данных сервера"""
+        self.store.evict_callbacks.append(callback)
+
+    def save(self, guild_id: int) -> bool:
+        """Помечает данные сервера как изменённые; запись выполнит фоновая задача"""
+        self.store.mark_dirty(guild_id)
+        return True
+
+    def start(self):
+        """Запускает фоновую запись"""
+        self.store.start()
+
+    def flush(self) -> bool:
+        """Синхронно записывает несохранённые изменения"""
+        return self.store.flush()
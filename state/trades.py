@@ -0,0 +1,102 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+class TradeRepository:
+    """Торговые предложения с индексами по сообщению, продавцу, покупателю и статусу.
+
+    Записи хранятся в исходном словаре trades (он же сохраняется в
+    trading.json), а индексы строятся при загрузке и ссылаются на те же
+    словари сделок. Поиск по сообщению стоит O(1), выборки по продавцу и
+    покупателю и по статусу/категории — O(k) от размера результата. Добавление,
+    удаление и смена статуса должны идти через репозиторий, иначе индексы
+    разойдутся с данными."""
+
+    def __init__(self, trades: Dict[str, Dict]):
+        self.trades = trades
+        self._by_message: Dict[int, str] = {}
+        # (продавец, статус), (покупатель, статус) и (статус, категория): {ID: сделка} в порядке создания
+        self._by_seller: Dict[Tuple[str, str], Dict[str, Dict]] = defaultdict(dict)
+        self._by_buyer: Dict[Tuple[str, str], Dict[str, Dict]] = defaultdict(dict)
+        self._by_status: Dict[Tuple[str, str], Dict[str, Dict]] = defaultdict(dict)
+        for trade in trades.values():
+            self._index(trade)
+
+    def _index(self, trade: Dict):
+        if trade.get('message_id'):
+            self._by_message[trade['message_id']] = trade['id']
+        self._by_seller[trade['seller'], trade['status']][trade['id']] = trade
+        if trade.get('buyer'):
+            self._by_buyer[trade['buyer'], trade['status']][trade['id']] = trade
+        self._by_status[trade['status'], trade.get('category')][trade['id']] = trade
+
+    def _unindex(self, trade: Dict):
+        if self._by_message.get(trade.get('message_id')) == trade['id']:
+            del self._by_message[trade['message_id']]
+        self._discard(self._by_seller, (trade['seller'], trade['status']), trade['id'])
+        self._discard(self._by_buyer, (trade.get('buyer'), trade['status']), trade['id'])
+        self._discard(self._by_status, (trade['status'], trade.get('category')), trade['id'])
+
+    @staticmethod
+    def _discard(index, key, trade_id: str):
+        entries = index.get(key)
+        if entries is not None:
+            entries.pop(trade_id, None)
+            if not entries:
+                del index[key]
+
+    def get(self, trade_id: str) -> Optional[Dict]:
+        return self.trades.get(trade_id)
+
+    def __contains__(self, trade_id: str) -> bool:
+        return trade_id in self.trades
+
+    def __len__(self) -> int:
+        return len(self.trades)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.trades.values())
+
+    def add(self, trade: Dict):
+        """Добавляет или заменяет сделку"""
+        old = self.trades.get(trade['id'])
+        if old is not None:
+            self._unindex(old)
+        self.trades[trade['id']] = trade
+        self._index(trade)
+
+    def remove(self, trade_id: str) -> Optional[Dict]:
+        """Удаляет сделку из словаря и индексов и возвращает её"""
+        trade = self.trades.pop(trade_id, None)
+        if trade is not None:
+            self._unindex(trade)
+        return trade
+
+    def set_status(self, trade_id: str, status: str):
+        trade = self.trades[trade_id]
+        self._unindex(trade)
+        trade['status'] = status
+        self._index(trade)
+
+    def by_message(self, message_id: int) -> Optional[Dict]:
+        trade_id = self._by_message.get(message_id)
+        return self.trades.get(trade_id) if trade_id is not None else None
+
+    def by_seller(self, seller_id, status: str) -> List[Dict]:
+        return list(self._by_seller.get((str(seller_id), status), {}).values())
+
+    def by_buyer(self, buyer_id, status: str) -> List[Dict]:
+        return list(self._by_buyer.get((str(buyer_id), status), {}).values())
+
+    def count_by_seller(self, seller_id, status: str) -> int:
+        return len(self._by_seller.get((str(seller_id), status), ()))
+
+    def by_status(self, status: str, category: Optional[str] = None) -> List[Dict]:
+        """Сделки со статусом; без категории — по всем категориям"""
+        if category is not None:
+            return list(self._by_status.get((status, category), {}).values())
+        result = []
+        for key, trades in self._by_status.items():
+            if key[0] == status:
+                result.extend(trades.values())
+        return result
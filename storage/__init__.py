@@ -0,0 +1,11 @@
+"""
+Модуль хранения данных бота
+"""
+from .aio import OffloopWriter
+from .backends import JsonFileBackend, open_backend, open_guild_backend
+from .partitioned import Partition, PartitionedStore
+
+__all__ = [
+    'JsonFileBackend', 'OffloopWriter', 'Partition', 'PartitionedStore',
+    'open_backend', 'open_guild_backend',
+]
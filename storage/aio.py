@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+# Все созданные писатели, для команды /metrics
+writers: List['OffloopWriter'] = []
+
+# Словари верхнего уровня от этого размера копируются по записям, порциями
+CHUNKED_MIN_SIZE = 1000
+# Сколько миллисекунд подряд копирование может занимать цикл событий
+SLICE_MS = 0.5
+
+
+_MISSING = object()
+
+
+def snapshot(value):
+    """Быстрая глубокая копия JSON-совместимых данных (dict/list/скаляры).
+
+    Компактные таблицы (объекты с методами snapshot/to_json) копируются
+    своим методом snapshot, а в JSON преобразуются уже в рабочем потоке."""
+    if isinstance(value, dict):
+        return {key: snapshot(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [snapshot(item) for item in value]
+    if hasattr(value, 'to_json'):
+        return value.snapshot()
+    return value
+
+
+def materialize(data: Dict) -> Dict:
+    """Преобразует компактные таблицы верхнего уровня документа в JSON-совместимые данные"""
+    if not any(hasattr(item, 'to_json') for item in data.values()):
+        return data
+    return {key: item.to_json() if hasattr(item, 'to_json') else item for key, item in data.items()}
+
+
+class OffloopWriter:
+    """Сохранение документа без блокировки цикла событий.
+
+    В цикле событий снимается только копия данных, а кодирование и запись
+    выполняются в рабочем потоке. Небольшие ключи документа и компактные
+    таблицы копируются сразу при вызове save, а крупные словари записей
+    (сделки, участники клана) — по записям, порциями не дольше SLICE_MS,
+    между которыми цикл событий обрабатывает другие задачи. Каждая запись
+    копируется целиком, но записи могут быть сняты в разные моменты:
+    изменение, сделанное во время копирования, попадёт в следующее
+    сохранение, которое вызывающий код запускает после каждого изменения.
+
+    Самый долгий непрерывный отрезок копирования в цикле событий (stall)
+    и суммарное время копирования учитываются в метриках."""
+
+    def __init__(self, backend, track: bool = True):
+        self.backend = backend
+        self.name = backend.name
+        self._lock: Optional[asyncio.Lock] = None
+
+        # Метрики
+        self.save_count = 0
+        self.last_stall_ms = 0.0
+        self.max_stall_ms = 0.0
+        self.total_stall_ms = 0.0
+        self.last_copy_ms = 0.0
+        self.last_write_ms = 0.0
+        self.max_write_ms = 0.0
+        # Писатели разделов серверов учитываются в метриках PartitionedStore
+        if track:
+            writers.append(self)
+
+    async def save(self, data: Dict):
+        """Снимает копию данных и записывает её в рабочем потоке"""
+        started = time.perf_counter()
+        copy = {}
+        chunked = []
+        for key, item in data.items():
+            if isinstance(item, dict) and len(item) >= CHUNKED_MIN_SIZE:
+                copy[key] = item
+                chunked.append(key)
+            else:
+                copy[key] = snapshot(item)
+        slices = [(time.perf_counter() - started) * 1000]
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        # Записи одного документа не должны обгонять друг друга
+        async with self._lock:
+            for key in chunked:
+                copy[key] = await self._copy_records(copy[key], slices)
+            self._record_stall(slices)
+
+            started = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(None, self._write, copy)
+            write_ms = (time.perf_counter() - started) * 1000
+        self.last_write_ms = write_ms
+        self.max_write_ms = max(self.max_write_ms, write_ms)
+
+    @staticmethod
+    async def _copy_records(records: Dict, slices: List[float]) -> Dict:
+        """Копирует словарь записей, отпуская цикл событий каждые SLICE_MS"""
+        copy = {}
+        started = time.perf_counter()
+        for key in list(records):
+            record = records.get(key, _MISSING)
+            # Запись удалили, пока цикл событий был отпущен
+            if record is not _MISSING:
+                copy[key] = snapshot(record)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= SLICE_MS:
+                slices.append(elapsed_ms)
+                await asyncio.sleep(0)
+                started = time.perf_counter()
+        slices.append((time.perf_counter() - started) * 1000)
+        return copy
+
+    def _record_stall(self, slices: List[float]):
+        stall_ms = max(slices)
+        self.last_stall_ms = stall_ms
+        self.max_stall_ms = max(self.max_stall_ms, stall_ms)
+        self.total_stall_ms += stall_ms
+        self.last_copy_ms = sum(slices)
+        self.save_count += 1
+
+    def _write(self, copy: Dict):
+        self.backend.save(materialize(copy))
+
+    def save_sync(self, data: Dict):
+        """Синхронная запись (запуск и завершение работы, когда цикла событий уже нет)"""
+        self.backend.save(materialize(data))
+
+    async def load(self) -> Optional[Dict]:
+        """Читает и декодирует документ в рабочем потоке"""
+        return await asyncio.get_running_loop().run_in_executor(None, self.backend.load)
+
+    def metrics(self) -> Dict:
+        """Возвращает метрики записи"""
+        return {
+            'name': self.name,
+            'save_count': self.save_count,
+            'last_stall_ms': round(self.last_stall_ms, 3),
+            'avg_stall_ms': round(self.total_stall_ms / self.save_count, 3) if self.save_count else 0.0,
+            'max_stall_ms': round(self.max_stall_ms, 3),
+            'last_copy_ms': round(self.last_copy_ms, 2),
+            'last_write_ms': round(self.last_write_ms, 2),
+            'max_write_ms': round(self.max_write_ms, 2),
+        }
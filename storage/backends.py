@@ -0,0 +1,77 @@
+import os
+from typing import Dict, Optional
+
+from .serializers import decode_auto, default_serializer
+
+# Выбор хранилища: "json" (файлы, по умолчанию) или "sqlite"
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json').lower()
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/clan_bot.db')
+# Каталог с данными серверов: <GUILD_DATA_DIR>/<ID сервера>/<документ>.json
+GUILD_DATA_DIR = os.getenv('GUILD_DATA_DIR', 'data/guilds')
+# Сервер, которому принадлежат данные из общих файлов, созданных до разделения
+LEGACY_GUILD_ID = int(os.getenv('LEGACY_GUILD_ID', '0')) or None
+
+
+class JsonFileBackend:
+    """Хранение документа в файле.
+
+    Запись идёт в формате STORAGE_FORMAT (компактный JSON через orjson или
+    json, либо msgpack), а при чтении формат определяется автоматически,
+    поэтому старые файлы с отступами читаются как прежде."""
+
+    def __init__(self, path: str, backup_path: Optional[str] = None, serializer=None):
+        self.path = path
+        self.backup_path = backup_path
+        self.serializer = serializer or default_serializer
+        self.name = path
+
+    def _read(self, path: str) -> Optional[Dict]:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, 'rb') as f:
+            return decode_auto(f.read())
+
+    def _write(self, path: str, data: Dict):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.serializer.encode(data))
+        os.replace(tmp_path, path)
+
+    def load(self) -> Optional[Dict]:
+        """Загружает документ; None, если данных ещё нет"""
+        data = self._read(self.path)
+        if data is None and self.backup_path:
+            data = self._read(self.backup_path)
+            if data is not None:
+                print(f"Загружены данные из резервной копии {self.backup_path}")
+        return data
+
+    def save(self, data: Dict):
+        """Записывает документ целиком (сначала резервную копию, если она задана)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.backup_path:
+            self._write(self.backup_path, data)
+        self._write(self.path, data)
+
+
+def open_backend(name: str, json_path: str, backup_path: Optional[str] = None, partition: str = ''):
+    """Возвращает хранилище документа в соответствии с STORAGE_BACKEND"""
+    if STORAGE_BACKEND == 'sqlite':
+        from .sqlite_backend import SQLiteDocument, get_database
+        return SQLiteDocument(get_database(DATABASE_URL), name, partition)
+    if STORAGE_BACKEND != 'json':
+        print(f"Неизвестное хранилище {STORAGE_BACKEND!r}, используются JSON-файлы")
+    return JsonFileBackend(json_path, backup_path)
+
+
+def guild_path(guild_id: int, filename: str) -> str:
+    """Путь к файлу в каталоге сервера"""
+    return os.path.join(GUILD_DATA_DIR, str(guild_id), filename)
+
+
+def open_guild_backend(name: str, guild_id: int, backup: bool = False):
+    """Хранилище документа одного сервера"""
+    backup_path = guild_path(guild_id, f"{name}_backup.json") if backup else None
+    return open_backend(name, guild_path(guild_id, f"{name}.json"), backup_path, partition=str(guild_id))
@@ -0,0 +1,112 @@
+"""
+Однократный перенос данных из JSON-файлов в SQLite
+
+Запуск: python -m storage.migrate [--database sqlite:///data/clan_bot.db]
+
+Данные серверов берутся из GUILD_DATA_DIR, а общие файлы, созданные до
+разделения по серверам, переносятся в раздел сервера LEGACY_GUILD_ID.
+Журнал начислений опыта применяется к снимку уровней до переноса.
+"""
+import argparse
+import os
+
+from .backends import DATABASE_URL, GUILD_DATA_DIR, LEGACY_GUILD_ID, JsonFileBackend, guild_path
+from .sqlite_backend import SQLiteDocument, get_database
+
+# Общие документы -> (JSON-файл, резервная копия)
+JSON_SOURCES = {
+    'trading': ('data/trading.json', None),
+    'giveaways': ('data/giveaways.json', None),
+    'reminders': ('data/reminders.json', None),
+}
+
+# Документы серверов -> есть ли резервная копия
+GUILD_DOCUMENTS = {
+    'clan': False,
+    'leveling': True,
+}
+
+# Общие файлы, созданные до разделения данных по серверам (переносятся в LEGACY_GUILD_ID)
+LEGACY_SOURCES = {
+    'clan': ('clan_data.json', None),
+    'leveling': ('cogs/lvl/lvl_data.json', 'cogs/lvl/lvl_data_backup.json'),
+}
+LEGACY_JOURNAL = 'cogs/lvl/lvl_data.journal'
+
+
+def replay_journal(data, journal_path: str):
+    """Применяет к снимку уровней записи журнала, сделанные после него"""
+    from cogs.lvl.curves import DEFAULT_CURVE, get_curve
+    from cogs.lvl.journal import XPJournal
+    from cogs.lvl.leveling import Leveling
+    from cogs.lvl.periods import PeriodCounters
+
+    journal = XPJournal(journal_path)
+    periods = PeriodCounters.from_dict(data.get('periods'))
+
+    def credit_period(user_id, xp, messages, voice, at):
+        if at is not None:
+            periods.add(int(user_id), xp, messages, voice, now=at)
+
+    touched = journal.replay(data, Leveling.new_user, credit_period)
+    if not touched:
+        return
+    curve = get_curve(data.get('settings', {}).get('level_curve', DEFAULT_CURVE.name))
+    for user_id in touched:
+        data['users'][user_id]['level'] = curve.level_for_xp(data['users'][user_id]['xp'])
+    data['periods'] = periods.to_json()
+    # Бот не будет применять эти записи повторно
+    data['journal_seq'] = journal.seq
+    print(f"{journal_path}: применено записей журнала: {journal.pending}")
+
+
+def _copy(db, name: str, path: str, backup_path, partition: str = '', journal_path=None):
+    data = JsonFileBackend(path, backup_path).load()
+    if data is None:
+        print(f"{name}: файл {path} не найден или пуст, пропускаем")
+        return
+    if journal_path is not None:
+        replay_journal(data, journal_path)
+
+    document = SQLiteDocument(db, name, partition)
+    # Загружаем текущее состояние базы, чтобы повторный запуск удалил устаревшие строки
+    document.load()
+    document.save(data)
+    print(f"{document.document}: данные из {path} перенесены")
+
+
+def migrate(database_url: str = DATABASE_URL):
+    """Переносит все найденные JSON-файлы в базу данных"""
+    db = get_database(database_url)
+    for name, (path, backup_path) in JSON_SOURCES.items():
+        _copy(db, name, path, backup_path)
+
+    guild_ids = []
+    if os.path.isdir(GUILD_DATA_DIR):
+        guild_ids = [int(entry) for entry in os.listdir(GUILD_DATA_DIR) if entry.isdigit()]
+    for guild_id in guild_ids:
+        for name, backup in GUILD_DOCUMENTS.items():
+            path = guild_path(guild_id, f"{name}.json")
+            if os.path.exists(path):
+                backup_path = guild_path(guild_id, f"{name}_backup.json") if backup else None
+                journal_path = guild_path(guild_id, f"{name}.journal") if name == 'leveling' else None
+                _copy(db, name, path, backup_path, str(guild_id), journal_path)
+
+    if LEGACY_GUILD_ID is None:
+        return
+    for name, (path, backup_path) in LEGACY_SOURCES.items():
+        # Раздел сервера уже создан ботом и новее общего файла
+        if not os.path.exists(guild_path(LEGACY_GUILD_ID, f"{name}.json")):
+            journal_path = LEGACY_JOURNAL if name == 'leveling' else None
+            _copy(db, name, path, backup_path, str(LEGACY_GUILD_ID), journal_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос данных бота из JSON в SQLite")
+    parser.add_argument('--database', default=DATABASE_URL, help="URL базы данных SQLAlchemy")
+    args = parser.parse_args()
+    migrate(args.database)
+
+
+if __name__ == '__main__':
+    main()
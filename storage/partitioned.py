@@ -0,0 +1,194 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+from .aio import OffloopWriter
+
+# Через сколько секунд простоя раздел сервера выгружается из памяти
+IDLE_TIMEOUT = float(os.getenv('GUILD_IDLE_TIMEOUT', '1800'))
+
+
+class Partition:
+    """Данные одного сервера и их запись"""
+
+    def __init__(self, guild_id: int, backend, data: Dict):
+        self.guild_id = guild_id
+        self.backend = backend
+        self.writer = OffloopWriter(backend, track=False)
+        self.data = data
+        self.dirty = False
+        self.last_used = time.monotonic()
+
+    @property
+    def pending(self) -> bool:
+        """Есть ли несохранённые изменения"""
+        return self.dirty
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    async def save(self) -> bool:
+        """Записывает данные в рабочем потоке"""
+        self.dirty = False
+        try:
+            await self.writer.save(self.data)
+        except Exception as e:
+            self.dirty = True
+            print(f"Ошибка при сохранении {self.backend.name}: {e}")
+            return False
+        return True
+
+    def save_sync(self) -> bool:
+        """Синхронная запись (при завершении работы)"""
+        self.dirty = False
+        try:
+            self.writer.save_sync(self.data)
+        except Exception as e:
+            self.dirty = True
+            print(f"Ошибка при сохранении {self.backend.name}: {e}")
+            return False
+        return True
+
+    def close(self):
+        """Освобождает ресурсы раздела перед выгрузкой"""
+
+
+class PartitionedStore:
+    """Данные, разделённые по серверам.
+
+    Раздел сервера загружается при первом обращении, изменённые разделы
+    записываются фоновой задачей раз в interval секунд, а разделы, к
+    которым не обращались idle_timeout секунд, сохраняются и выгружаются.
+    Память и стоимость записи зависят от числа активных серверов."""
+
+    def __init__(self, name: str, load_partition: Callable[[int], Partition],
+                 interval: float = 5.0, idle_timeout: float = IDLE_TIMEOUT):
+        self.name = name
+        self.load_partition = load_partition
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.partitions: Dict[int, Partition] = {}
+        # Вызываются с ID сервера после выгрузки его раздела (кэши, построенные по данным раздела)
+        self.evict_callbacks: List[Callable[[int], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+        # Метрики
+        self.load_count = 0
+        self.eviction_count = 0
+        self.write_count = 0
+        self.failed_writes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        # Метрики писателей выгруженных разделов
+        self._retired_saves = 0
+        self._retired_stall_ms = 0.0
+        self._retired_max_stall_ms = 0.0
+        self._retired_max_write_ms = 0.0
+
+    def get(self, guild_id: int) -> Partition:
+        """Возвращает раздел сервера, загружая его при необходимости"""
+        partition = self.partitions.get(guild_id)
+        if partition is None:
+            partition = self.load_partition(guild_id)
+            self.partitions[guild_id] = partition
+            self.load_count += 1
+        partition.last_used = time.monotonic()
+        return partition
+
+    def mark_dirty(self, guild_id: int):
+        """Помечает раздел сервера как изменённый"""
+        self.get(guild_id).mark_dirty()
+
+    def loaded(self):
+        """ID серверов, чьи разделы сейчас в памяти"""
+        return list(self.partitions)
+
+    async def save_pending(self):
+        """Записывает все изменённые разделы"""
+        started = time.perf_counter()
+        written = 0
+        for partition in list(self.partitions.values()):
+            if partition.pending:
+                if await partition.save():
+                    written += 1
+                else:
+                    self.failed_writes += 1
+        if written:
+            self._record(written, (time.perf_counter() - started) * 1000)
+
+    async def evict_idle(self, now: Optional[float] = None):
+        """Сохраняет и выгружает разделы, к которым давно не обращались"""
+        now = time.monotonic() if now is None else now
+        for guild_id, partition in list(self.partitions.items()):
+            if now - partition.last_used < self.idle_timeout:
+                continue
+            if partition.pending and not await partition.save():
+                self.failed_writes += 1
+                continue
+            # Пока шла запись, к разделу могли обратиться снова
+            if partition.pending or now - partition.last_used < self.idle_timeout:
+                continue
+            partition.close()
+            del self.partitions[guild_id]
+            self.eviction_count += 1
+            self._retire(partition.writer)
+            for callback in self.evict_callbacks:
+                callback(guild_id)
+
+    def _retire(self, writer: OffloopWriter):
+        self._retired_saves += writer.save_count
+        self._retired_stall_ms += writer.total_stall_ms
+        self._retired_max_stall_ms = max(self._retired_max_stall_ms, writer.max_stall_ms)
+        self._retired_max_write_ms = max(self._retired_max_write_ms, writer.max_write_ms)
+
+    def _record(self, written: int, elapsed_ms: float):
+        self.write_count += written
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def start(self):
+        """Запускает фоновую запись и выгрузку (повторный вызов ничего не делает)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.save_pending()
+            await self.evict_idle()
+
+    def flush(self) -> bool:
+        """Синхронно записывает все изменённые разделы"""
+        ok = True
+        for partition in self.partitions.values():
+            if partition.pending:
+                ok = partition.save_sync() and ok
+        return ok
+
+    async def close(self):
+        """Останавливает фоновую задачу и сохраняет изменения"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.save_pending()
+
+    def metrics(self) -> Dict:
+        """Возвращает метрики разделов, включая блокировку цикла событий их писателями"""
+        writers = [p.writer for p in self.partitions.values()]
+        save_count = self._retired_saves + sum(w.save_count for w in writers)
+        total_stall_ms = self._retired_stall_ms + sum(w.total_stall_ms for w in writers)
+        return {
+            'loaded': len(self.partitions),
+            'pending': sum(1 for p in self.partitions.values() if p.pending),
+            'load_count': self.load_count,
+            'eviction_count': self.eviction_count,
+            'write_count': self.write_count,
+            'failed_writes': self.failed_writes,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'max_flush_ms': round(self.max_flush_ms, 2),
+            'save_count': save_count,
+            'avg_stall_ms': round(total_stall_ms / save_count, 3) if save_count else 0.0,
+            'max_stall_ms': round(max([self._retired_max_stall_ms] + [w.max_stall_ms for w in writers]), 3),
+            'max_write_ms': round(max([self._retired_max_write_ms] + [w.max_write_ms for w in writers]), 2),
+        }
@@ -0,0 +1,44 @@
+from typing import Callable, Dict, List
+
+
+class SchemaMigrations:
+    """Версионированные миграции формата документа.
+
+    Номер версии хранится в самом документе (schema_version). При загрузке
+    выполняются только миграции новее записанной версии, поэтому для уже
+    обновлённых данных загрузка не делает никакой работы по исправлению."""
+
+    def __init__(self, name: str, key: str = 'schema_version'):
+        self.name = name
+        self.key = key
+        self.steps: List[Callable] = []
+
+    @property
+    def version(self) -> int:
+        """Текущая версия формата"""
+        return len(self.steps)
+
+    def migration(self, func: Callable) -> Callable:
+        """Декоратор: регистрирует следующую миграцию (версии идут по порядку объявления)"""
+        self.steps.append(func)
+        return func
+
+    def stamp(self, data: Dict) -> Dict:
+        """Помечает новый документ текущей версией"""
+        data[self.key] = self.version
+        return data
+
+    def apply(self, data: Dict, *args) -> bool:
+        """Выполняет недостающие миграции; True, если документ изменился"""
+        current = data.get(self.key, 0)
+        if current > self.version:
+            print(f"{self.name}: версия данных {current} новее поддерживаемой ({self.version})")
+            return False
+        if current == self.version:
+            return False
+
+        for step in self.steps[current:]:
+            step(data, *args)
+        data[self.key] = self.version
+        print(f"{self.name}: данные обновлены с версии {current} до {self.version}")
+        return True
@@ -0,0 +1,83 @@
+import json
+import os
+from typing import Any, Dict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class JsonSerializer:
+    """Стандартный json, компактная запись без отступов"""
+    name = 'json'
+
+    def encode(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, raw: bytes) -> Any:
+        return json.loads(raw.decode('utf-8'))
+
+
+class OrjsonSerializer:
+    """orjson: тот же JSON, но кодирование и разбор в несколько раз быстрее"""
+    name = 'orjson'
+
+    def encode(self, data: Any) -> bytes:
+        return orjson.dumps(data)
+
+    def decode(self, raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+
+class MsgpackSerializer:
+    """Компактный двоичный формат MessagePack"""
+    name = 'msgpack'
+
+    def encode(self, data: Any) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, raw: bytes) -> Any:
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+def available_serializers() -> Dict[str, Any]:
+    """Все сериализаторы, доступные в текущем окружении"""
+    serializers = {'json': JsonSerializer()}
+    if orjson is not None:
+        serializers['orjson'] = OrjsonSerializer()
+    if msgpack is not None:
+        serializers['msgpack'] = MsgpackSerializer()
+    return serializers
+
+
+def get_serializer(name: str = 'json'):
+    """Сериализатор для записи: "json" (orjson, если установлен) или "msgpack"."""
+    if name == 'msgpack':
+        if msgpack is not None:
+            return MsgpackSerializer()
+        print("msgpack не установлен, данные будут записываться в JSON")
+    elif name not in ('json', 'orjson'):
+        print(f"Неизвестный формат {name!r}, данные будут записываться в JSON")
+    return OrjsonSerializer() if orjson is not None else JsonSerializer()
+
+
+def decode_auto(raw: bytes) -> Any:
+    """Разбирает файл в любом поддерживаемом формате, определяя его по первому байту"""
+    stripped = raw.lstrip()
+    if stripped[:1] in (b'{', b'[') or stripped.startswith(b'\xef\xbb\xbf'):
+        if orjson is not None and not stripped.startswith(b'\xef\xbb\xbf'):
+            return orjson.loads(stripped)
+        return json.loads(stripped.decode('utf-8-sig'))
+    if msgpack is None:
+        raise ValueError("Файл записан в формате msgpack, но msgpack не установлен")
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+# Формат записи файлов: "json" или "msgpack"
+default_serializer = get_serializer(os.getenv('STORAGE_FORMAT', 'json').lower())
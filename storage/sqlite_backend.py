@@ -0,0 +1,337 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Float, Integer, MetaData, String, Table, Text,
+    create_engine, event, select
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+metadata = MetaData()
+
+
+def _list_table(name: str) -> Table:
+    """Дочерняя таблица для поля-списка (участники события, состав подразделения)"""
+    return Table(
+        name, metadata,
+        Column('partition', String, primary_key=True),
+        Column('parent', String, primary_key=True),
+        Column('position', Integer, primary_key=True),
+        Column('value', String, nullable=False, index=True),
+    )
+
+
+# Строки коллекций хранят раздел (partition): ID сервера для данных, разделённых
+# по серверам, или пустую строку для общих документов.
+
+# Разделы документов, не имеющие собственной таблицы (настройки, роли и т.п.)
+documents = Table(
+    'documents', metadata,
+    Column('document', String, primary_key=True),
+    Column('key', String, primary_key=True),
+    Column('value', Text),
+)
+
+members = Table(
+    'members', metadata,
+    Column('partition', String, primary_key=True),
+    Column('user_id', String, primary_key=True),
+    Column('joined_at', String, index=True),
+    Column('role', String),
+    Column('extra', Text),
+)
+
+warnings = Table(
+    'warnings', metadata,
+    Column('partition', String, primary_key=True),
+    Column('warning_id', String, primary_key=True),
+    Column('user_id', String, index=True),
+    Column('reason', Text),
+    Column('timestamp', String),
+    Column('issued_by', String),
+    Column('extra', Text),
+)
+
+events = Table(
+    'events', metadata,
+    Column('partition', String, primary_key=True),
+    Column('event_id', String, primary_key=True),
+    Column('name', String),
+    Column('date', String, index=True),
+    Column('description', Text),
+    Column('created_by', BigInteger),
+    Column('extra', Text),
+)
+event_participants = _list_table('event_participants')
+
+subclans = Table(
+    'subclans', metadata,
+    Column('partition', String, primary_key=True),
+    Column('name', String, primary_key=True),
+    Column('description', Text),
+    Column('created_at', String),
+    Column('created_by', String, index=True),
+    Column('max_members', Integer),
+    Column('extra', Text),
+)
+subclan_members = _list_table('subclan_members')
+
+trades = Table(
+    'trades', metadata,
+    Column('partition', String, primary_key=True),
+    Column('trade_id', String, primary_key=True),
+    Column('seller', String, index=True),
+    Column('status', String, index=True),
+    Column('category', String, index=True),
+    Column('item_name', Text),
+    Column('price', Integer),
+    Column('created_at', String),
+    Column('expires_at', String, index=True),
+    Column('message_id', BigInteger, index=True),
+    Column('channel_id', BigInteger),
+    Column('extra', Text),
+)
+
+giveaways = Table(
+    'giveaways', metadata,
+    Column('partition', String, primary_key=True),
+    Column('message_id', String, primary_key=True),
+    Column('prize', Text),
+    Column('winners', Integer),
+    Column('end_time', Float, index=True),
+    Column('channel_id', BigInteger),
+    Column('guild_id', BigInteger),
+    Column('host_id', BigInteger),
+    Column('ended', Boolean, index=True),
+    Column('extra', Text),
+)
+
+level_users = Table(
+    'level_users', metadata,
+    Column('partition', String, primary_key=True),
+    Column('user_id', String, primary_key=True),
+    Column('xp', Integer, index=True),
+    Column('level', Integer),
+    Column('total_messages', Integer),
+    Column('voice_time', Float),
+    Column('last_voice_update', String),
+    Column('extra', Text),
+)
+
+
+class Collection:
+    """Отображение словаря {ключ: запись} документа на таблицу"""
+
+    def __init__(self, section: Optional[str], table: Table, columns: List[str], lists: Optional[Dict[str, Table]] = None):
+        self.section = section  # None — весь документ является коллекцией
+        self.table = table
+        self.key = [column.name for column in table.primary_key.columns if column.name != 'partition'][0]
+        self.columns = columns
+        self.lists = lists or {}
+
+    def to_row(self, partition: str, key: str, record: Dict) -> Dict:
+        row = {'partition': partition, self.key: key}
+        extra = {}
+        for field, value in record.items():
+            if field in self.lists:
+                continue
+            if field in self.columns:
+                row[field] = value
+            else:
+                extra[field] = value
+        for field in self.columns:
+            row.setdefault(field, None)
+        row['extra'] = json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else None
+        return row
+
+    def from_row(self, row) -> Dict:
+        record = {field: row[field] for field in self.columns}
+        if row['extra']:
+            record.update(json.loads(row['extra']))
+        return record
+
+
+SCHEMAS = {
+    'clan': [
+        Collection('members', members, ['joined_at', 'role']),
+        Collection('warnings', warnings, ['user_id', 'reason', 'timestamp', 'issued_by']),
+        Collection('events', events, ['name', 'date', 'description', 'created_by'],
+                   lists={'participants': event_participants}),
+        Collection('subclans', subclans, ['description', 'created_at', 'created_by', 'max_members'],
+                   lists={'members': subclan_members}),
+    ],
+    'trading': [
+        Collection('trades', trades, ['seller', 'status', 'category', 'item_name', 'price',
+                                      'created_at', 'expires_at', 'message_id', 'channel_id']),
+    ],
+    'giveaways': [
+        Collection(None, giveaways, ['prize', 'winners', 'end_time', 'channel_id', 'guild_id', 'host_id', 'ended']),
+    ],
+    'leveling': [
+        Collection('users', level_users, ['xp', 'level', 'total_messages', 'voice_time', 'last_voice_update']),
+    ],
+}
+
+
+class Database:
+    """Подключение к SQLite в режиме WAL"""
+
+    def __init__(self, url: str):
+        self.engine = create_engine(url)
+        database = self.engine.url.database
+        if database and os.path.dirname(database):
+            os.makedirs(os.path.dirname(database), exist_ok=True)
+
+        @event.listens_for(self.engine, 'connect')
+        def _set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+
+        metadata.create_all(self.engine)
+
+
+_databases: Dict[str, Database] = {}
+
+
+def get_database(url: str) -> Database:
+    """Возвращает общее подключение для URL"""
+    if url not in _databases:
+        _databases[url] = Database(url)
+    return _databases[url]
+
+
+def _upsert(table: Table):
+    stmt = sqlite_insert(table)
+    keys = [column.name for column in table.primary_key.columns]
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={column.name: stmt.excluded[column.name] for column in table.columns if column.name not in keys}
+    )
+
+
+class SQLiteDocument:
+    """Документ (clan_data, trading, ...) в нормализованных таблицах.
+
+    Хранит снимок последнего записанного состояния, поэтому сохранение
+    выполняет UPSERT/DELETE только для изменившихся строк. partition
+    отделяет данные одного сервера от данных других серверов."""
+
+    def __init__(self, db: Database, name: str, partition: str = ''):
+        self.db = db
+        self.partition = partition
+        self.document = f"{name}:{partition}" if partition else name
+        self.name = f"sqlite:{self.document}"
+        self.collections = SCHEMAS.get(name, [])
+        self._rows: Dict[str, Dict[str, Dict]] = {c.table.name: {} for c in self.collections}
+        self._lists: Dict[str, Dict[str, tuple]] = {
+            child.name: {} for c in self.collections for child in c.lists.values()
+        }
+        self._sections: Dict[str, str] = {}
+
+    def load(self) -> Optional[Dict]:
+        """Загружает документ; None, если в базе нет данных"""
+        data: Dict = {}
+        found = False
+        with self.db.engine.connect() as conn:
+            for key, value in conn.execute(
+                select(documents.c.key, documents.c.value).where(documents.c.document == self.document)
+            ):
+                data[key] = json.loads(value)
+                self._sections[key] = value
+                found = True
+
+            for collection in self.collections:
+                records = data.setdefault(collection.section, {}) if collection.section else data
+                rows = self._rows[collection.table.name]
+                table = collection.table
+                for row in conn.execute(select(table).where(table.c.partition == self.partition)).mappings():
+                    key = row[collection.key]
+                    records[key] = collection.from_row(row)
+                    rows[key] = dict(row)
+                    found = True
+
+                for field, child in collection.lists.items():
+                    values: Dict[str, list] = {}
+                    query = select(child).where(child.c.partition == self.partition)
+                    for row in conn.execute(query.order_by(child.c.parent, child.c.position)):
+                        values.setdefault(row.parent, []).append(row.value)
+                    for key, record in records.items():
+                        record[field] = values.get(key, [])
+                        self._lists[child.name][key] = tuple(record[field])
+
+        return data if found else None
+
+    def save(self, data: Dict):
+        """Записывает только изменившиеся строки одной транзакцией"""
+        new_rows = {}
+        new_lists = {}
+        with self.db.engine.begin() as conn:
+            for collection in self.collections:
+                records = data.get(collection.section, {}) if collection.section else data
+                new_rows[collection.table.name], lists = self._save_collection(conn, collection, records)
+                new_lists.update(lists)
+            new_sections = self._save_sections(conn, data)
+
+        # Снимок обновляется только после успешного коммита
+        self._rows.update(new_rows)
+        self._lists.update(new_lists)
+        self._sections = new_sections
+
+    def _save_collection(self, conn, collection: Collection, records: Dict):
+        table = collection.table
+        old_rows = self._rows[table.name]
+        rows = {str(key): collection.to_row(self.partition, str(key), record) for key, record in records.items()}
+
+        changed = [row for key, row in rows.items() if old_rows.get(key) != row]
+        removed = [key for key in old_rows if key not in rows]
+        if changed:
+            conn.execute(_upsert(table), changed)
+        if removed:
+            conn.execute(table.delete().where(
+                (table.c.partition == self.partition) & table.c[collection.key].in_(removed)
+            ))
+
+        lists = {}
+        for field, child in collection.lists.items():
+            old_values = self._lists[child.name]
+            values = {str(key): tuple(record.get(field) or ()) for key, record in records.items()}
+            for key, items in values.items():
+                if old_values.get(key) == items:
+                    continue
+                conn.execute(child.delete().where((child.c.partition == self.partition) & (child.c.parent == key)))
+                if items:
+                    conn.execute(child.insert(), [
+                        {'partition': self.partition, 'parent': key, 'position': i, 'value': str(item)}
+                        for i, item in enumerate(items)
+                    ])
+            gone = [key for key in old_values if key not in values]
+            if gone:
+                conn.execute(child.delete().where((child.c.partition == self.partition) & child.c.parent.in_(gone)))
+            lists[child.name] = values
+
+        return rows, lists
+
+    def _save_sections(self, conn, data: Dict) -> Dict[str, str]:
+        covered = {c.section for c in self.collections}
+        if None in covered:
+            return {}
+
+        sections = {
+            key: json.dumps(value, ensure_ascii=False, sort_keys=True)
+            for key, value in data.items() if key not in covered
+        }
+        changed = [
+            {'document': self.document, 'key': key, 'value': value}
+            for key, value in sections.items() if self._sections.get(key) != value
+        ]
+        removed = [key for key in self._sections if key not in sections]
+        if changed:
+            conn.execute(_upsert(documents), changed)
+        if removed:
+            conn.execute(documents.delete().where(
+                (documents.c.document == self.document) & documents.c.key.in_(removed)
+            ))
+        return sections